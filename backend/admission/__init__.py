@@ -0,0 +1,4 @@
+from .limiter import AdmissionController, admission
+from .middleware import AdmissionMiddleware
+
+__all__ = ["AdmissionController", "AdmissionMiddleware", "admission"]
@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+
+from admission.limiter import admission
+
+router = APIRouter(prefix="/admission", tags=["admission"])
+
+
+@router.get("/metrics")
+async def metrics():
+    """Limits plus the admission series in /metrics, per endpoint class, as JSON."""
+    return admission.snapshot()
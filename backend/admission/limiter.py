@@ -0,0 +1,226 @@
+"""
+Admission control for the analytics API.
+
+Two independent checks run before a request reaches its endpoint:
+
+* Rate limiting: a token bucket per (client, endpoint class). A client is
+  identified by an X-API-Key that matches one of ADMISSION_API_KEYS, else
+  by its IP address (see admission/middleware.py), so one client cannot
+  starve everyone else, nor get a fresh bucket by changing a header.
+* Concurrency: each endpoint class ("llm" for the Claude-backed endpoints,
+  "rule" for the rule-based ones) has a cap on requests in flight and a
+  bounded FIFO wait queue; a freed slot is handed straight to the oldest
+  waiter, so new arrivals cannot overtake it. Once the queue is full, or a
+  request waits too long for a slot, it is shed with 429 and a Retry-After
+  estimated from recent service times.
+
+Everything here runs on the event loop, so no locks are needed.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+
+from metrics.registry import registry
+
+
+IN_FLIGHT = registry.gauge("admission_in_flight", "Admitted requests in flight.", ("class",))
+QUEUED = registry.gauge("admission_queued", "Requests waiting for a slot.", ("class",))
+ADMITTED = registry.counter("admission_admitted_total", "Requests admitted.", ("class",))
+RATE_LIMITED = registry.counter(
+    "admission_rate_limited_total", "Requests rejected by the per-client rate limit.", ("class",)
+)
+SHED_QUEUE_FULL = registry.counter(
+    "admission_shed_queue_full_total", "Requests shed because the wait queue was full.", ("class",)
+)
+SHED_TIMEOUT = registry.counter(
+    "admission_shed_timeout_total", "Requests shed after waiting too long for a slot.", ("class",)
+)
+
+
+@dataclass
+class ClassLimits:
+    max_concurrency: int
+    max_queue: int
+    queue_timeout: float  # seconds a request may wait for a slot
+    rate: float  # tokens (requests) per second, per client
+    burst: float  # bucket size
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+def default_limits() -> dict[str, ClassLimits]:
+    return {
+        "llm": ClassLimits(
+            max_concurrency=_env_int("ADMISSION_LLM_CONCURRENCY", 8),
+            max_queue=_env_int("ADMISSION_LLM_QUEUE", 16),
+            queue_timeout=_env_float("ADMISSION_LLM_QUEUE_TIMEOUT", 30.0),
+            rate=_env_float("RATE_LIMIT_LLM_PER_SECOND", 0.5),
+            burst=_env_float("RATE_LIMIT_LLM_BURST", 10),
+        ),
+        "rule": ClassLimits(
+            max_concurrency=_env_int("ADMISSION_RULE_CONCURRENCY", 32),
+            max_queue=_env_int("ADMISSION_RULE_QUEUE", 128),
+            queue_timeout=_env_float("ADMISSION_RULE_QUEUE_TIMEOUT", 10.0),
+            rate=_env_float("RATE_LIMIT_RULE_PER_SECOND", 10.0),
+            burst=_env_float("RATE_LIMIT_RULE_BURST", 50),
+        ),
+    }
+
+
+# Path -> endpoint class. Paths not listed are not limited.
+ENDPOINT_CLASSES = {
+    "/analyze-transcript-ai": "llm",
+    "/analyze-sessions-ai": "llm",
+    "/analyze-pipeline": "llm",
+    "/preventative-care-recommendations": "llm",
+    "/analyze-transcript": "rule",
+    "/analyze-sessions": "rule",
+}
+
+MAX_TRACKED_CLIENTS = 10000
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class TokenBucket:
+    rate: float
+    burst: float
+    tokens: float = 0.0
+    updated: float = field(default_factory=time.monotonic)
+
+    def __post_init__(self):
+        self.tokens = self.burst
+
+    def take(self, now: float) -> float:
+        """Take one token; returns 0 on success, else seconds until one is available."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+class _ClassState:
+    def __init__(self, name: str, limits: ClassLimits):
+        self.limits = limits
+        self.in_flight = 0
+        self.queued = 0
+        # Futures of requests waiting for a slot, oldest first; release() resolves the oldest.
+        self.waiters: deque[asyncio.Future] = deque()
+        self.service_seconds = 1.0  # EWMA of time in flight, for Retry-After
+        self.admitted = ADMITTED.labels(name)
+        self.rate_limited = RATE_LIMITED.labels(name)
+        self.shed_queue_full = SHED_QUEUE_FULL.labels(name)
+        self.shed_timeout = SHED_TIMEOUT.labels(name)
+        IN_FLIGHT.labels(name).set_function(lambda: self.in_flight)
+        QUEUED.labels(name).set_function(lambda: self.queued)
+
+
+class AdmissionController:
+    def __init__(self, limits: dict[str, ClassLimits] | None = None):
+        self.classes = {name: _ClassState(name, l) for name, l in (limits or default_limits()).items()}
+        self._buckets: OrderedDict[tuple[str, str], TokenBucket] = OrderedDict()
+
+    def check_rate(self, client: str, endpoint_class: str) -> None:
+        """Raise Rejected if ``client`` is over its rate for this class."""
+        state = self.classes[endpoint_class]
+        key = (client, endpoint_class)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(state.limits.rate, state.limits.burst)
+            if len(self._buckets) > MAX_TRACKED_CLIENTS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        wait = bucket.take(time.monotonic())
+        if wait:
+            state.rate_limited.inc()
+            raise Rejected("rate limit exceeded", max(1, math.ceil(wait)))
+
+    def _retry_after(self, state: _ClassState) -> int:
+        backlog = state.queued + state.in_flight
+        return max(1, math.ceil(state.service_seconds * backlog / state.limits.max_concurrency))
+
+    async def acquire(self, endpoint_class: str) -> float:
+        """Wait for a slot in ``endpoint_class``; returns the admission time. Raises Rejected when shedding."""
+        state = self.classes[endpoint_class]
+        if state.in_flight < state.limits.max_concurrency and not state.queued:
+            state.in_flight += 1
+        else:
+            if state.queued >= state.limits.max_queue:
+                state.shed_queue_full.inc()
+                raise Rejected("server busy", self._retry_after(state))
+            # Wait in line; release() passes its slot on (in_flight unchanged) by resolving our future.
+            waiter = asyncio.get_running_loop().create_future()
+            state.waiters.append(waiter)
+            state.queued += 1
+            try:
+                await asyncio.wait_for(waiter, state.limits.queue_timeout)
+            except asyncio.TimeoutError:
+                state.shed_timeout.inc()
+                raise Rejected("server busy", self._retry_after(state))
+            except asyncio.CancelledError:
+                # Client went away; if the slot had already been handed to us, pass it on.
+                if waiter.done() and not waiter.cancelled():
+                    self._hand_off(state)
+                raise
+            finally:
+                state.queued -= 1
+        state.admitted.inc()
+        return time.monotonic()
+
+    def _hand_off(self, state: _ClassState) -> None:
+        """Give a freed slot to the oldest live waiter, or return it to the pool."""
+        while state.waiters:
+            waiter = state.waiters.popleft()
+            if not waiter.done():  # skip waiters that timed out or were cancelled
+                waiter.set_result(None)
+                return
+        state.in_flight -= 1
+
+    async def release(self, endpoint_class: str, admitted_at: float) -> None:
+        state = self.classes[endpoint_class]
+        state.service_seconds = 0.8 * state.service_seconds + 0.2 * (time.monotonic() - admitted_at)
+        self._hand_off(state)
+
+    def snapshot(self) -> dict:
+        return {
+            "classes": {
+                name: {
+                    "in_flight": s.in_flight,
+                    "queued": s.queued,
+                    "max_concurrency": s.limits.max_concurrency,
+                    "max_queue": s.limits.max_queue,
+                    "rate_per_second": s.limits.rate,
+                    "burst": s.limits.burst,
+                    "avg_service_seconds": round(s.service_seconds, 3),
+                    "admitted": int(s.admitted.value()),
+                    "rate_limited": int(s.rate_limited.value()),
+                    "shed_queue_full": int(s.shed_queue_full.value()),
+                    "shed_timeout": int(s.shed_timeout.value()),
+                }
+                for name, s in self.classes.items()
+            },
+            "tracked_clients": len(self._buckets),
+        }
+
+
+admission = AdmissionController()
+
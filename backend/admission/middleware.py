@@ -0,0 +1,67 @@
+import hashlib
+import hmac
+import json
+import os
+
+from admission.limiter import ENDPOINT_CLASSES, AdmissionController, Rejected
+
+# Keys issued to API clients (comma-separated). Only these identify a client;
+# anything else a client sends is its own choice and would let it pick a new bucket.
+API_KEYS = [k.strip() for k in os.getenv("ADMISSION_API_KEYS", "").split(",") if k.strip()]
+
+
+def _known_key(api_key: str) -> str | None:
+    for key in API_KEYS:
+        if hmac.compare_digest(api_key.encode(), key.encode()):
+            return hashlib.sha256(key.encode()).hexdigest()[:16]
+    return None
+
+
+def client_key(scope) -> str:
+    """
+    A configured X-API-Key (by hash), else the client IP. Behind a proxy,
+    run uvicorn with --proxy-headers so the IP is the forwarded client's.
+    """
+    headers = dict(scope.get("headers") or [])
+    if (api_key := headers.get(b"x-api-key")) and (known := _known_key(api_key.decode("latin-1"))):
+        return "key:" + known
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying rate limits and concurrency caps to classified endpoints."""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        endpoint_class = ENDPOINT_CLASSES.get(scope.get("path", "")) if scope["type"] == "http" else None
+        if endpoint_class is None or scope.get("method") == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        try:
+            self.controller.check_rate(client_key(scope), endpoint_class)
+            admitted_at = await self.controller.acquire(endpoint_class)
+        except Rejected as e:
+            await _reject(send, e)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            await self.controller.release(endpoint_class, admitted_at)
+
+
+async def _reject(send, rejected: Rejected) -> None:
+    body = json.dumps({"detail": rejected.reason, "retry_after": rejected.retry_after}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(rejected.retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -3,14 +3,24 @@ Claude API integration for generating human-readable analysis summaries
 and intervention recommendations from rule-based cognitive decline scores.
 """
 
-import os
 import json
-from anthropic import Anthropic
-from dotenv import load_dotenv
-
-load_dotenv()
-
-client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+import time
+
+from llm.circuit_breaker import CircuitOpenError
+from llm.client import create_message
+from llm.router import count_flagged_markers, log_route, route
+
+from .compaction import (
+    LONGITUDINAL_PROMPT_TOKEN_BUDGET,
+    MAX_ALERT_LINES,
+    MAX_SESSION_LINES,
+    MIN_ALERT_LINES,
+    MIN_SESSION_LINES,
+    compact_alerts,
+    compact_sessions,
+    estimate_tokens,
+    summary_header,
+)
 
 SYSTEM_PROMPT = """\
 You are a clinical cognitive health assistant embedded in an elderly care platform. \
@@ -46,14 +56,27 @@ def generate_summary(analysis_result: dict) -> dict:
     Returns:
         dict with "summary", "interventions", and "raw_analysis" keys.
     """
-    user_message = _build_prompt(analysis_result)
-
-    response = client.messages.create(
-        model="claude-sonnet-4-5-20250929",
-        max_tokens=1500,
-        system=SYSTEM_PROMPT,
-        messages=[{"role": "user", "content": user_message}],
+    selected = route(
+        "summary",
+        analysis_result.get("risk_score", 0),
+        count_flagged_markers(analysis_result),
     )
+    user_message = _build_prompt(analysis_result, selected.prompt_variant)
+
+    started = time.perf_counter()
+    try:
+        response = create_message(
+            "summary",
+            model=selected.model,
+            max_tokens=selected.max_tokens,
+            system=SYSTEM_PROMPT,
+            messages=[{"role": "user", "content": user_message}],
+        )
+    except Exception as e:
+        outcome = "circuit_open" if isinstance(e, CircuitOpenError) else "error"
+        log_route("summary", selected, started, outcome=outcome)
+        raise
+    log_route("summary", selected, started)
 
     ai_text = response.content[0].text
 
@@ -63,6 +86,7 @@ def generate_summary(analysis_result: dict) -> dict:
         "rule_based_summary": analysis_result.get("summary", ""),
         "session_id": analysis_result.get("session_id", ""),
         "session_date": analysis_result.get("session_date", ""),
+        "model_tier": selected.tier,
     }
 
 
@@ -76,17 +100,22 @@ def generate_longitudinal_summary(longitudinal_result: dict) -> dict:
     Returns:
         dict with AI summary, trend interpretation, and interventions.
     """
-    user_message = _build_longitudinal_prompt(longitudinal_result)
+    response = create_message("longitudinal_summary", **longitudinal_request_params(longitudinal_result))
+    return longitudinal_payload(longitudinal_result, response.content[0].text)
 
-    response = client.messages.create(
-        model="claude-sonnet-4-5-20250929",
-        max_tokens=2000,
-        system=SYSTEM_PROMPT,
-        messages=[{"role": "user", "content": user_message}],
-    )
 
-    ai_text = response.content[0].text
+def longitudinal_request_params(longitudinal_result: dict) -> dict:
+    """Messages API parameters for a longitudinal summary (shared with the batch job)."""
+    return {
+        "model": "claude-sonnet-4-5-20250929",
+        "max_tokens": 2000,
+        "system": SYSTEM_PROMPT,
+        "messages": [{"role": "user", "content": _build_longitudinal_prompt(longitudinal_result)}],
+    }
 
+
+def longitudinal_payload(longitudinal_result: dict, ai_text: str) -> dict:
+    """Shape Claude's longitudinal summary text into the API response dict."""
     return {
         "ai_summary": ai_text,
         "trend_direction": longitudinal_result.get("trend_direction", ""),
@@ -98,7 +127,32 @@ def generate_longitudinal_summary(longitudinal_result: dict) -> dict:
 
 # --- Prompt builders ---
 
-def _build_prompt(analysis: dict) -> str:
+# Closing instructions per routing prompt variant (see llm.router).
+_SUMMARY_INSTRUCTIONS = {
+    "brief": """Please provide:
+1. **Overview** - A 2-3 sentence plain-language interpretation of these results for a family caretaker.
+2. **Recommended Interventions** - 3 specific, actionable steps to keep supporting cognitive health this week.
+3. **Daily Tips** - 2 small daily habits that can help.
+""",
+    "standard": """Please provide:
+1. **Overview** - A 2-3 sentence plain-language interpretation of these results for a family caretaker.
+2. **Areas of Concern** - Explain each flagged marker in simple terms. What does it look like in conversation? Why does it matter?
+3. **Positive Signs** - Note any metrics that look healthy or normal.
+4. **Recommended Interventions** - 3-5 specific, actionable steps the caretaker or elderly person can take this week to support cognitive health. Include a mix of physical, social, and cognitive activities.
+5. **Daily Tips** - 2-3 small daily habits that can help.
+""",
+    "detailed": """Please provide:
+1. **Overview** - A 2-3 sentence plain-language interpretation of these results for a family caretaker.
+2. **Areas of Concern** - Explain each flagged marker in simple terms. What does it look like in conversation? Why does it matter? Quote the flagged excerpts where helpful.
+3. **Positive Signs** - Note any metrics that look healthy or normal.
+4. **Recommended Interventions** - 3-5 specific, actionable steps the caretaker or elderly person can take this week to support cognitive health. Include a mix of physical, social, and cognitive activities.
+5. **Daily Tips** - 2-3 small daily habits that can help.
+6. **When to Seek Professional Help** - Which of these signs, if they persist or worsen, warrant a doctor visit.
+""",
+}
+
+
+def _build_prompt(analysis: dict, variant: str = "standard") -> str:
     """Build the user prompt for single-session analysis."""
     markers_summary = []
     for m in analysis.get("markers", []):
@@ -139,30 +193,37 @@ def _build_prompt(analysis: dict) -> str:
 **Flagged Transcript Excerpts:**
 {excerpts_text if excerpts_text else '  (none)'}
 
-Please provide:
-1. **Overview** - A 2-3 sentence plain-language interpretation of these results for a family caretaker.
-2. **Areas of Concern** - Explain each flagged marker in simple terms. What does it look like in conversation? Why does it matter?
-3. **Positive Signs** - Note any metrics that look healthy or normal.
-4. **Recommended Interventions** - 3-5 specific, actionable steps the caretaker or elderly person can take this week to support cognitive health. Include a mix of physical, social, and cognitive activities.
-5. **Daily Tips** - 2-3 small daily habits that can help.
-"""
+{_SUMMARY_INSTRUCTIONS[variant]}"""
 
 
-def _build_longitudinal_prompt(result: dict) -> str:
-    """Build the user prompt for longitudinal analysis."""
-    sessions_summary = []
-    for s in result.get("sessions", []):
-        sessions_summary.append(
-            f"- {s['session_id']} ({s['session_date']}): "
-            f"risk={s['risk_score']}, words={s['total_words']}, "
-            f"TTR={s['raw_metrics'].get('ttr', 'N/A')}, "
-            f"fillers={s['raw_metrics'].get('filler_rate', 'N/A')}, "
-            f"pauses={s['raw_metrics'].get('pause_rate', 'N/A')}"
-        )
+def _build_longitudinal_prompt(
+    result: dict,
+    token_budget: int = LONGITUDINAL_PROMPT_TOKEN_BUDGET,
+) -> str:
+    """
+    Build the user prompt for longitudinal analysis.
 
-    alerts_text = ""
-    for a in result.get("alerts", []):
-        alerts_text += f"  - [{a.get('severity', '')}] {a.get('message', '')}\n"
+    Sessions and alerts are compacted and the result is checked against
+    ``token_budget``; session and alert limits are halved until the prompt fits.
+    """
+    max_sessions, max_alerts = MAX_SESSION_LINES, MAX_ALERT_LINES
+    while True:
+        prompt = _render_longitudinal_prompt(result, max_sessions, max_alerts)
+        tokens = estimate_tokens(prompt)
+        if tokens <= token_budget:
+            return prompt
+        if max_sessions <= MIN_SESSION_LINES and max_alerts <= MIN_ALERT_LINES:
+            print(f"Longitudinal prompt still ~{tokens} tokens after compaction (budget {token_budget}).")
+            return prompt
+        max_sessions = max(max_sessions // 2, MIN_SESSION_LINES)
+        max_alerts = max(max_alerts // 2, MIN_ALERT_LINES)
+
+
+def _render_longitudinal_prompt(result: dict, max_sessions: int, max_alerts: int) -> str:
+    sessions = result.get("sessions", [])
+    alerts = result.get("alerts", [])
+    sessions_summary = compact_sessions(sessions, max_sessions)
+    alerts_text = "\n".join(compact_alerts(alerts, max_alerts))
 
     trend_metrics = result.get("trend_metrics", {})
     trend_summary = []
@@ -172,10 +233,14 @@ def _build_longitudinal_prompt(result: dict) -> str:
             f"(change: {data['change']:+.4f}, {data['pct_change']:+.1f}%)"
         )
 
+    rule_based_summary = summary_header(result.get('summary', 'N/A'))
+    if alerts:
+        rule_based_summary += f" {len(alerts)} alert(s) raised (see Alerts)."
+
     return f"""Here is a longitudinal cognitive decline screening analysis across multiple voice call sessions.
 
 **Overall Trend:** {result.get('trend_direction', 'N/A')}
-**Number of Sessions:** {len(result.get('sessions', []))}
+**Number of Sessions:** {len(sessions)}
 
 **Per-Session Summary:**
 {chr(10).join(sessions_summary)}
@@ -186,7 +251,7 @@ def _build_longitudinal_prompt(result: dict) -> str:
 **Alerts:**
 {alerts_text if alerts_text else '  (none)'}
 
-**Rule-Based Summary:** {result.get('summary', 'N/A')}
+**Rule-Based Summary:** {rule_based_summary}
 
 Please provide:
 1. **Trend Overview** - A 2-3 sentence plain-language interpretation of how things are changing over time.
@@ -0,0 +1,291 @@
+"""
+Nightly batch generation of longitudinal caretaker reports.
+
+Instead of calling generate_longitudinal_summary() once per elder, all
+pending reports are submitted as a single Message Batch, polled until the
+batch ends, and written back through a caller-supplied writer. Progress is
+checkpointed to disk after every step so a crashed run resumes the same
+batch instead of paying for it twice.
+
+Usage:
+    python -m analysis.batch_reports                 # pending elders from the session store
+    python -m analysis.batch_reports pending.json --out reports.json
+
+where pending.json maps report ids (e.g. elder ids) to session lists in the
+/analyze-sessions request format.
+
+The checkpoint lives next to the session database by default; set
+BATCH_CHECKPOINT_PATH to put it elsewhere. It records which client
+(Anthropic or --local) submitted the batch, and a run with the other
+client refuses to resume it.
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable
+
+from llm.client import get_client
+
+from .ai_summary import longitudinal_payload, longitudinal_request_params
+from .transcript_analyzer import analyze_sessions
+
+
+_DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent / "sessions.db"
+DEFAULT_CHECKPOINT = Path(
+    os.getenv("BATCH_CHECKPOINT_PATH")
+    or Path(os.getenv("SESSION_DB_PATH", str(_DEFAULT_DB_PATH))).with_name(".batch_reports_checkpoint.json")
+)
+POLL_INTERVAL_SECONDS = 60
+REPORT_WINDOW_DAYS = 7
+
+
+# --- Checkpointing ---
+
+def _load_checkpoint(path: Path) -> dict:
+    if path.exists():
+        return json.loads(path.read_text())
+    return {"batch_id": None, "client": None, "submitted": [], "written": [], "custom_ids": {}}
+
+
+class CheckpointMismatch(ValueError):
+    """The checkpoint's batch was submitted through another batch client."""
+
+
+def _checkpoint_client(checkpoint: dict) -> str:
+    # Checkpoints written before the client was recorded: local ids carry a prefix.
+    return checkpoint.get("client") or (
+        "local" if checkpoint["batch_id"].startswith(LOCAL_BATCH_PREFIX) else "anthropic"
+    )
+
+
+def _atomic_write_json(path: Path, data: dict) -> None:
+    """Write-then-rename so a crash never leaves a half-written file."""
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, path)
+
+
+# --- Pipeline ---
+
+_CUSTOM_ID = re.compile(r"[a-zA-Z0-9_-]{1,64}")
+
+
+def custom_id_for(report_id: str) -> str:
+    """
+    Batch custom_id for a report id. Valid ids are used as they are; others
+    (elder ids with dots, @ or spaces, or too long) are sanitized and suffixed
+    with a hash, so one odd id cannot make the whole batch request invalid.
+    """
+    if _CUSTOM_ID.fullmatch(report_id):
+        return report_id
+    digest = hashlib.sha256(report_id.encode()).hexdigest()[:16]
+    return f"{re.sub(r'[^a-zA-Z0-9_-]', '_', report_id)[:40]}-{digest}"
+
+
+def collect_pending(pending_sessions: dict[str, list[dict]]) -> dict[str, dict]:
+    """Run the rule-based longitudinal analysis for every pending report."""
+    return {
+        report_id: analyze_sessions(sessions)
+        for report_id, sessions in pending_sessions.items()
+        if sessions
+    }
+
+
+def collect_pending_from_store(store, window_days: int = REPORT_WINDOW_DAYS) -> dict[str, dict]:
+    """
+    Pending reports for every elder in a sessions.SessionStore whose latest
+    session is newer than their latest report, over the last ``window_days``.
+    """
+    since = (datetime.utcnow() - timedelta(days=window_days)).strftime("%Y-%m-%d")
+    pending_sessions = {}
+    for elder_id in store.elder_ids():
+        latest = store.latest(elder_id)
+        report = store.latest_report(elder_id)
+        if latest is None or (report and report["created_at"] >= latest["timestamp"]):
+            continue
+        pending_sessions[elder_id] = [
+            {"text": s["transcript"], "session_id": s["session_id"], "date": s["session_date"]}
+            for s in store.query(elder_id, date_from=since)
+        ]
+    return collect_pending(pending_sessions)
+
+
+def run_batch(
+    pending: dict[str, dict],
+    write_result: Callable[[str, dict], None],
+    batch_client=None,
+    checkpoint_path: Path = DEFAULT_CHECKPOINT,
+    poll_interval: float = POLL_INTERVAL_SECONDS,
+) -> dict:
+    """
+    Submit, poll and write back one batch of longitudinal summaries.
+
+    Args:
+        pending: report id -> analyze_sessions() output. Report ids are
+                 mapped to valid batch custom_ids (see custom_id_for); the
+                 mapping is kept in the checkpoint.
+        write_result: called with (report_id, summary dict) for each success.
+        batch_client: object exposing messages.batches (defaults to the
+                      shared Anthropic client; use LocalBatchClient in tests).
+        checkpoint_path: where progress is persisted between runs.
+
+    Returns:
+        dict with the batch id and per-outcome counts.
+    """
+    batches = (batch_client or get_client()).messages.batches
+    client_kind = getattr(batch_client, "kind", "anthropic")
+    checkpoint = _load_checkpoint(checkpoint_path)
+
+    if not checkpoint["batch_id"]:
+        to_submit = {rid: r for rid, r in pending.items() if rid not in checkpoint["written"]}
+        if not to_submit:
+            return {"batch_id": None, "succeeded": 0, "failed": 0, "skipped": len(pending)}
+        custom_ids = {custom_id_for(rid): rid for rid in to_submit}
+        batch = batches.create(requests=[
+            {"custom_id": cid, "params": longitudinal_request_params(to_submit[rid])}
+            for cid, rid in custom_ids.items()
+        ])
+        checkpoint = {"batch_id": batch.id, "client": client_kind, "submitted": list(to_submit),
+                      "written": checkpoint["written"], "custom_ids": custom_ids}
+        _atomic_write_json(checkpoint_path, checkpoint)
+        print(f"Submitted batch {batch.id} with {len(to_submit)} report(s).")
+    else:
+        if _checkpoint_client(checkpoint) != client_kind:
+            raise CheckpointMismatch(
+                f"checkpoint {checkpoint_path} holds {_checkpoint_client(checkpoint)} batch "
+                f"{checkpoint['batch_id']}; resume it with the same client (--local only for local "
+                f"batches) or delete the checkpoint to start over"
+            )
+        print(f"Resuming batch {checkpoint['batch_id']} from checkpoint.")
+
+    batch_id = checkpoint["batch_id"]
+    while batches.retrieve(batch_id).processing_status != "ended":
+        time.sleep(poll_interval)
+
+    succeeded, failed, missing = 0, [], []
+    written = set(checkpoint["written"])
+    custom_ids = checkpoint.get("custom_ids") or {}
+    for entry in batches.results(batch_id):
+        report_id = custom_ids.get(entry.custom_id, entry.custom_id)
+        if report_id in written:
+            continue
+        if entry.result.type != "succeeded":
+            failed.append(report_id)
+            continue
+        source = pending.get(report_id)
+        if source is None:
+            # Resumed without this report's analysis: a report built from nothing would
+            # look real, so leave it pending for the next run instead.
+            missing.append(report_id)
+            continue
+        write_result(report_id, longitudinal_payload(source, entry.result.message.content[0].text))
+        written.add(report_id)
+        checkpoint["written"] = sorted(written)
+        _atomic_write_json(checkpoint_path, checkpoint)
+        succeeded += 1
+
+    # Batch fully drained: failed reports stay pending for the next run.
+    checkpoint["batch_id"] = None
+    checkpoint["client"] = None
+    checkpoint["submitted"] = []
+    checkpoint["written"] = []
+    checkpoint["custom_ids"] = {}
+    _atomic_write_json(checkpoint_path, checkpoint)
+    if failed:
+        print(f"Batch {batch_id}: {len(failed)} report(s) failed: {', '.join(failed)}")
+    if missing:
+        print(f"Batch {batch_id}: skipped {len(missing)} result(s) with no pending analysis: {', '.join(missing)}")
+    return {"batch_id": batch_id, "succeeded": succeeded, "failed": len(failed), "skipped": len(missing)}
+
+
+# --- Local stand-in for the Message Batches API ---
+
+LOCAL_BATCH_PREFIX = "msgbatch_local_"
+
+
+class LocalBatchClient:
+    """
+    Offline stand-in for ``Anthropic().messages.batches``.
+
+    Batches end after ``polls_until_ended`` retrieve() calls and every request
+    succeeds with ``respond(params)`` (a canned summary by default).
+    """
+
+    kind = "local"
+
+    def __init__(self, respond: Callable[[dict], str] | None = None, polls_until_ended: int = 1):
+        self.respond = respond or (lambda params: "Local batch summary.")
+        self.polls_until_ended = polls_until_ended
+        self._batches: dict[str, dict] = {}
+        self.messages = SimpleNamespace(batches=self)
+
+    def create(self, requests: list[dict]):
+        batch_id = f"{LOCAL_BATCH_PREFIX}{uuid.uuid4().hex[:12]}"
+        self._batches[batch_id] = {"requests": requests, "polls": 0}
+        return SimpleNamespace(id=batch_id, processing_status="in_progress")
+
+    def retrieve(self, batch_id: str):
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            raise CheckpointMismatch(
+                f"local batch {batch_id} was created by another process and did not outlive it; "
+                f"delete the checkpoint to start over"
+            )
+        batch["polls"] += 1
+        ended = batch["polls"] >= self.polls_until_ended
+        return SimpleNamespace(id=batch_id, processing_status="ended" if ended else "in_progress")
+
+    def results(self, batch_id: str):
+        for req in self._batches[batch_id]["requests"]:
+            message = SimpleNamespace(content=[SimpleNamespace(type="text", text=self.respond(req["params"]))])
+            yield SimpleNamespace(
+                custom_id=req["custom_id"],
+                result=SimpleNamespace(type="succeeded", message=message),
+            )
+
+
+def _json_file_writer(path: Path) -> Callable[[str, dict], None]:
+    reports = json.loads(path.read_text()) if path.exists() else {}
+
+    def write(report_id: str, summary: dict) -> None:
+        reports[report_id] = summary
+        _atomic_write_json(path, reports)
+
+    return write
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate longitudinal reports via the Message Batches API.")
+    parser.add_argument("pending", type=Path, nargs="?", help="JSON file: report id -> list of sessions")
+    parser.add_argument("--out", type=Path, help="write reports to a JSON file instead of the session store")
+    parser.add_argument("--checkpoint", type=Path, default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--local", action="store_true", help="use the offline batch stub")
+    args = parser.parse_args()
+
+    from sessions import get_session_store
+
+    store = get_session_store()
+    if args.pending:
+        pending = collect_pending(json.loads(args.pending.read_text()))
+    else:
+        pending = collect_pending_from_store(store)
+    try:
+        summary = run_batch(
+            pending,
+            _json_file_writer(args.out) if args.out else store.add_report,
+            batch_client=LocalBatchClient() if args.local else None,
+            checkpoint_path=args.checkpoint,
+            poll_interval=0 if args.local else POLL_INTERVAL_SECONDS,
+        )
+    except CheckpointMismatch as e:
+        parser.error(str(e))
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,160 @@
+"""
+Prompt compaction for longitudinal summaries.
+
+Long histories (e.g. 90 days of calls with cross-session repetition alerts)
+would otherwise add one prompt line per session and per alert. This module
+folds sessions into time buckets and collapses duplicate alerts so the
+prompt stays within a fixed token budget regardless of history length.
+"""
+
+import math
+from collections import OrderedDict
+from datetime import datetime
+
+
+# Rough characters-per-token ratio for English prose with markdown/numbers.
+# Deliberately conservative so the estimate errs on the high side.
+CHARS_PER_TOKEN = 3.5
+
+# Upper bound on the estimated size of the longitudinal user prompt.
+LONGITUDINAL_PROMPT_TOKEN_BUDGET = 4000
+
+# Starting limits; halved until the prompt fits the budget.
+MAX_SESSION_LINES = 24
+MAX_ALERT_LINES = 20
+MIN_SESSION_LINES = 3
+MIN_ALERT_LINES = 3
+
+# Candidate bucket widths in days, smallest first.
+BUCKET_DAYS = [1, 7, 14, 30, 91, 182, 365]
+
+SEVERITY_RANK = {"elevated": 3, "moderate": 2, "mild": 1, "normal": 0}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate used to check a prompt before sending it."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+# --- Sessions ---
+
+def _parse_date(value: str) -> datetime | None:
+    try:
+        return datetime.strptime(value[:10], "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+
+
+def _session_line(s: dict) -> str:
+    metrics = s.get("raw_metrics", {})
+    return (
+        f"- {s['session_id']} ({s['session_date']}): "
+        f"risk={s['risk_score']}, words={s['total_words']}, "
+        f"TTR={metrics.get('ttr', 'N/A')}, "
+        f"fillers={metrics.get('filler_rate', 'N/A')}, "
+        f"pauses={metrics.get('pause_rate', 'N/A')}"
+    )
+
+
+def _mean(values: list[float], digits: int = 4) -> float | str:
+    return round(sum(values) / len(values), digits) if values else "N/A"
+
+
+def _bucket_line(bucket: list[dict]) -> str:
+    first = bucket[0].get("session_date", "")
+    last = bucket[-1].get("session_date", "")
+    risks = [s["risk_score"] for s in bucket]
+    metric_means = {
+        name: _mean([s["raw_metrics"][name] for s in bucket if name in s.get("raw_metrics", {})])
+        for name in ("ttr", "filler_rate", "pause_rate")
+    }
+    span = first if first == last else f"{first} to {last}"
+    return (
+        f"- {span} ({len(bucket)} sessions): "
+        f"risk avg={_mean(risks, 1)}, max={max(risks)}, "
+        f"TTR avg={metric_means['ttr']}, "
+        f"fillers avg={metric_means['filler_rate']}, "
+        f"pauses avg={metric_means['pause_rate']}"
+    )
+
+
+def _bucket_sessions(sessions: list[dict], max_lines: int) -> list[list[dict]]:
+    """Group date-sorted sessions into at most ``max_lines`` consecutive buckets."""
+    dates = [_parse_date(s.get("session_date", "")) for s in sessions]
+    if all(dates):
+        origin = dates[0]
+        for width in BUCKET_DAYS:
+            groups: OrderedDict[int, list[dict]] = OrderedDict()
+            for s, d in zip(sessions, dates):
+                groups.setdefault((d - origin).days // width, []).append(s)
+            if len(groups) <= max_lines:
+                return list(groups.values())
+
+    # Undated sessions or very long spans: fall back to equal-size chunks.
+    size = math.ceil(len(sessions) / max_lines)
+    return [sessions[i:i + size] for i in range(0, len(sessions), size)]
+
+
+def compact_sessions(sessions: list[dict], max_lines: int = MAX_SESSION_LINES) -> list[str]:
+    """
+    One line per session when the history is short, otherwise one line per
+    time bucket. The most recent session is always kept verbatim since it is
+    what the caretaker is asking about.
+    """
+    if len(sessions) <= max_lines:
+        return [_session_line(s) for s in sessions]
+
+    history, latest = sessions[:-1], sessions[-1]
+    lines = [_bucket_line(b) for b in _bucket_sessions(history, max(max_lines - 1, 1))]
+    lines.append(_session_line(latest).replace("- ", "- Latest: ", 1))
+    return lines
+
+
+# --- Alerts ---
+
+def _alert_key(alert: dict) -> tuple:
+    if alert.get("type") == "cross_session_repetition":
+        story = " ".join(alert.get("sentence_a", "").lower().split())
+        return ("cross_session_repetition", story)
+    return (alert.get("type", ""), alert.get("metric", ""), alert.get("message", ""))
+
+
+def compact_alerts(alerts: list[dict], max_lines: int = MAX_ALERT_LINES) -> list[str]:
+    """
+    Collapse repeated alerts and keep the most informative ones.
+
+    Cross-session repetition alerts for the same story are merged into a
+    single line with an occurrence count; the rest are deduplicated by type,
+    metric and message. Lines are ranked by severity, then by how often and
+    how closely the story repeated.
+    """
+    groups: OrderedDict[tuple, list[dict]] = OrderedDict()
+    for a in alerts:
+        groups.setdefault(_alert_key(a), []).append(a)
+
+    ranked = []
+    for key, group in groups.items():
+        severity = max((a.get("severity", "") for a in group), key=lambda v: SEVERITY_RANK.get(v, 0))
+        similarity = max((a.get("similarity", 0) for a in group), default=0)
+        if key[0] == "cross_session_repetition":
+            sessions = sorted({a.get("session_a", "") for a in group} | {a.get("session_b", "") for a in group})
+            excerpt = group[0].get("sentence_a", "")[:100]
+            line = (
+                f"  - [{severity}] Story repeated {len(group)}x across {len(sessions)} sessions "
+                f"(max {similarity:.0%} match): \"{excerpt}\""
+            )
+        else:
+            suffix = f" (x{len(group)})" if len(group) > 1 else ""
+            line = f"  - [{severity}] {group[0].get('message', '')}{suffix}"
+        ranked.append(((SEVERITY_RANK.get(severity, 0), len(group), similarity), line))
+
+    ranked.sort(key=lambda item: item[0], reverse=True)
+    lines = [line for _, line in ranked[:max_lines]]
+    if len(ranked) > max_lines:
+        lines.append(f"  - ... {len(ranked) - max_lines} lower-priority alert(s) omitted")
+    return lines
+
+
+def summary_header(summary: str) -> str:
+    """Rule-based longitudinal summary without its per-alert listing."""
+    return summary.split("\n\n", 1)[0]
@@ -12,11 +12,14 @@ Analyzes call transcripts from Zingage for linguistic markers including:
 
 import re
 import math
+import time
 from collections import Counter
 from dataclasses import dataclass, field
 from difflib import SequenceMatcher
 from datetime import datetime
 
+from metrics.registry import registry
+
 
 # --- Constants ---
 
@@ -895,14 +898,48 @@ class TranscriptAnalyzer:
                 return "elevated"
 
 
+ANALYSIS_DURATION = registry.histogram(
+    "analysis_duration_seconds", "Rule-based analysis time.", ("kind",)
+)
+ANALYSIS_RISK_SCORE = registry.histogram(
+    "analysis_risk_score", "Risk score of analyzed transcripts.",
+    buckets=(10, 20, 30, 40, 50, 60, 70, 80, 90, 100),
+)
+ANALYSIS_WORDS = registry.histogram(
+    "analysis_transcript_words", "Words per analyzed transcript.",
+    buckets=(50, 100, 250, 500, 1000, 2500, 5000, 10000),
+)
+
+
+def analyze_transcript_result(transcript: str, session_id: str = "", session_date: str = "") -> TranscriptAnalysis:
+    """
+    Analyze a single transcript and return the dataclass, for callers that
+    encode it directly (see payloads.json_bytes).
+    """
+    started = time.perf_counter()
+    analyzer = TranscriptAnalyzer()
+    result = analyzer.analyze(transcript, session_id, session_date)
+    ANALYSIS_DURATION.labels("transcript").observe(time.perf_counter() - started)
+    ANALYSIS_RISK_SCORE.observe(result.risk_score)
+    ANALYSIS_WORDS.observe(result.total_words)
+    return result
+
+
+def analyze_sessions_result(sessions: list[dict]) -> LongitudinalAnalysis:
+    """Longitudinal analysis as the dataclass; see analyze_sessions for the input shape."""
+    started = time.perf_counter()
+    analyzer = TranscriptAnalyzer()
+    result = analyzer.analyze_longitudinal(sessions)
+    ANALYSIS_DURATION.labels("sessions").observe(time.perf_counter() - started)
+    return result
+
+
 def analyze_transcript(transcript: str, session_id: str = "", session_date: str = "") -> dict:
     """
     Convenience function for analyzing a single transcript.
     Returns a serializable dict.
     """
-    analyzer = TranscriptAnalyzer()
-    result = analyzer.analyze(transcript, session_id, session_date)
-    return _analysis_to_dict(result)
+    return _analysis_to_dict(analyze_transcript_result(transcript, session_id, session_date))
 
 
 def analyze_sessions(sessions: list[dict]) -> dict:
@@ -911,9 +948,7 @@ def analyze_sessions(sessions: list[dict]) -> dict:
     Each session: {"text": str, "session_id": str, "date": str}
     Returns a serializable dict.
     """
-    analyzer = TranscriptAnalyzer()
-    result = analyzer.analyze_longitudinal(sessions)
-    return _longitudinal_to_dict(result)
+    return _longitudinal_to_dict(analyze_sessions_result(sessions))
 
 
 def _analysis_to_dict(a: TranscriptAnalysis) -> dict:
@@ -0,0 +1,134 @@
+"""
+WHOOP anomaly detection (whoop/anomalies.py) over a large synthetic batch.
+
+Generates a year of daily recovery and sleep records for thousands of
+elders, each with their own baseline, day-to-day noise, missing days and a
+slow drift, and injects a few abnormal days per elder (low HRV, high resting
+heart rate, low SpO2). Then times:
+
+* matrix:    recovery records -> elders x days matrices (the Python part)
+* robust:    rolling median / MAD over the trailing window, all elders at once
+* ewma:      EWMA mean / std, all elders at once
+* detect:    detect_anomalies end to end, as /whoop/anomalies runs it
+
+and reports how many injected days were flagged, and how many ordinary
+days were flagged too.
+
+Usage (from backend/):
+    python -m bench.bench_anomalies
+    python -m bench.bench_anomalies --elders 5000 --days 365
+"""
+
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from whoop.anomalies import WINDOW_DAYS, daily_matrices, detect_anomalies, ewma, rolling_median_mad
+
+# metric: (resource, field, typical baseline range, daily noise, injected shift)
+SYNTHETIC = {
+    "hrv": ("recovery", "hrv_rmssd_milli", (20, 80), 0.08, -0.45),
+    "resting_hr": ("recovery", "resting_heart_rate", (50, 75), 2.0, 14.0),
+    "spo2": ("recovery", "spo2_percentage", (94, 98), 0.5, -5.0),
+    "skin_temp": ("recovery", "skin_temp_celsius", (33, 35), 0.15, 0.0),
+    "respiratory_rate": ("sleep", "respiratory_rate", (13, 17), 0.4, 0.0),
+}
+
+
+def synthetic_batch(elders: int, days: int, end: date, anomalies_per_elder: int, seed: int = 50):
+    """({elder_id: {resource: records}}, {(elder_id, metric, date)} injected)."""
+    rng = random.Random(seed)
+    batch, injected = {}, set()
+    for i in range(elders):
+        elder_id = f"elder-{i:05d}"
+        base = {m: rng.uniform(*spec[2]) for m, spec in SYNTHETIC.items()}
+        drift = rng.uniform(-0.1, 0.1)  # per 100 days, relative
+        odd_days = set(rng.sample(range(WINDOW_DAYS + 14, days), anomalies_per_elder))
+        offset = rng.choice(["-08:00", "-05:00", "+00:00", "+01:00"])
+        recovery, sleep = [], []
+        for d in range(days):
+            if rng.random() < 0.1:  # not worn
+                continue
+            day = end - timedelta(days=days - 1 - d)
+            start = datetime(day.year, day.month, day.day, 15, tzinfo=timezone.utc).isoformat()
+            scores = {}
+            for metric, (_, field, _, noise, shift) in SYNTHETIC.items():
+                value = base[metric] * (1 + drift * d / 100)
+                if metric == "hrv":
+                    value *= 1 + rng.gauss(0, noise)
+                else:
+                    value += rng.gauss(0, noise)
+                if d in odd_days and shift:
+                    value = value * (1 + shift) if metric == "hrv" else value + shift
+                    injected.add((elder_id, metric, day.isoformat()))
+                scores[field] = round(value, 2)
+            common = {"start": start, "created_at": start, "updated_at": start, "timezone_offset": offset}
+            recovery.append({**common, "score": {k: scores[k] for k in
+                             ("hrv_rmssd_milli", "resting_heart_rate", "spo2_percentage", "skin_temp_celsius")}})
+            sleep.append({**common, "score": {"respiratory_rate": scores["respiratory_rate"]}})
+        batch[elder_id] = {"recovery": recovery, "sleep": sleep}
+    return batch, injected
+
+
+def _time(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--elders", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--anomalies", type=int, default=3, help="injected abnormal days per elder")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    end = date(2026, 6, 30)
+    print(f"generating {args.elders} elders x {args.days} days ...")
+    batch, injected = synthetic_batch(args.elders, args.days, end, args.anomalies)
+    records = sum(len(r) for resources in batch.values() for r in resources.values())
+    first_day = end - timedelta(days=args.days - 1)
+    detect_days = args.days - WINDOW_DAYS
+
+    series = [batch[e]["recovery"] for e in batch]
+    fields = [SYNTHETIC[m][1] for m in SYNTHETIC if SYNTHETIC[m][0] == "recovery"]
+    hrv = daily_matrices(series, fields, first_day, args.days)["hrv_rmssd_milli"]
+    result = {}
+
+    def detect():
+        result.update(detect_anomalies(batch, end=end, days=detect_days))
+
+    timings = {
+        "matrix": _time(lambda: daily_matrices(series, fields, first_day, args.days), args.repeat),
+        "robust": _time(lambda: rolling_median_mad(hrv), args.repeat),
+        "ewma": _time(lambda: ewma(hrv), args.repeat),
+        "detect": _time(detect, args.repeat),
+    }
+
+    print(f"\n{records} records, {hrv.size} elder-days per metric, {len(SYNTHETIC)} metrics\n")
+    for name, seconds in timings.items():
+        note = {"matrix": " (recovery, 4 metrics)", "detect": None}.get(name, " (one metric)")
+        note = note if note is not None else f" (all metrics, {hrv.size * len(SYNTHETIC) / seconds / 1e6:.1f}M elder-days/s)"
+        print(f"  {name:<8} {seconds * 1000:9.1f} ms{note}")
+
+    flagged = {
+        (elder_id, metric, anomaly["date"])
+        for elder_id, metrics in result.items()
+        for metric, scored in metrics.items()
+        for anomaly in scored["anomalies"]
+    }
+    scored_days = sum(scored["days"] for metrics in result.values() for scored in metrics.values())
+    found = len(flagged & injected)
+    false = len(flagged - injected)
+    print(f"\n  injected abnormal days    {len(injected)}")
+    print(f"  flagged                   {found} ({found / max(1, len(injected)):.1%})")
+    print(f"  false positives           {false} ({false / max(1, scored_days - len(injected)):.2%} of normal days)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Cold-start budget for the backend.
+
+Starts fresh interpreters that import ``server`` and serve one GET /health
+through the ASGI app (no network), the work a serverless cold start does
+before its first response. It reports the median import and
+time-to-first-request and the slowest modules from ``python -X importtime``.
+It fails (exit 1) if the median import exceeds the budget or if a heavy SDK
+is imported at startup instead of on first use.
+
+Usage (from backend/):
+    python -m bench.bench_import_time
+    python -m bench.bench_import_time --runs 10 --budget-ms 600 --top 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_BUDGET_MS = 800
+
+# Must only be imported when the integration is first used.
+LAZY_MODULES = ("anthropic", "boto3", "botocore", "requests", "httpx", "numpy", "brotli")
+
+_PROBE = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import server
+imported = time.perf_counter()
+
+async def first_request():
+    messages = []
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": "/health", "raw_path": b"/health", "query_string": b"",
+             "root_path": "", "headers": [], "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80)}
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        messages.append(message)
+    await server.app(scope, receive, send)
+    return messages[0]["status"]
+
+status = asyncio.run(first_request())
+served = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_request_ms": (served - started) * 1000,
+    "status": status,
+    "eager": sorted(m for m in %r if m in sys.modules),
+}))
+"""
+
+
+def _env(workdir: str) -> dict:
+    env = {k: v for k, v in os.environ.items() if not k.startswith(("WHOOP_", "ANTHROPIC_"))}
+    env.update(SESSION_DB_PATH=os.path.join(workdir, "sessions.db"), PYTHONPATH=str(BACKEND_DIR))
+    return env
+
+
+def _probe(env: dict) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE % (LAZY_MODULES,)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _importtime(env: dict) -> list[tuple[int, int, str]]:
+    """(self_us, cumulative_us, module) for every module imported by ``import server``."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()[1:]))  # keep the nesting indent
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", DEFAULT_BUDGET_MS)))
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="importtime-") as workdir:
+        env = _env(workdir)
+        _probe(env)  # warm the filesystem and bytecode caches; cold-start pays those once per image
+        probes = [_probe(env) for _ in range(args.runs)]
+        rows = _importtime(env)
+
+    import_ms = statistics.median(p["import_ms"] for p in probes)
+    first_ms = statistics.median(p["first_request_ms"] for p in probes)
+    eager = sorted({m for p in probes for m in p["eager"]})
+
+    print(f"import server:        median {import_ms:7.1f} ms  (budget {args.budget_ms:g} ms)")
+    print(f"first GET /health:    median {first_ms:7.1f} ms  (status {probes[0]['status']})")
+    print(f"\nslowest modules (cumulative, top-level imports of server):")
+    top_level = [r for r in rows if r[2].startswith("  ") and not r[2].startswith("   ")]
+    for self_us, cumulative_us, name in sorted(top_level, key=lambda r: -r[1])[: args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name.strip()}")
+    print(f"\nslowest modules (self time):")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda r: -r[0])[: args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  {name.strip()}")
+
+    failures = []
+    if import_ms > args.budget_ms:
+        failures.append(f"import took {import_ms:.0f} ms, over the {args.budget_ms:g} ms budget")
+    if eager:
+        failures.append(f"imported at startup instead of on first use: {', '.join(eager)}")
+    if probes[0]["status"] != 200:
+        failures.append(f"GET /health returned {probes[0]['status']}")
+    if failures:
+        print("\nFAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
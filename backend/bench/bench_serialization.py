@@ -0,0 +1,143 @@
+"""
+Response serialization and compression, before and after.
+
+Builds a realistic /analyze-sessions result (varied transcripts, so marker
+evidence and raw metrics have production-like size) and a page of stored
+sessions, then times:
+
+* fastapi:  jsonable_encoder + JSONResponse.render, FastAPI's default path
+* bytes:    payloads.json_bytes on the dataclasses / dicts (orjson if installed)
+* cached:   payloads.EncodedCache hits, as /sessions serves unchanged sessions
+
+and reports body sizes raw, gzip and brotli (when the package is installed).
+
+Usage (from backend/):
+    python -m bench.bench_serialization
+    python -m bench.bench_serialization --sessions 30 --repeat 50
+"""
+
+import argparse
+import gzip
+import random
+import statistics
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from analysis.transcript_analyzer import _longitudinal_to_dict, analyze_sessions_result
+from payloads import EncodedCache, join_json_array, json_bytes
+from payloads.serialization import _get_orjson
+
+
+OPENERS = [
+    "Good morning, how did you sleep last night?",
+    "Hi there, it's Tuesday, did you have breakfast yet?",
+    "Hello again, how is your knee feeling today?",
+    "Afternoon! Did your daughter visit over the weekend?",
+]
+# Elder turns are assembled from fragments so sessions rarely repeat whole
+# sentences; a small fixed pool makes cross-session repetition alerts explode.
+SUBJECTS = ["I", "My daughter", "The nurse", "My grandson", "Margaret next door", "We", "The doctor", "My husband"]
+VERBS = ["went to", "talked about", "forgot about", "cleaned", "walked past", "asked about", "looked for", "fixed"]
+OBJECTS = ["the garden", "the, um, the thing with the noodles", "the post office", "the big brown dog",
+           "the tomatoes", "my pills", "the porch", "that detective show", "the church bake sale", "the kitchen sink"]
+WHENS = ["this morning", "on Thursday, or maybe Wednesday", "last week", "after lunch", "years ago",
+         "yesterday afternoon", "before the rain", "you know, the other day"]
+DETAILS = ("apples blanket bus cousin curtains doorbell envelope fence glasses hallway hymn iron jam kettle "
+           "ladder letter mailbox marmalade mittens needle newspaper orchard parlor piano quilt radio recipe "
+           "sandals scarf sewing shovel sparrow stamps stove suitcase teapot thermos thimble ticket tulips "
+           "umbrella vase wallet wheelbarrow window yarn").split()
+# Under six words, so the agent's stock prompts are not scored as cross-session repetition.
+AGENT_LINES = ["Tell me more.", "Did you drink water?", "How was dinner?", "How are you feeling?", "That sounds lovely."]
+
+
+def _transcript(rng: random.Random, turns: int) -> str:
+    lines = [f"Agent: {rng.choice(OPENERS)}"]
+    for _ in range(turns):
+        sentences = [
+            f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(WHENS)}, "
+            f"with the {' and the '.join(rng.sample(DETAILS, 2))}."
+            for _ in range(rng.randint(1, 3))
+        ]
+        lines.append(f"Elder: {' '.join(sentences)}")
+        lines.append(f"Agent: {rng.choice(AGENT_LINES)}")
+    return "\n".join(lines)
+
+
+def _time(fn, repeat: int) -> float:
+    """Median milliseconds per call."""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def _sizes(body: bytes) -> str:
+    parts = [f"raw {len(body) / 1024:8.1f} KiB", f"gzip {len(gzip.compress(body, 6, mtime=0)) / 1024:7.1f} KiB"]
+    try:
+        import brotli
+    except ImportError:
+        parts.append("brotli n/a (not installed)")
+    else:
+        parts.append(f"brotli {len(brotli.compress(body, quality=4)) / 1024:7.1f} KiB")
+    return "  ".join(parts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=20, help="sessions in the longitudinal analysis")
+    parser.add_argument("--turns", type=int, default=40, help="elder/agent turns per transcript")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    sessions = [
+        {"text": _transcript(rng, args.turns), "session_id": f"s{i}", "date": f"2026-0{1 + i // 28 % 9}-{1 + i % 28:02d}"}
+        for i in range(args.sessions)
+    ]
+    analysis = analyze_sessions_result(sessions)
+    as_dict = _longitudinal_to_dict(analysis)
+    stored = [
+        {"id": i, "version": i, "elder_id": "e1", "session_id": s.session_id, "session_date": s.session_date,
+         "analysis_result": {"risk_score": s.risk_score, "rule_based": r}}
+        for i, (s, r) in enumerate(zip(analysis.sessions, as_dict["sessions"]), 1)
+    ]
+
+    print(f"encoder: {'orjson' if _get_orjson() else 'stdlib json'}\n")
+
+    page_cache = EncodedCache()
+    cases = (
+        (
+            "analyze-sessions",
+            # The old endpoint built the dict from the dataclasses, then FastAPI re-encoded it.
+            lambda: JSONResponse(jsonable_encoder(_longitudinal_to_dict(analysis))).body,
+            lambda: json_bytes(analysis),
+            None,  # computed per request, nothing to cache
+        ),
+        (
+            f"sessions page ({len(stored)})",
+            lambda: JSONResponse(jsonable_encoder(stored)).body,
+            lambda: json_bytes(stored),
+            lambda: join_json_array(
+                [page_cache.get_or_encode((e["id"], e["version"]), lambda e=e: e) for e in stored]
+            ),
+        ),
+    )
+    for name, default, encoded, cached in cases:
+        default_ms = _time(default, args.repeat)
+        encoded_ms = _time(encoded, args.repeat)
+        print(name)
+        print(f"  fastapi default  {default_ms:8.2f} ms   {_sizes(default())}")
+        print(f"  json_bytes       {encoded_ms:8.2f} ms   {_sizes(encoded())}   ({default_ms / encoded_ms:,.0f}x faster)")
+        if cached is not None:
+            cached_ms = _time(cached, args.repeat)
+            print(f"  cached bytes     {cached_ms:8.3f} ms   ({default_ms / cached_ms:,.0f}x faster)")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark for sessions.SQLiteSessionStore at production scale.
+
+Inserts N synthetic sessions (default 1,000,000) spread over 1,000 elders,
+then times the hot read paths: latest per elder, lookup by session_id and
+a 30-day date range for one elder. Also reports peak RSS to show the server
+holds no session data in memory.
+
+Usage (from backend/):
+    python -m bench.bench_session_store --n 1000000 --db /tmp/bench_sessions.db
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import time
+from datetime import date, timedelta
+
+from sessions import SQLiteSessionStore
+
+
+def _synthetic_entries(n: int, elders: int, batch: int):
+    start = date(2024, 1, 1)
+    for offset in range(0, n, batch):
+        yield [
+            {
+                "elder_id": f"elder-{i % elders}",
+                "session_id": f"call-{i}",
+                "session_date": (start + timedelta(days=(i // elders) % 730)).isoformat(),
+                "transcript": "Well, I went to the market this morning and bought some apples.",
+                "analysis_result": {"risk_score": round(random.random() * 100, 1), "ai_summary": "..."},
+            }
+            for i in range(offset, min(offset + batch, n))
+        ]
+
+
+def _time_ms(fn, repeats: int) -> dict:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p99_ms": round(samples[int(len(samples) * 0.99) - 1], 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--n", type=int, default=1_000_000)
+    parser.add_argument("--elders", type=int, default=1_000)
+    parser.add_argument("--db", default="/tmp/bench_sessions.db")
+    parser.add_argument("--repeats", type=int, default=1_000)
+    args = parser.parse_args()
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+    store = SQLiteSessionStore(args.db)
+
+    started = time.perf_counter()
+    for entries in _synthetic_entries(args.n, args.elders, batch=10_000):
+        store.add_many(entries)
+    insert_s = time.perf_counter() - started
+
+    rng = random.Random(0)
+    results = {
+        "sessions": args.n,
+        "elders": args.elders,
+        "bulk_insert_per_s": round(args.n / insert_s),
+        "single_insert": _time_ms(lambda: store.add({
+            "elder_id": "elder-0", "session_id": "bench", "session_date": "2026-01-01",
+            "transcript": "", "analysis_result": {"risk_score": 1.0},
+        }), 200),
+        "latest_any": _time_ms(lambda: store.latest(), args.repeats),
+        "latest_by_elder": _time_ms(lambda: store.latest(f"elder-{rng.randrange(args.elders)}"), args.repeats),
+        "get_by_session_id": _time_ms(lambda: store.get(f"call-{rng.randrange(args.n)}"), args.repeats),
+        "elder_30_day_range": _time_ms(
+            lambda: store.query(f"elder-{rng.randrange(args.elders)}", "2024-03-01", "2024-03-30"), 200
+        ),
+        "db_size_mb": round(os.path.getsize(args.db) / 1e6, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
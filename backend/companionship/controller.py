@@ -1,13 +1,51 @@
 import os
+import threading
+import time
 import uuid
 
-import boto3
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
+from metrics.registry import registry
+from shared_state import shared_state
+
 router = APIRouter()
 
-_sync_in_progress = False
+# Set by the photo sync client; kept in shared_state so every worker sees it.
+# The TTL clears the flag if a sync dies without calling /sync-finished.
+SYNC_IN_PROGRESS_KEY = "companionship:sync_in_progress"
+SYNC_IN_PROGRESS_TTL_SECONDS = 30 * 60
+
+
+def _sync_in_progress() -> bool:
+    return bool(shared_state.get(SYNC_IN_PROGRESS_KEY, False))
+
+
+PRESIGNED_URLS = registry.counter(
+    "companionship_presigned_urls_total", "S3 presigned URLs issued.", ("operation",)
+)
+S3_LIST_DURATION = registry.histogram(
+    "companionship_s3_list_duration_seconds", "Time to list a family's photos in S3."
+)
+registry.gauge(
+    "companionship_sync_in_progress", "1 while a photo sync is running."
+).set_function(_sync_in_progress)
+
+
+_s3_client = None
+_s3_lock = threading.Lock()
+
+
+def _s3():
+    """Process-wide S3 client; boto3 is imported and the client built on first use."""
+    global _s3_client
+    if _s3_client is None:
+        with _s3_lock:
+            if _s3_client is None:
+                import boto3
+
+                _s3_client = boto3.client("s3")
+    return _s3_client
 
 
 def _get_bucket():
@@ -33,38 +71,38 @@ async def get_upload_presign(req: PresignRequest):
     safe_name = os.path.basename(req.filename) or "image.jpg"
     key = f"families/{req.family_id}/{uuid.uuid4().hex}_{safe_name}"
 
-    s3 = boto3.client("s3")
+    s3 = _s3()
     url = s3.generate_presigned_url(
         "put_object",
         Params={"Bucket": bucket, "Key": key, "ContentType": req.content_type},
         ExpiresIn=900,
     )
+    PRESIGNED_URLS.labels("put_object").inc()
     return {"upload_url": url, "key": key}
 
 
 @router.post("/get-download-presign")
 async def get_download_presign(req: DownloadPresignRequest):
     bucket = _get_bucket()
-    s3 = boto3.client("s3")
+    s3 = _s3()
     url = s3.generate_presigned_url(
         "get_object",
         Params={"Bucket": bucket, "Key": req.key},
         ExpiresIn=900,
     )
+    PRESIGNED_URLS.labels("get_object").inc()
     return {"download_url": url}
 
 
 @router.post("/sync-started")
 async def sync_started():
-    global _sync_in_progress
-    _sync_in_progress = True
+    shared_state.set(SYNC_IN_PROGRESS_KEY, True, ttl=SYNC_IN_PROGRESS_TTL_SECONDS)
     return {"ok": True}
 
 
 @router.post("/sync-finished")
 async def sync_finished():
-    global _sync_in_progress
-    _sync_in_progress = False
+    shared_state.delete(SYNC_IN_PROGRESS_KEY)
     return {"ok": True}
 
 
@@ -75,8 +113,9 @@ LATEST_PHOTOS_LIMIT = 5
 async def family_photos(family_id: str = "default"):
     bucket = _get_bucket()
     prefix = f"families/{family_id}/"
-    s3 = boto3.client("s3")
+    s3 = _s3()
     paginator = s3.get_paginator("list_objects_v2")
+    started = time.perf_counter()
     objects = []
     pages_info = []
     for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
@@ -91,6 +130,7 @@ async def family_photos(family_id: str = "default"):
                 objects.append(
                     {"Key": key, "LastModified": obj.get("LastModified") or ""}
                 )
+    S3_LIST_DURATION.observe(time.perf_counter() - started)
     sorted_objects_debug = [{"Key": o["Key"], "LastModified": str(o["LastModified"])} for o in objects]
     objects.sort(key=lambda x: x["LastModified"], reverse=True)
     latest = objects[:LATEST_PHOTOS_LIMIT]
@@ -102,9 +142,10 @@ async def family_photos(family_id: str = "default"):
             ExpiresIn=900,
         )
         urls.append(url)
+    PRESIGNED_URLS.labels("get_object").inc(len(urls))
     result = {
         "photos": urls,
-        "syncing": _sync_in_progress,
+        "syncing": _sync_in_progress(),
         "debug": {
             "family_id": family_id,
             "bucket": bucket,
@@ -0,0 +1,4 @@
+from .store import JobStore, SQLiteJobStore, InMemoryJobStore, get_job_store
+from .queue import JobQueue
+
+__all__ = ["JobStore", "SQLiteJobStore", "InMemoryJobStore", "get_job_store", "JobQueue"]
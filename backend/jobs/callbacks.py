@@ -0,0 +1,65 @@
+"""
+Validation of job callback URLs.
+
+Finished jobs are POSTed to the callback_url the client supplied, with elder
+analysis results in the body, so the server must not be usable to reach its
+own network (server-side request forgery). A callback URL must:
+
+* use https;
+* name a host in JOB_CALLBACK_HOSTS when that is set (comma-separated; a
+  leading dot, e.g. ".example.com", also allows its subdomains);
+* resolve only to public addresses: private, loopback, link-local (cloud
+  metadata endpoints), multicast, reserved and unspecified ones are rejected.
+
+URLs are checked when the job is submitted and again just before delivery,
+since DNS answers can change in between; delivery does not follow redirects.
+"""
+
+import ipaddress
+import os
+import socket
+from urllib.parse import urlsplit
+
+
+ALLOWED_HOSTS = [h.strip().lower() for h in os.getenv("JOB_CALLBACK_HOSTS", "").split(",") if h.strip()]
+
+
+class CallbackURLError(ValueError):
+    """The callback URL is not allowed."""
+
+
+def _host_allowed(host: str) -> bool:
+    if not ALLOWED_HOSTS:
+        return True
+    return any(host == h or (h.startswith(".") and host.endswith(h)) for h in ALLOWED_HOSTS)
+
+
+def _public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])  # drop an IPv6 scope id
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def check_callback_url(url: str) -> None:
+    """Raise CallbackURLError unless ``url`` is an https URL on an allowed host with only public addresses."""
+    try:
+        parts = urlsplit(url)
+        port = parts.port or 443
+    except ValueError as e:
+        raise CallbackURLError(f"invalid callback_url: {e}") from None
+    if parts.scheme != "https":
+        raise CallbackURLError("callback_url must use https")
+    host = (parts.hostname or "").lower()
+    if not host:
+        raise CallbackURLError("callback_url has no host")
+    if parts.username or parts.password:
+        raise CallbackURLError("callback_url may not contain credentials")
+    if not _host_allowed(host):
+        raise CallbackURLError(f"callback_url host {host!r} is not in JOB_CALLBACK_HOSTS")
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+    except OSError as e:
+        raise CallbackURLError(f"callback_url host {host!r} does not resolve: {e}") from None
+    if not addresses or not all(_public(a) for a in addresses):
+        raise CallbackURLError(f"callback_url host {host!r} resolves to a non-public address")
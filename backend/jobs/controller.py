@@ -0,0 +1,41 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException
+
+from jobs.queue import JobQueue, job_workers
+from jobs.store import get_job_store
+from metrics.registry import render_family, registry
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+# Shared queue; workers are started by the app lifespan in server.py
+job_queue = JobQueue(get_job_store(), workers=job_workers())
+
+registry.register_collector(
+    lambda: render_family("jobs", "gauge", "Background jobs by status.",
+                          [({"status": k}, v) for k, v in sorted(job_queue.store.counts().items())])
+)
+
+PUBLIC_FIELDS = (
+    "id", "kind", "status", "priority", "attempts", "max_attempts", "result", "error",
+    "callback_status", "created_at", "updated_at",
+)
+
+
+def job_status(job: dict) -> dict:
+    return {k: job.get(k) for k in PUBLIC_FIELDS}
+
+
+@router.get("")
+async def get_job_counts():
+    """Number of jobs per status."""
+    return await asyncio.to_thread(job_queue.store.counts)
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    """Poll a background job; ``result`` is set once ``status`` is "succeeded"."""
+    job = await asyncio.to_thread(job_queue.store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(job)
@@ -0,0 +1,175 @@
+"""
+Bounded worker pool for slow (Claude-backed) work.
+
+Endpoints submit a job and return its id straight away; JobQueue workers
+claim jobs from the store, run the handler registered for the job's kind
+and record the result. A handler that raises is retried with exponential
+backoff until max_attempts; after the last attempt the kind's fallback (if
+any) produces the result instead, e.g. the rule-based summary, so callers
+still get an answer when Claude is down. Finished jobs are POSTed to their
+callback_url when one was given; callback URLs are restricted to public
+https hosts (see jobs/callbacks.py).
+
+A job whose worker died on its last attempt is failed once its lease
+expires rather than run again past max_attempts. A worker that outlives
+its lease has its result dropped, not written over the re-claimed attempt.
+
+submit() validates the callback URL (a DNS lookup) and writes to SQLite,
+so async endpoints call it through asyncio.to_thread.
+"""
+
+import os
+import threading
+import time
+import traceback
+
+from jobs.callbacks import CallbackURLError, check_callback_url
+from jobs.store import JobStore
+
+
+DEFAULT_WORKERS = 4
+LEASE_SECONDS = 600
+RETRY_BASE_SECONDS = 5.0
+RETRY_MAX_SECONDS = 300.0
+POLL_INTERVAL = 1.0
+CALLBACK_TIMEOUT = 10
+CALLBACK_ATTEMPTS = 3
+RETENTION_SECONDS = 7 * 86400
+
+
+class JobQueue:
+    def __init__(self, store: JobStore, workers: int = DEFAULT_WORKERS):
+        self.store = store
+        self.workers = workers
+        self._handlers: dict[str, tuple] = {}
+        self._wake = threading.Condition()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def register(self, kind: str, handler, fallback=None) -> None:
+        """``handler(payload) -> result``; ``fallback(payload, error) -> result`` runs when retries are exhausted."""
+        self._handlers[kind] = (handler, fallback)
+
+    def submit(self, kind: str, payload: dict, priority: str = "live",
+               callback_url: str | None = None, max_attempts: int = 3) -> dict:
+        if kind not in self._handlers:
+            raise ValueError(f"no handler registered for job kind {kind!r}")
+        if callback_url:
+            check_callback_url(callback_url)  # CallbackURLError
+        job = self.store.submit(kind, payload, priority, max_attempts, callback_url)
+        with self._wake:
+            self._wake.notify()
+        return job
+
+    # --- Workers ---
+
+    def start(self) -> None:
+        """Start the worker threads (idempotent). Jobs left queued by a previous process are picked up."""
+        with self._lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            pruned = self.store.prune(RETENTION_SECONDS)
+            if pruned:
+                print(f"[jobs] pruned {pruned} finished jobs")
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the workers; a job interrupted mid-run is reclaimed after its lease expires."""
+        with self._lock:
+            self._stop.set()
+            with self._wake:
+                self._wake.notify_all()
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            try:
+                for job_id in self.store.fail_expired():
+                    print(f"[jobs] {job_id} lost its worker on the last attempt; failed")
+                    self._notify(job_id)
+                job = self.store.claim(LEASE_SECONDS)
+            except Exception as e:
+                print(f"[jobs] claim failed: {e}")
+                job = None
+            if job is None:
+                # Woken early by submit(); the timeout covers delayed retries and other processes.
+                with self._wake:
+                    self._wake.wait(POLL_INTERVAL)
+                continue
+            self.run_job(job)
+
+    def run_job(self, job: dict) -> None:
+        """Run one claimed job to its next state."""
+        handler, fallback = self._handlers.get(job["kind"], (None, None))
+        started = time.perf_counter()
+        error = None
+        try:
+            if handler is None:
+                raise LookupError(f"no handler registered for job kind {job['kind']!r}")
+            result = handler(job["payload"])
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"[:500]
+            if handler is not None and job["attempts"] < job["max_attempts"]:
+                delay = min(RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1), RETRY_MAX_SECONDS)
+                print(f"[jobs] {job['kind']} {job['id']} attempt {job['attempts']} failed, retrying in {delay:.0f}s: {error}")
+                self._finish(job, self.store.fail(job["id"], error, retry_at=time.time() + delay,
+                                                  attempt=job["attempts"]), notify=False)
+                return
+            print(f"[jobs] {job['kind']} {job['id']} failed after {job['attempts']} attempts: {error}")
+            if fallback is None:
+                self._finish(job, self.store.fail(job["id"], error, attempt=job["attempts"]))
+                return
+            try:
+                result = fallback(job["payload"], e)
+            except Exception:
+                traceback.print_exc()
+                self._finish(job, self.store.fail(job["id"], error, attempt=job["attempts"]))
+                return
+        print(f"[jobs] {job['kind']} {job['id']} done in {time.perf_counter() - started:.2f}s")
+        self._finish(job, self.store.complete(job["id"], result, error, attempt=job["attempts"]))
+
+    def _finish(self, job: dict, recorded: bool, notify: bool = True) -> None:
+        if not recorded:
+            # Our lease expired and the job was re-claimed (or failed); that attempt owns the result.
+            print(f"[jobs] {job['kind']} {job['id']} attempt {job['attempts']} outlived its lease; result dropped")
+        elif notify:
+            self._notify(job["id"])
+
+    def _notify(self, job_id: str) -> None:
+        job = self.store.get(job_id)
+        if not job or not job["callback_url"]:
+            return
+        try:
+            # Again at delivery: the host may resolve differently than at submit time.
+            check_callback_url(job["callback_url"])
+        except CallbackURLError as e:
+            print(f"[jobs] callback for {job_id} refused: {e}")
+            self.store.set_callback_status(job_id, "refused")
+            return
+        import requests
+
+        body = {k: job[k] for k in ("id", "kind", "status", "result", "error", "attempts")}
+        status = "failed"
+        for attempt in range(CALLBACK_ATTEMPTS):
+            try:
+                response = requests.post(
+                    job["callback_url"], json=body, timeout=CALLBACK_TIMEOUT, allow_redirects=False
+                )
+                if response.status_code < 500:
+                    status = f"delivered:{response.status_code}"
+                    break
+            except requests.RequestException as e:
+                print(f"[jobs] callback for {job_id} failed: {e}")
+            time.sleep(2 ** attempt)
+        self.store.set_callback_status(job_id, status)
+
+
+def job_workers() -> int:
+    return max(1, int(os.getenv("JOB_WORKERS", DEFAULT_WORKERS)))
@@ -0,0 +1,327 @@
+"""
+Persistent job records for the background job queue.
+
+A job is a (kind, payload) pair that a registered handler turns into a
+result. Jobs move queued -> running -> succeeded | failed; a failed attempt
+with retries left goes back to queued with a later ``run_after``. Running
+jobs hold a lease, so work claimed by a worker that died (restart, crash,
+serverless freeze) becomes claimable again once the lease expires.
+Workers pass their attempt number to complete() and fail(), so a worker
+that outlived its lease cannot overwrite the re-claimed attempt's result.
+
+SQLiteJobStore shares the database file with the session store by default
+and is safe across threads and worker processes; claiming is a single
+UPDATE ... RETURNING, so two workers never run the same attempt.
+InMemoryJobStore has the same interface for tests and local experiments.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent / "sessions.db"
+
+# Lower runs first: live requests from the dashboard ahead of backfills.
+PRIORITIES = {"live": 0, "backfill": 10}
+
+TERMINAL_STATES = ("succeeded", "failed")
+
+LEASE_EXPIRED_ERROR = "lease expired on the last attempt (worker lost)"
+
+
+def _new_job(kind: str, payload: dict, priority: str, max_attempts: int, callback_url: str | None) -> dict:
+    if priority not in PRIORITIES:
+        raise ValueError(f"priority must be one of {', '.join(PRIORITIES)}")
+    now = time.time()
+    return {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "status": "queued",
+        "priority": priority,
+        "payload": payload,
+        "result": None,
+        "error": None,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "callback_url": callback_url,
+        "callback_status": None,
+        "created_at": now,
+        "updated_at": now,
+        "run_after": now,
+        "lease_until": None,
+    }
+
+
+class JobStore:
+    """Interface shared by the job store implementations."""
+
+    def submit(self, kind: str, payload: dict, priority: str = "live",
+               max_attempts: int = 3, callback_url: str | None = None) -> dict:
+        """Persist a new queued job and return it."""
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> dict | None:
+        raise NotImplementedError
+
+    def claim(self, lease_seconds: float) -> dict | None:
+        """
+        Take the next runnable job (highest priority, oldest first) and mark
+        it running with a lease; also reclaims running jobs whose lease ran
+        out, if they have attempts left.
+        """
+        raise NotImplementedError
+
+    def fail_expired(self) -> list[str]:
+        """Fail running jobs whose lease ran out on their last attempt; returns their ids."""
+        raise NotImplementedError
+
+    def complete(self, job_id: str, result, error: str | None = None, attempt: int | None = None) -> bool:
+        """
+        Mark a job succeeded; ``error`` records why a fallback result was used.
+        With ``attempt``, only if the job is still running that attempt (a
+        worker whose lease expired must not overwrite the re-claimed run);
+        returns whether the job was updated.
+        """
+        raise NotImplementedError
+
+    def fail(self, job_id: str, error: str, retry_at: float | None = None, attempt: int | None = None) -> bool:
+        """Record a failed attempt: requeue at ``retry_at``, or fail for good if None. Fenced like complete()."""
+        raise NotImplementedError
+
+    def set_callback_status(self, job_id: str, status: str) -> None:
+        raise NotImplementedError
+
+    def counts(self) -> dict[str, int]:
+        """Number of jobs per status."""
+        raise NotImplementedError
+
+    def prune(self, older_than_seconds: float) -> int:
+        """Delete finished jobs last updated longer ago than ``older_than_seconds``."""
+        raise NotImplementedError
+
+
+class SQLiteJobStore(JobStore):
+    """SQLite (WAL) job store; safe to share between threads and worker processes."""
+
+    def __init__(self, path: str | Path = DEFAULT_DB_PATH):
+        self.path = str(path)
+        self._local = threading.local()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                callback_url TEXT,
+                callback_status TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                run_after REAL NOT NULL,
+                lease_until REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_runnable ON jobs (status, priority, run_after);
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _job(row: sqlite3.Row | None) -> dict | None:
+        if row is None:
+            return None
+        job = dict(row)
+        job["priority"] = next(k for k, v in PRIORITIES.items() if v == job["priority"])
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def submit(self, kind: str, payload: dict, priority: str = "live",
+               max_attempts: int = 3, callback_url: str | None = None) -> dict:
+        job = _new_job(kind, payload, priority, max_attempts, callback_url)
+        self._conn().execute(
+            "INSERT INTO jobs (id, kind, status, priority, payload, attempts, max_attempts, "
+            "callback_url, created_at, updated_at, run_after) VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?)",
+            (job["id"], kind, "queued", PRIORITIES[priority], json.dumps(payload), max_attempts,
+             callback_url, job["created_at"], job["updated_at"], job["run_after"]),
+        )
+        return job
+
+    def get(self, job_id: str) -> dict | None:
+        return self._job(self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def claim(self, lease_seconds: float) -> dict | None:
+        now = time.time()
+        row = self._conn().execute(
+            """
+            UPDATE jobs
+            SET status = 'running', attempts = attempts + 1, updated_at = :now, lease_until = :lease
+            WHERE id = (
+                SELECT id FROM jobs
+                WHERE (status = 'queued' AND run_after <= :now)
+                   OR (status = 'running' AND lease_until < :now AND attempts < max_attempts)
+                ORDER BY priority, run_after
+                LIMIT 1
+            )
+            RETURNING *
+            """,
+            {"now": now, "lease": now + lease_seconds},
+        ).fetchone()
+        return self._job(row)
+
+    def fail_expired(self) -> list[str]:
+        now = time.time()
+        rows = self._conn().execute(
+            "UPDATE jobs SET status = 'failed', error = ?, updated_at = ?, lease_until = NULL "
+            "WHERE status = 'running' AND lease_until < ? AND attempts >= max_attempts RETURNING id",
+            (LEASE_EXPIRED_ERROR, now, now),
+        ).fetchall()
+        return [r["id"] for r in rows]
+
+    @staticmethod
+    def _fence(attempt: int | None) -> tuple[str, tuple]:
+        if attempt is None:
+            return "", ()
+        return " AND status = 'running' AND attempts = ?", (attempt,)
+
+    def complete(self, job_id: str, result, error: str | None = None, attempt: int | None = None) -> bool:
+        fence, args = self._fence(attempt)
+        return self._conn().execute(
+            "UPDATE jobs SET status = 'succeeded', result = ?, error = ?, updated_at = ?, "
+            "lease_until = NULL WHERE id = ?" + fence,
+            (json.dumps(result), error, time.time(), job_id, *args),
+        ).rowcount > 0
+
+    def fail(self, job_id: str, error: str, retry_at: float | None = None, attempt: int | None = None) -> bool:
+        fence, args = self._fence(attempt)
+        if retry_at is None:
+            cursor = self._conn().execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ?, lease_until = NULL "
+                "WHERE id = ?" + fence,
+                (error, time.time(), job_id, *args),
+            )
+        else:
+            cursor = self._conn().execute(
+                "UPDATE jobs SET status = 'queued', error = ?, updated_at = ?, run_after = ?, "
+                "lease_until = NULL WHERE id = ?" + fence,
+                (error, time.time(), retry_at, job_id, *args),
+            )
+        return cursor.rowcount > 0
+
+    def set_callback_status(self, job_id: str, status: str) -> None:
+        self._conn().execute("UPDATE jobs SET callback_status = ? WHERE id = ?", (status, job_id))
+
+    def counts(self) -> dict[str, int]:
+        return dict(self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def prune(self, older_than_seconds: float) -> int:
+        cursor = self._conn().execute(
+            f"DELETE FROM jobs WHERE status IN {TERMINAL_STATES} AND updated_at < ?",
+            (time.time() - older_than_seconds,),
+        )
+        return cursor.rowcount
+
+
+class InMemoryJobStore(JobStore):
+    """Process-local job store (jobs are lost on restart)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: dict[str, dict] = {}
+
+    def submit(self, kind: str, payload: dict, priority: str = "live",
+               max_attempts: int = 3, callback_url: str | None = None) -> dict:
+        job = _new_job(kind, payload, priority, max_attempts, callback_url)
+        with self._lock:
+            self._jobs[job["id"]] = job
+        return dict(job)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def claim(self, lease_seconds: float) -> dict | None:
+        now = time.time()
+        with self._lock:
+            runnable = [
+                j for j in self._jobs.values()
+                if (j["status"] == "queued" and j["run_after"] <= now)
+                or (j["status"] == "running" and j["lease_until"] < now and j["attempts"] < j["max_attempts"])
+            ]
+            if not runnable:
+                return None
+            job = min(runnable, key=lambda j: (PRIORITIES[j["priority"]], j["run_after"]))
+            job.update(status="running", attempts=job["attempts"] + 1, updated_at=now,
+                       lease_until=now + lease_seconds)
+            return dict(job)
+
+    def fail_expired(self) -> list[str]:
+        now = time.time()
+        with self._lock:
+            expired = [
+                j for j in self._jobs.values()
+                if j["status"] == "running" and j["lease_until"] < now and j["attempts"] >= j["max_attempts"]
+            ]
+            for job in expired:
+                job.update(status="failed", error=LEASE_EXPIRED_ERROR, updated_at=now, lease_until=None)
+        return [j["id"] for j in expired]
+
+    def _update(self, job_id: str, attempt: int | None = None, **fields) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or (attempt is not None and (job["status"] != "running" or job["attempts"] != attempt)):
+                return False
+            job.update(updated_at=time.time(), **fields)
+            return True
+
+    def complete(self, job_id: str, result, error: str | None = None, attempt: int | None = None) -> bool:
+        return self._update(job_id, attempt, status="succeeded", result=result, error=error, lease_until=None)
+
+    def fail(self, job_id: str, error: str, retry_at: float | None = None, attempt: int | None = None) -> bool:
+        if retry_at is None:
+            return self._update(job_id, attempt, status="failed", error=error, lease_until=None)
+        return self._update(job_id, attempt, status="queued", error=error, run_after=retry_at, lease_until=None)
+
+    def set_callback_status(self, job_id: str, status: str) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id]["callback_status"] = status
+
+    def counts(self) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return counts
+
+    def prune(self, older_than_seconds: float) -> int:
+        cutoff = time.time() - older_than_seconds
+        with self._lock:
+            stale = [k for k, j in self._jobs.items() if j["status"] in TERMINAL_STATES and j["updated_at"] < cutoff]
+            for k in stale:
+                del self._jobs[k]
+        return len(stale)
+
+
+def get_job_store() -> JobStore:
+    """Store configured by JOB_STORE ("sqlite" or "memory") and JOB_DB_PATH (defaults to SESSION_DB_PATH)."""
+    if os.getenv("JOB_STORE", "sqlite") == "memory":
+        return InMemoryJobStore()
+    return SQLiteJobStore(os.getenv("JOB_DB_PATH") or os.getenv("SESSION_DB_PATH") or str(DEFAULT_DB_PATH))
@@ -0,0 +1,202 @@
+"""
+Circuit breaker shared by every Claude call.
+
+When the API key is invalid or the API is degraded, callers would otherwise
+wait for each request to fail before falling back. The breaker tracks recent
+outcomes and latencies; once the error rate or slow-call rate crosses its
+threshold it opens and rejects calls immediately with CircuitOpenError, so
+endpoints go straight to their rule-based fallbacks. After a cool-down it
+lets a single probe through (half-open) and closes again if the probe
+succeeds.
+
+Only errors that say something about the API's health count as failures:
+connection errors, timeouts, 429 and 5xx. A 400 or a validation error comes
+from one bad request, and the API answering it at all means it is up, so
+such calls count as completed ones.
+"""
+
+import sys
+import time
+from collections import deque
+from threading import Lock
+
+from metrics.registry import render_family, registry
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling Claude while the breaker is open."""
+
+
+def is_breaker_failure(error: Exception) -> bool:
+    """True for transport errors, timeouts, 429 and 5xx; False for errors caused by the request itself."""
+    # anthropic is already imported if it raised; don't import it just for this check.
+    anthropic = sys.modules.get("anthropic")
+    if anthropic is not None:
+        if isinstance(error, anthropic.APIConnectionError):  # includes APITimeoutError
+            return True
+        if isinstance(error, anthropic.APIStatusError):
+            return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+
+class CircuitBreaker:
+    """Error-rate / latency circuit breaker with half-open probing."""
+
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float = 60.0,
+        min_calls: int = 5,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 30.0,
+        slow_call_rate_threshold: float = 0.8,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = Lock()
+        self._calls: deque[tuple[float, bool, bool]] = deque()  # (finished_at, failed, slow)
+        self._state = "closed"
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._last_error = ""
+        self._times_opened = 0
+        self._rejected = 0
+
+    # --- State transitions (call with the lock held) ---
+
+    def _trim(self, now: float) -> None:
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _open(self, now: float, reason: str) -> None:
+        if self._state != "open":
+            self._times_opened += 1
+            print(f"[circuit:{self.name}] open: {reason}")
+        self._state = "open"
+        self._opened_at = now
+        self._half_open_in_flight = 0
+
+    def _close(self) -> None:
+        if self._state != "closed":
+            print(f"[circuit:{self.name}] closed")
+        self._state = "closed"
+        self._calls.clear()
+        self._half_open_in_flight = 0
+
+    # --- Public API ---
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.open_seconds:
+                return "half_open"
+            return self._state
+
+    def allow(self) -> bool:
+        """Reserve a call slot; False means the caller should fall back now."""
+        with self._lock:
+            now = time.monotonic()
+            if self._state == "open" and now - self._opened_at >= self.open_seconds:
+                self._state = "half_open"
+            if self._state == "closed":
+                return True
+            if self._state == "half_open" and self._half_open_in_flight < self.half_open_max_calls:
+                self._half_open_in_flight += 1
+                return True
+            self._rejected += 1
+            return False
+
+    def record(self, latency: float, error: Exception | None = None) -> None:
+        """Record the outcome of a call previously admitted by allow()."""
+        with self._lock:
+            now = time.monotonic()
+            failed = error is not None and is_breaker_failure(error)
+            slow = latency >= self.slow_call_seconds
+            if error is not None:
+                self._last_error = f"{type(error).__name__}: {error}"[:200]
+
+            anthropic = sys.modules.get("anthropic")
+            if anthropic is not None and isinstance(error, anthropic.AuthenticationError):
+                # An invalid key will not fix itself: no point sampling more calls, and a
+                # half-open probe that hits it must re-open the breaker, not close it.
+                self._open(now, "authentication error")
+                return
+
+            if self._state == "half_open":
+                if failed or slow:
+                    self._open(now, "half-open probe failed")
+                else:
+                    self._close()
+                return
+
+            self._calls.append((now, failed, slow))
+            self._trim(now)
+            total = len(self._calls)
+            if total < self.min_calls:
+                return
+            failures = sum(1 for _, f, _ in self._calls if f)
+            slow_calls = sum(1 for _, _, s in self._calls if s)
+            if failures / total >= self.failure_rate_threshold:
+                self._open(now, f"{failures}/{total} calls failed")
+            elif slow_calls / total >= self.slow_call_rate_threshold:
+                self._open(now, f"{slow_calls}/{total} calls slower than {self.slow_call_seconds}s")
+
+    def call(self, fn, *args, **kwargs):
+        """Run ``fn`` through the breaker, raising CircuitOpenError if it is open."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open; skipping call")
+        started = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.record(time.perf_counter() - started, e)
+            raise
+        self.record(time.perf_counter() - started)
+        return result
+
+    def snapshot(self) -> dict:
+        """Breaker state for /health."""
+        state = self.state
+        with self._lock:
+            self._trim(time.monotonic())
+            total = len(self._calls)
+            failures = sum(1 for _, f, _ in self._calls if f)
+            return {
+                "state": state,
+                "window_calls": total,
+                "window_failures": failures,
+                "times_opened": self._times_opened,
+                "rejected_calls": self._rejected,
+                "last_error": self._last_error,
+            }
+
+
+claude_breaker = CircuitBreaker("claude")
+
+
+_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def _collect() -> list[str]:
+    snapshot = claude_breaker.snapshot()
+    labels = {"name": claude_breaker.name}
+    return (
+        render_family("circuit_breaker_state", "gauge", "0 closed, 1 half-open, 2 open.",
+                      [(labels, _STATE_VALUES[snapshot["state"]])])
+        + render_family("circuit_breaker_opened_total", "counter", "Times the breaker opened.",
+                        [(labels, snapshot["times_opened"])])
+        + render_family("circuit_breaker_rejected_total", "counter", "Calls rejected while open.",
+                        [(labels, snapshot["rejected_calls"])])
+    )
+
+
+registry.register_collector(_collect)
@@ -0,0 +1,64 @@
+"""
+Single entry point for Claude Messages API calls.
+
+create_message() runs the request through the shared circuit breaker and
+records latency, token usage, estimated cost and outcome in llm.metrics,
+labelled with the calling endpoint and the model.
+
+The client has a request timeout (CLAUDE_TIMEOUT_SECONDS, never below the
+breaker's slow-call threshold), so a hung call ends as a timeout the
+breaker counts instead of holding a worker forever.
+
+The anthropic SDK takes over a second to import, so it is only imported
+(and the client built) on the first call; get_client() caches the client
+for the life of the process.
+"""
+
+import os
+import threading
+import time
+
+import settings  # noqa: F401  (loads backend/.env)
+
+from .circuit_breaker import CircuitOpenError, claude_breaker
+from .metrics import llm_metrics
+
+# Seconds before a Claude request times out; at least the breaker's slow-call threshold.
+TIMEOUT_SECONDS = max(float(os.getenv("CLAUDE_TIMEOUT_SECONDS", 60)), claude_breaker.slow_call_seconds)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process-wide Anthropic client, created on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from anthropic import Anthropic
+
+                _client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"), timeout=TIMEOUT_SECONDS)
+    return _client
+
+
+def create_message(endpoint: str, **params):
+    """
+    ``get_client().messages.create(**params)`` with circuit breaking and metrics.
+
+    Args:
+        endpoint: label for the calling feature, e.g. "summary" or "preventative_care".
+        params: Messages API parameters (model, max_tokens, system, messages, ...).
+    """
+    model = params.get("model", "")
+    started = time.perf_counter()
+    try:
+        response = claude_breaker.call(get_client().messages.create, **params)
+    except CircuitOpenError:
+        llm_metrics.record(endpoint, model, "circuit_open", (time.perf_counter() - started) * 1000)
+        raise
+    except Exception:
+        llm_metrics.record(endpoint, model, "error", (time.perf_counter() - started) * 1000)
+        raise
+    llm_metrics.record(endpoint, model, "ok", (time.perf_counter() - started) * 1000, response.usage)
+    return response
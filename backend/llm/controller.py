@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+
+from llm.metrics import llm_metrics
+
+router = APIRouter(prefix="/llm", tags=["llm"])
+
+
+@router.get("/metrics")
+async def metrics():
+    """JSON view of the Claude call series in /metrics, per endpoint and model."""
+    return llm_metrics.snapshot()
@@ -0,0 +1,129 @@
+"""
+Claude call metrics, kept in the shared metrics registry.
+
+Every call made through llm.client is recorded by endpoint and model:
+outcome counts, a latency histogram, per-call input and output token
+histograms, cache token totals and estimated cost. /metrics serves them in
+the Prometheus format; snapshot() is a JSON view of the same series for GET
+/llm/metrics. Setting LLM_METRICS_LOG=1 also prints one JSON line per call
+for log-based analysis.
+"""
+
+import json
+import os
+
+from metrics.registry import registry
+
+
+# USD per million tokens: (input, output). Cache writes bill at 1.25x input,
+# cache reads at 0.1x input.
+MODEL_PRICING = {
+    "claude-haiku-4-5": (1.0, 5.0),
+    "claude-sonnet-4-5-20250929": (3.0, 15.0),
+    "claude-opus-4-6": (5.0, 25.0),
+}
+CACHE_WRITE_MULTIPLIER = 1.25
+CACHE_READ_MULTIPLIER = 0.1
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+CALLS = registry.counter("llm_calls_total", "Claude calls by outcome.", ("endpoint", "model", "outcome"))
+LATENCY = registry.histogram(
+    "llm_call_duration_seconds", "Claude call latency.", ("endpoint", "model"), buckets=LATENCY_BUCKETS
+)
+TOKENS = registry.histogram(
+    "llm_call_tokens", "Input and output tokens per Claude call.", ("endpoint", "model", "type"),
+    buckets=TOKEN_BUCKETS,
+)
+CACHE_TOKENS = registry.counter(
+    "llm_cache_tokens_total", "Prompt cache tokens read and written.", ("endpoint", "model", "type")
+)
+COST = registry.counter("llm_cost_usd_total", "Estimated Claude spend in USD.", ("endpoint", "model"))
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int,
+                  cache_read_tokens: int = 0, cache_creation_tokens: int = 0) -> float:
+    """Estimated USD cost of one call at list (non-batch) prices; 0 for unknown models."""
+    input_price, output_price = MODEL_PRICING.get(model, (0.0, 0.0))
+    return (
+        input_tokens * input_price
+        + output_tokens * output_price
+        + cache_creation_tokens * input_price * CACHE_WRITE_MULTIPLIER
+        + cache_read_tokens * input_price * CACHE_READ_MULTIPLIER
+    ) / 1_000_000
+
+
+def _histogram(child, scale: float = 1.0) -> dict:
+    counts, total = child.totals()
+    return {
+        "count": int(sum(counts)),
+        "sum": round(total * scale, 1),
+        "p50": round(child.quantile(0.50) * scale, 1),
+        "p95": round(child.quantile(0.95) * scale, 1),
+        "p99": round(child.quantile(0.99) * scale, 1),
+    }
+
+
+class LLMMetrics:
+    """Records Claude calls into the registry; snapshot() reads them back per (endpoint, model)."""
+
+    def __init__(self):
+        self.log_calls = os.getenv("LLM_METRICS_LOG", "") not in ("", "0", "false")
+
+    def record(self, endpoint: str, model: str, outcome: str, latency_ms: float, usage=None) -> None:
+        input_tokens = getattr(usage, "input_tokens", 0) or 0
+        output_tokens = getattr(usage, "output_tokens", 0) or 0
+        cache_read = getattr(usage, "cache_read_input_tokens", 0) or 0
+        cache_creation = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        cost = estimate_cost(model, input_tokens, output_tokens, cache_read, cache_creation)
+
+        CALLS.labels(endpoint, model, outcome).inc()
+        LATENCY.labels(endpoint, model).observe(latency_ms / 1000)
+        if usage is not None:
+            TOKENS.labels(endpoint, model, "input").observe(input_tokens)
+            TOKENS.labels(endpoint, model, "output").observe(output_tokens)
+            CACHE_TOKENS.labels(endpoint, model, "read").inc(cache_read)
+            CACHE_TOKENS.labels(endpoint, model, "creation").inc(cache_creation)
+            COST.labels(endpoint, model).inc(cost)
+
+        if self.log_calls:
+            print(json.dumps({
+                "event": "llm_call",
+                "endpoint": endpoint,
+                "model": model,
+                "outcome": outcome,
+                "latency_ms": round(latency_ms, 1),
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "cache_read_input_tokens": cache_read,
+                "cache_creation_input_tokens": cache_creation,
+                "cost_usd": round(cost, 6),
+            }))
+
+    def snapshot(self) -> dict:
+        series: dict[tuple[str, str], dict] = {}
+
+        def entry(endpoint: str, model: str) -> dict:
+            return series.setdefault((endpoint, model), {"endpoint": endpoint, "model": model, "outcomes": {}})
+
+        for (endpoint, model, outcome), child in CALLS.samples():
+            entry(endpoint, model)["outcomes"][outcome] = int(child.value())
+        for (endpoint, model), child in LATENCY.samples():
+            entry(endpoint, model)["latency_ms"] = _histogram(child, 1000)
+        for (endpoint, model, kind), child in TOKENS.samples():
+            entry(endpoint, model)[f"{kind}_tokens"] = _histogram(child)
+        for (endpoint, model, kind), child in CACHE_TOKENS.samples():
+            entry(endpoint, model)[f"cache_{kind}_input_tokens"] = int(child.value())
+        for (endpoint, model), child in COST.samples():
+            entry(endpoint, model)["cost_usd"] = round(child.value(), 6)
+
+        rows = [series[key] for key in sorted(series)]
+        return {
+            "series": rows,
+            "total_calls": sum(sum(s["outcomes"].values()) for s in rows),
+            "total_cost_usd": round(sum(s.get("cost_usd", 0.0) for s in rows), 6),
+        }
+
+
+llm_metrics = LLMMetrics()
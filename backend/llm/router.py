@@ -0,0 +1,77 @@
+"""
+Risk-tiered model routing for Claude calls.
+
+Picks the model, max_tokens and prompt variant for a call from the
+rule-based risk score and the number of flagged markers, so routine
+baseline sessions use a fast small model and only concerning sessions
+escalate to the larger ones.
+"""
+
+import time
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+    """Model choice for a single Claude call."""
+    tier: str            # "low", "moderate", "high"
+    model: str
+    max_tokens: int
+    prompt_variant: str  # "brief", "standard", "detailed"
+
+
+# Tier boundaries on the 0-100 rule-based risk score.
+LOW_RISK_MAX = 25.0
+HIGH_RISK_MIN = 50.0
+# Flagged-marker counts that force a tier regardless of the score.
+LOW_FLAGGED_MAX = 1
+HIGH_FLAGGED_MIN = 3
+
+ROUTES = {
+    "summary": {
+        "low": ModelRoute("low", "claude-haiku-4-5", 800, "brief"),
+        "moderate": ModelRoute("moderate", "claude-sonnet-4-5-20250929", 1500, "standard"),
+        "high": ModelRoute("high", "claude-sonnet-4-5-20250929", 2000, "detailed"),
+    },
+    "preventative_care": {
+        "low": ModelRoute("low", "claude-haiku-4-5", 1000, "brief"),
+        "moderate": ModelRoute("moderate", "claude-sonnet-4-5-20250929", 2000, "standard"),
+        "high": ModelRoute("high", "claude-opus-4-6", 2000, "standard"),
+    },
+}
+
+
+def count_flagged_markers(analysis: dict) -> int:
+    """Number of flagged markers in an analyze_transcript() result."""
+    return sum(1 for m in analysis.get("markers", []) if m.get("flagged"))
+
+
+def risk_tier(risk_score: float | None, flagged_count: int | None) -> str:
+    """
+    Classify a session into a routing tier.
+
+    Unknown inputs route to "high" so callers that cannot supply scores keep
+    the previous (largest-model) behaviour.
+    """
+    if risk_score is None or flagged_count is None:
+        return "high"
+    if risk_score >= HIGH_RISK_MIN or flagged_count >= HIGH_FLAGGED_MIN:
+        return "high"
+    if risk_score < LOW_RISK_MAX and flagged_count <= LOW_FLAGGED_MAX:
+        return "low"
+    return "moderate"
+
+
+def route(task: str, risk_score: float | None = None, flagged_count: int | None = None) -> ModelRoute:
+    """Return the ModelRoute for ``task`` ("summary" or "preventative_care")."""
+    return ROUTES[task][risk_tier(risk_score, flagged_count)]
+
+
+def log_route(task: str, selected: ModelRoute, started: float, outcome: str = "ok") -> None:
+    """Log a routing decision with the call latency (``started`` from time.perf_counter())."""
+    latency_ms = (time.perf_counter() - started) * 1000
+    print(
+        f"[llm-router] task={task} tier={selected.tier} model={selected.model} "
+        f"max_tokens={selected.max_tokens} variant={selected.prompt_variant} "
+        f"outcome={outcome} latency_ms={latency_ms:.0f}"
+    )
@@ -0,0 +1,143 @@
+"""
+Checks the async WHOOP client (whoop/client.py) against the local WHOOP stub.
+
+Each scenario injects a failure into the stub (loadtest/stubs.py) and checks
+that the client reuses pooled connections, honours 429 Retry-After, retries
+5xx responses and timeouts with backoff, gives up after its retry budget,
+re-authorizes once on a 401, and does not block the event loop while waiting.
+Exits 1 if any scenario fails.
+
+Usage (from backend/):
+    python -m loadtest.check_whoop_client
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+from loadtest.stubs import StubServer, whoop_token_env
+
+
+def main() -> None:
+    whoop = StubServer("whoop", latency=0.02).start()
+    # The stub echoes the refresh token back, so the stored token is never rotated.
+    os.environ.update(
+        WHOOP_API_BASE=whoop.url, WHOOP_CLIENT_ID="stub-client",
+        WHOOP_CLIENT_SECRET="stub-secret", WHOOP_REFRESH_TOKEN="stub-refresh", **whoop_token_env(),
+    )
+
+    import httpx
+
+    from whoop import service
+    from whoop.client import WhoopClient
+
+    client = WhoopClient(
+        service.API_BASE, service._access_token_async, service._unauthorized,
+        read_timeout=0.5, max_retries=3, backoff_base=0.05, backoff_cap=0.2, max_connections=8,
+    )
+    path = "/v2/cycle"
+    results = []
+
+    async def fetch():
+        return await client.get_json("cycle", path, elder_id=service.DEFAULT_ELDER, params={"limit": 5})
+
+    async def check(name, scenario):
+        started = time.perf_counter()
+        try:
+            detail = await scenario()
+            ok = True
+        except AssertionError as e:
+            ok, detail = False, str(e)
+        results.append(ok)
+        print(f"  {'ok  ' if ok else 'FAIL'} {name:<34} {(time.perf_counter() - started) * 1000:7.0f} ms  {detail}")
+
+    async def keep_alive():
+        await fetch()
+        before = whoop.connections
+        for _ in range(20):
+            await fetch()
+        new = whoop.connections - before
+        assert new == 0, f"{new} new connections for 20 sequential requests"
+        return "20 sequential requests, 0 new connections"
+
+    async def pool_cap():
+        await asyncio.gather(*(fetch() for _ in range(40)))
+        assert whoop.connections <= 8 + 2, f"{whoop.connections} connections, pool is 8"
+        return f"40 concurrent requests, {whoop.connections} connections in total"
+
+    async def retry_after():
+        whoop.fail_next(429, headers={"Retry-After": "1"}, path_prefix="/developer")
+        started = time.perf_counter()
+        await fetch()
+        waited = time.perf_counter() - started
+        assert waited >= 1.0, f"retried after {waited:.2f}s, Retry-After was 1s"
+        return f"waited {waited:.2f}s"
+
+    async def retry_5xx():
+        whoop.fail_next(503, count=2, path_prefix="/developer")
+        before = whoop.requests
+        await fetch()
+        assert whoop.requests - before == 3, f"{whoop.requests - before} requests"
+        return "2 x 503 then success"
+
+    async def give_up():
+        whoop.fail_next(503, count=4, path_prefix="/developer")
+        try:
+            await fetch()
+        except httpx.HTTPStatusError as e:
+            assert e.response.status_code == 503
+            return "503 raised after 1 + 3 attempts"
+        raise AssertionError("no error after exhausting retries")
+
+    async def timeout():
+        whoop.fail_next(None, delay=1.0, path_prefix="/developer")
+        await fetch()
+        return "read timeout retried"
+
+    async def reauthorize():
+        token = await service._access_token_async(service.DEFAULT_ELDER)
+        whoop.fail_next(401, path_prefix="/developer")
+        await fetch()
+        new_token = await service._access_token_async(service.DEFAULT_ELDER)
+        assert new_token != token, "token was not refreshed after a 401"
+        return "401 -> fresh token -> success"
+
+    async def non_blocking():
+        whoop.fail_next(None, delay=0.3, path_prefix="/developer")
+        gaps, last = [], time.perf_counter()
+        request = asyncio.create_task(fetch())
+        while not request.done():
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+        await request
+        assert max(gaps) < 0.1, f"event loop stalled for {max(gaps) * 1000:.0f} ms"
+        return f"longest loop stall {max(gaps) * 1000:.0f} ms during a 300 ms request"
+
+    async def run():
+        for name, scenario in (
+            ("keep-alive connection reuse", keep_alive),
+            ("connection pool cap", pool_cap),
+            ("429 honours Retry-After", retry_after),
+            ("5xx retried with backoff", retry_5xx),
+            ("gives up after max retries", give_up),
+            ("timeout retried", timeout),
+            ("401 re-authorizes once", reauthorize),
+            ("event loop not blocked", non_blocking),
+        ):
+            await check(name, scenario)
+        await client.aclose()
+
+    print(f"WHOOP client against stub at {whoop.url}")
+    asyncio.run(run())
+    whoop.stop()
+    if not all(results):
+        print("\nFAIL")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+End-to-end load test for the backend.
+
+Starts the stub services (loadtest/stubs.py), boots the real app under
+uvicorn with its environment pointed at them and a throwaway session
+database, then drives a weighted mix of realistic traffic at a fixed
+arrival rate and reports per-route throughput and p50/p95/p99 latency.
+
+Arrivals are open-loop: request i is due at start + i/rate whether or not
+earlier ones have finished, and latency is measured from that due time, so
+a slow backend shows up as latency instead of silently lowering the load.
+
+Usage (from backend/):
+    python -m loadtest.run --rate 50 --duration 60
+    python -m loadtest.run --rate 20 --duration 30 --workers 4 --stub-latency anthropic=0.8,whoop=0.15
+    python -m loadtest.run --mix analyze_transcript=5,sessions_list=5 --json /tmp/loadtest.json
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+from loadtest.stubs import start_stubs, stub_env
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+SENTENCES = [
+    "Well, I went to the market this morning and bought some apples.",
+    "My daughter called yesterday, um, she is doing well with the new job.",
+    "I was looking for the, uh, the thing you use to open cans.",
+    "We used to live near the lake when the kids were small.",
+    "The doctor said my blood pressure is fine, so that is good news.",
+    "I, I forgot where I put my glasses again, they were on the table.",
+    "You know, the garden needs watering, the tomatoes are coming in.",
+    "Did I tell you about the trip we took to the coast in the summer?",
+]
+
+# Scenario weights in the default mix: mostly reads and rule-based analysis, some Claude-backed calls.
+DEFAULT_MIX = {
+    "analyze_transcript": 20,
+    "analyze_transcript_ai": 8,
+    "analyze_pipeline": 6,
+    "analyze_sessions_ai": 3,
+    "preventative_care": 6,
+    "preventative_care_llm": 2,
+    "sessions_list": 15,
+    "sessions_changes": 10,
+    "sessions_latest": 8,
+    "whoop_weekly": 6,
+    "family_photos": 5,
+    "beeper_sync": 3,
+    "vital": 1,
+    "health": 7,
+}
+
+
+def _transcript(rng: random.Random) -> str:
+    return " ".join(rng.choice(SENTENCES) for _ in range(rng.randint(6, 30)))
+
+
+class Traffic:
+    """The scenarios; each returns [(route, status)] for the requests it made."""
+
+    def __init__(self, base_url: str, beeper_url: str, clients: int):
+        self.base = base_url
+        self.beeper = beeper_url
+        self.clients = clients
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _call(self, route: str, method: str, path: str, client: int, **kwargs) -> tuple[str, int]:
+        headers = {"X-Api-Key": f"loadtest-{client}"}
+        response = self._session().request(method, self.base + path, headers=headers, timeout=120, **kwargs)
+        return route, response.status_code
+
+    def run(self, scenario: str, rng: random.Random) -> list[tuple[str, int]]:
+        client = rng.randrange(self.clients)
+        return getattr(self, scenario)(rng, client)
+
+    def analyze_transcript(self, rng, client):
+        return [self._call("POST /analyze-transcript", "POST", "/analyze-transcript", client,
+                           json={"transcript": _transcript(rng)})]
+
+    def analyze_transcript_ai(self, rng, client):
+        body = {"transcript": _transcript(rng), "elder_id": f"elder-{client}", "session_id": f"s{rng.getrandbits(32)}"}
+        return [self._call("POST /analyze-transcript-ai", "POST", "/analyze-transcript-ai", client, json=body)]
+
+    def analyze_pipeline(self, rng, client):
+        body = {"transcript": _transcript(rng), "elder_id": f"elder-{client}"}
+        return [self._call("POST /analyze-pipeline", "POST", "/analyze-pipeline", client, json=body)]
+
+    def analyze_sessions_ai(self, rng, client):
+        sessions = [
+            {"text": _transcript(rng), "session_id": f"s{i}", "date": f"2025-01-{i + 1:02d}"}
+            for i in range(rng.randint(3, 8))
+        ]
+        return [self._call("POST /analyze-sessions-ai", "POST", "/analyze-sessions-ai", client, json={"sessions": sessions})]
+
+    def preventative_care(self, rng, client):
+        body = {"ai_summary": f"Risk score {rng.randint(5, 90)}. Frequent word-finding pauses and fillers."}
+        return [self._call("POST /preventative-care-recommendations", "POST",
+                           "/preventative-care-recommendations", client, json=body)]
+
+    def preventative_care_llm(self, rng, client):
+        body = {"ai_summary": "Mild anomia and repeated stories this week.", "engine": "llm",
+                "risk_score": rng.randint(5, 90), "flagged_markers": rng.randint(0, 4)}
+        return [self._call("POST /preventative-care-recommendations (llm)", "POST",
+                           "/preventative-care-recommendations", client, json=body)]
+
+    def sessions_list(self, rng, client):
+        return [self._call("GET /sessions", "GET", "/sessions", client,
+                           params={"elder_id": f"elder-{client}", "limit": 50})]
+
+    def sessions_changes(self, rng, client):
+        return [self._call("GET /sessions/changes", "GET", "/sessions/changes", client,
+                           params={"elder_id": f"elder-{client}", "since": rng.randint(0, 50)})]
+
+    def sessions_latest(self, rng, client):
+        return [self._call("GET /sessions/latest", "GET", "/sessions/latest", client,
+                           params={"elder_id": f"elder-{client}"})]
+
+    def whoop_weekly(self, rng, client):
+        kind = rng.choice(["sleep", "cycle", "recovery"])
+        return [self._call(f"GET /whoop/{kind}/weekly", "GET", f"/whoop/{kind}/weekly", client)]
+
+    def family_photos(self, rng, client):
+        return [self._call("GET /companionship/family-photos", "GET", "/companionship/family-photos", client,
+                           params={"family_id": f"family-{client % 20}"})]
+
+    def beeper_sync(self, rng, client):
+        """What the Beeper sync client does for a new image: poll Beeper, then upload through the backend."""
+        results = []
+        started = time.perf_counter()
+        beeper = self._session().get(f"{self.beeper}/v1/chats/chat-{client}/messages",
+                                     headers={"Authorization": "Bearer stub"}, timeout=30)
+        results.append(("GET beeper /v1/chats/{id}/messages", beeper.status_code))
+        results.append(self._call("POST /companionship/sync-started", "POST", "/companionship/sync-started", client))
+        for item in beeper.json().get("items", [])[:1]:
+            body = {"family_id": f"family-{client % 20}", "filename": item["attachments"][0]["fileName"]}
+            results.append(self._call("POST /companionship/get-upload-presign", "POST",
+                                      "/companionship/get-upload-presign", client, json=body))
+        results.append(self._call("POST /companionship/sync-finished", "POST", "/companionship/sync-finished", client))
+        return results
+
+    def vital(self, rng, client):
+        return [self._call("GET /vital-api", "GET", "/vital-api", client)]
+
+    def health(self, rng, client):
+        return [self._call("GET /health", "GET", "/health", client)]
+
+
+def _parse_pairs(value: str, cast=float) -> dict:
+    pairs = {}
+    for part in filter(None, (p.strip() for p in value.split(","))):
+        name, _, number = part.partition("=")
+        pairs[name.strip()] = cast(number)
+    return pairs
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _start_backend(port: int, workers: int, env: dict, log_path: Path) -> subprocess.Popen:
+    log = open(log_path, "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"backend exited with {process.returncode}; see {log_path}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).ok:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"backend did not become healthy; see {log_path}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rate", type=float, default=20.0, help="scenario arrivals per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of measured traffic")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds of unmeasured traffic first")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--clients", type=int, default=50, help="distinct simulated clients (API keys / elders)")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="client-side concurrency cap")
+    parser.add_argument("--mix", default="", help="scenario=weight,... (default: built-in mix)")
+    parser.add_argument("--stub-latency", default="anthropic=0.5,whoop=0.1,vital=0.3,s3=0.02,beeper=0.01",
+                        help="service=seconds,... injected into stub responses")
+    parser.add_argument("--jitter", type=float, default=0.05, help="+/- seconds of stub latency jitter")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    mix = _parse_pairs(args.mix) if args.mix else DEFAULT_MIX
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    scenarios, weights = list(mix), list(mix.values())
+
+    stubs = start_stubs(_parse_pairs(args.stub_latency), args.jitter)
+    workdir = Path(tempfile.mkdtemp(prefix="loadtest-"))
+    env = {
+        **os.environ,
+        **stub_env(stubs),
+        "SESSION_DB_PATH": str(workdir / "sessions.db"),
+        "PYTHONPATH": str(BACKEND_DIR),
+    }
+    print(f"[loadtest] stubs: {', '.join(f'{n}={s.url}' for n, s in stubs.items())}")
+    print(f"[loadtest] backend log and database in {workdir}")
+    backend = _start_backend(args.port, args.workers, env, workdir / "backend.log")
+
+    traffic = Traffic(f"http://127.0.0.1:{args.port}", stubs["beeper"].url, args.clients)
+    rng = random.Random(args.seed)
+    lock = threading.Lock()
+    latencies: dict[str, list[float]] = {}
+    statuses: dict[str, dict[str, int]] = {}
+    measure_from = time.perf_counter() + args.warmup
+
+    def fire(scenario: str, due: float, seed: int) -> None:
+        try:
+            results = traffic.run(scenario, random.Random(seed))
+        except requests.RequestException as e:
+            results = [(scenario, type(e).__name__)]
+        elapsed_ms = (time.perf_counter() - due) * 1000
+        if due < measure_from:
+            return
+        with lock:
+            # A multi-request scenario's routes share its end-to-end latency.
+            for route, status in results:
+                latencies.setdefault(route, []).append(elapsed_ms)
+                counts = statuses.setdefault(route, {})
+                counts[str(status)] = counts.get(str(status), 0) + 1
+
+    total = int((args.warmup + args.duration) * args.rate)
+    started = time.perf_counter()
+    print(f"[loadtest] {args.rate:g} scenarios/s for {args.duration:g}s (+{args.warmup:g}s warmup), "
+          f"{args.workers} worker(s)")
+    try:
+        with ThreadPoolExecutor(max_workers=args.max_in_flight) as pool:
+            for i in range(total):
+                due = started + i / args.rate
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(fire, rng.choices(scenarios, weights)[0], due, rng.getrandbits(32))
+        wall = time.perf_counter() - max(measure_from, started)
+    finally:
+        backend.terminate()
+        backend.wait(10)
+        for stub in stubs.values():
+            stub.stop()
+
+    rows = []
+    for route in sorted(latencies):
+        values = sorted(latencies[route])
+        ok = sum(c for s, c in statuses[route].items() if s.startswith("2"))
+        rows.append({
+            "route": route,
+            "count": len(values),
+            "throughput_rps": round(len(values) / wall, 2),
+            "p50_ms": round(_percentile(values, 0.50), 1),
+            "p95_ms": round(_percentile(values, 0.95), 1),
+            "p99_ms": round(_percentile(values, 0.99), 1),
+            "max_ms": round(values[-1], 1),
+            "mean_ms": round(statistics.fmean(values), 1),
+            "ok": ok,
+            "statuses": statuses[route],
+        })
+
+    width = max((len(r["route"]) for r in rows), default=10)
+    print(f"\n{'route':<{width}}  {'count':>6} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  statuses")
+    for r in rows:
+        print(f"{r['route']:<{width}}  {r['count']:>6} {r['throughput_rps']:>7.2f} {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['max_ms']:>8.1f}  "
+              + " ".join(f"{s}:{c}" for s, c in sorted(r["statuses"].items())))
+    all_values = sorted(v for values in latencies.values() for v in values)
+    print(f"\n{len(all_values)} requests in {wall:.1f}s = {len(all_values) / wall:.1f} req/s; "
+          f"p50 {_percentile(all_values, 0.5):.1f} ms, p95 {_percentile(all_values, 0.95):.1f} ms, "
+          f"p99 {_percentile(all_values, 0.99):.1f} ms")
+    print("stub requests: " + ", ".join(f"{n}={s.requests}" for n, s in stubs.items()))
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"args": vars(args), "routes": rows}, indent=2))
+        print(f"[loadtest] wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
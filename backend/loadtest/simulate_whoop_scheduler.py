@@ -0,0 +1,189 @@
+"""
+Simulates the WHOOP sync scheduler (whoop/scheduler.py) with many accounts
+against the local WHOOP stub, which enforces an app-wide rate limit the way
+WHOOP does.
+
+1,000 fake elders are connected (in-memory credential and record stores).
+A few have a revoked refresh token and a few more have WHOOP failing for
+them during the first seconds. The interval is shorter than a full round
+takes at the rate limit, so the scheduler is overloaded the whole run.
+Midway, some elders "open their dashboard" and keep polling it.
+
+Checks that:
+  * the stub never throttles the app (the client's RateLimiter keeps under it),
+  * every healthy elder is synced, and all of them about equally often (fair),
+  * dashboard elders are synced sooner and more often than the rest,
+  * failing accounts back off and recover without retrying in a tight loop,
+  * revoked accounts are tried once and then parked.
+Exits 1 if any check fails.
+
+Usage (from backend/):
+    python -m loadtest.simulate_whoop_scheduler [--accounts 1000] [--seconds 60] [--rate 100]
+    python -m loadtest.simulate_whoop_scheduler --no-limiter   # same run without the app-wide limiter
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+from loadtest.stubs import StubServer, whoop_token_env
+
+
+def _peak(times: list[float], window: float) -> int:
+    """Most calls in any ``window``-second span."""
+    peak, lo = 0, 0
+    for hi, t in enumerate(times):
+        while times[lo] <= t - window:
+            lo += 1
+        peak = max(peak, hi - lo + 1)
+    return peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=60.0)
+    # The defaults fit one CPU core running both the app and the stub.
+    parser.add_argument("--rate", type=int, default=100, help="stub's limit, API calls per second")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--interval", type=float, default=20.0, help="background sync interval, seconds")
+    parser.add_argument("--no-limiter", action="store_true", help="run without the client's RateLimiter")
+    args = parser.parse_args()
+
+    # A 5s window with the same average rate: long enough that a few milliseconds between
+    # a request leaving the limiter and reaching the stub cannot tip it over (WHOOP's
+    # own window is a minute).
+    window = 5.0
+    limit = int(args.rate * window)
+    whoop = StubServer("whoop", latency=0.01, jitter=0.005, rate_limits=[(limit, window)]).start()
+    os.environ.update(
+        WHOOP_API_BASE=whoop.url, WHOOP_CLIENT_ID="stub-client", WHOOP_CLIENT_SECRET="stub-secret",
+        WHOOP_STORE="memory", SHARED_STATE="memory", WHOOP_BACKFILL_DAYS="7",
+        # A little under the stub's limit, as in production: token calls and clock
+        # differences between the app and WHOOP eat into it.
+        WHOOP_RATE_LIMITS="" if args.no_limiter else f"{int(limit * 0.95)}/{window:g}",
+        WHOOP_MAX_CONNECTIONS=str(args.concurrency * 3), WHOOP_BACKOFF_BASE="0.05", WHOOP_BACKOFF_CAP="0.5",
+        **whoop_token_env(),
+    )
+
+    from whoop import service
+    from whoop.credentials import STATUS_REVOKED
+    from whoop.scheduler import SyncScheduler
+    from whoop.sync import shutdown, sync
+
+    rng = random.Random(48)
+    elders = [f"elder-{i:04d}" for i in range(args.accounts)]
+    revoked = set(rng.sample(elders, max(1, args.accounts // 100)))
+    flaky = set(rng.sample(sorted(set(elders) - revoked), max(1, args.accounts // 50)))
+    for elder_id in elders:
+        token = f"revoked-{elder_id}" if elder_id in revoked else f"acct-{elder_id}"
+        service.credential_store.set_refresh_token(elder_id, token)
+
+    attempts: dict[str, int] = {e: 0 for e in elders}
+    synced_at: dict[str, list[float]] = {e: [] for e in elders}
+    in_flight = peak_in_flight = 0
+    started = time.monotonic()
+
+    async def tracked_sync(elder_id: str) -> None:
+        nonlocal in_flight, peak_in_flight
+        attempts[elder_id] += 1
+        in_flight += 1
+        peak_in_flight = max(peak_in_flight, in_flight)
+        try:
+            await sync(elder_id)
+        finally:
+            in_flight -= 1
+        synced_at[elder_id].append(time.monotonic() - started)
+
+    scheduler = SyncScheduler(
+        tracked_sync, service.credential_store.elder_ids,
+        is_revoked=lambda exc: isinstance(exc, service.WhoopAuthError),
+        concurrency=args.concurrency, interval=args.interval, active_interval=5.0, active_ttl=2.0,
+        backoff_base=0.5, backoff_cap=4.0, refresh_every=1.0,
+    )
+
+    hot: list[str] = []
+    touched_at = 0.0
+
+    async def run() -> None:
+        nonlocal hot, touched_at, started
+        # WHOOP fails for the flaky accounts for the first few seconds.
+        for elder_id in flaky:
+            whoop.account_faults[f"acct-{elder_id}"] = time.monotonic() + 3.0
+        started = time.monotonic()
+        scheduler.start()
+        await asyncio.sleep(min(2.0, args.seconds / 4))
+        # Dashboards open for elders still waiting for their first sync; they poll every 0.5s.
+        waiting = [e for e in elders if not synced_at[e] and e not in revoked and e not in flaky]
+        hot = rng.sample(waiting, min(10, len(waiting)))
+        touched_at = time.monotonic() - started
+        while time.monotonic() - started < args.seconds:
+            for elder_id in hot:
+                scheduler.touch(elder_id)
+            await asyncio.sleep(0.5)
+        await scheduler.stop()
+        await shutdown()
+        await service.whoop_client.aclose()
+
+    print(f"{args.accounts} accounts, stub limit {args.rate}/s, "
+          f"{'no limiter' if args.no_limiter else f'limiter {int(args.rate * 0.95)}/s'}, "
+          f"{args.concurrency} workers, interval {args.interval:g}s, {args.seconds:g}s run")
+    asyncio.run(run())
+    whoop.stop()
+
+    healthy = [e for e in elders if e not in revoked and e not in flaky and e not in hot]
+    counts = [len(synced_at[e]) for e in healthy]
+    api_calls = len(whoop.api_times)
+    peak = _peak(sorted(whoop.api_times), window)
+    first_hot = [synced_at[e][0] - touched_at for e in hot if synced_at[e] and synced_at[e][-1] >= touched_at]
+    waiting_background = [
+        synced_at[e][0] - touched_at for e in healthy if synced_at[e] and synced_at[e][0] >= touched_at
+    ]
+    hot_rate = statistics.mean(len([t for t in synced_at[e] if t >= touched_at]) for e in hot) if hot else 0
+    bg_rate = statistics.mean(len([t for t in synced_at[e] if t >= touched_at]) for e in healthy)
+    flaky_synced = sum(1 for e in flaky if synced_at[e])
+    flaky_attempts = max(attempts[e] for e in flaky)
+    revoked_parked = all(service.credential_store.status(e) == STATUS_REVOKED for e in revoked)
+    revoked_attempts = max(attempts[e] for e in revoked)
+    never = sum(1 for c in counts if c == 0)
+
+    print(f"\n  API calls served          {api_calls}  ({api_calls / args.seconds:.0f}/s average)")
+    print(f"  peak calls in any {window:g}s      {peak}  (stub limit {limit})")
+    print(f"  throttled (429)           {whoop.throttled}")
+    print(f"  peak syncs in flight      {peak_in_flight}  (workers {args.concurrency})")
+    print(f"  syncs per healthy elder   min {min(counts)}  median {statistics.median(counts):g}  max {max(counts)}"
+          f"  (never synced: {never})")
+    if first_hot and waiting_background:
+        print(f"  first sync after opening  dashboard p100 {max(first_hot):.2f}s"
+              f"  vs background median {statistics.median(waiting_background):.2f}s")
+    print(f"  syncs since opening       dashboard {hot_rate:.1f} per elder, background {bg_rate:.1f}")
+    print(f"  flaky accounts            {flaky_synced}/{len(flaky)} recovered, at most {flaky_attempts} attempts")
+    print(f"  revoked accounts          {len(revoked)} parked: {revoked_parked}, at most {revoked_attempts} attempt")
+
+    checks = [
+        ("no 429s from the stub", whoop.throttled == 0),
+        ("every healthy elder synced", never == 0),
+        ("fair: sync counts differ by at most 1", max(counts) - min(counts) <= 1),
+        ("dashboard elders synced before the background median",
+         bool(first_hot) and len(first_hot) == len(hot)
+         and (not waiting_background or max(first_hot) < statistics.median(waiting_background))),
+        ("dashboard elders synced more often", hot_rate > bg_rate),
+        ("flaky accounts recovered with backoff", flaky_synced == len(flaky) and flaky_attempts <= 6),
+        ("revoked accounts parked after one attempt", revoked_parked and revoked_attempts == 1),
+        ("sync concurrency within the worker cap", peak_in_flight <= args.concurrency),
+    ]
+    print()
+    for name, ok in checks:
+        print(f"  {'ok  ' if ok else 'FAIL'} {name}")
+    if not all(ok for _, ok in checks):
+        print("\nFAIL")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
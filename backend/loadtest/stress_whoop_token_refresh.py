@@ -0,0 +1,150 @@
+"""
+Multiprocess stress test of WHOOP token refreshes (whoop/token_store.py).
+
+Several worker processes, each with several threads, keep asking for
+access tokens for the same few accounts (the file-backed default account
+and some SQLite-backed elders). The local WHOOP stub rotates the refresh
+token on every grant, rejects a spent one with invalid_grant like WHOOP
+does, and issues access tokens that expire within seconds, so accounts are
+refreshed constantly and from every process at once.
+
+Checks that no refresh is answered with invalid_grant, every account is
+still connected at the end with the latest issued refresh token stored,
+and processes share refreshes instead of each doing its own. Exits 1 if
+any check fails.
+
+Usage (from backend/):
+    python -m loadtest.stress_whoop_token_refresh [--processes 6] [--threads 4] [--seconds 10]
+    python -m loadtest.stress_whoop_token_refresh --unsafe   # without the account lock, to compare
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from loadtest.stubs import StubServer
+
+
+def _worker(elders: list[str], threads: int, seconds: float, unsafe: bool, results) -> None:
+    from whoop import service
+
+    if unsafe:
+        @contextmanager
+        def no_lock(elder_id):
+            yield
+
+        service.account_lock = no_lock
+
+    counts = Counter()
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def run():
+        rng = random.Random()
+        while time.monotonic() < deadline:
+            elder_id = rng.choice(elders)
+            try:
+                service.get_access_token(elder_id)
+                outcome = "ok"
+            except service.WhoopAuthError:
+                outcome = "auth_error"
+            except Exception as e:
+                outcome = type(e).__name__
+            with lock:
+                counts[outcome] += 1
+            time.sleep(rng.uniform(0, 0.01))
+
+    pool = [threading.Thread(target=run) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put(dict(counts))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=6)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--elders", type=int, default=4, help="SQLite-backed elders besides the default account")
+    parser.add_argument("--unsafe", action="store_true", help="disable the cross-process account lock")
+    args = parser.parse_args()
+
+    whoop = StubServer("whoop", latency=0.02, jitter=0.01, rotate_refresh_tokens=True, token_ttl=2).start()
+    directory = tempfile.mkdtemp(prefix="whoop-refresh-stress-")
+    os.environ.update(
+        WHOOP_API_BASE=whoop.url, WHOOP_CLIENT_ID="stub-client", WHOOP_CLIENT_SECRET="stub-secret",
+        WHOOP_REFRESH_TOKEN="acct-default",
+        WHOOP_REFRESH_TOKEN_FILE=os.path.join(directory, "refresh_token.json"),
+        WHOOP_LOCK_DIR=os.path.join(directory, "locks"),
+        WHOOP_STORE="sqlite", WHOOP_DB_PATH=os.path.join(directory, "whoop.db"),
+        # Tokens last 2s and are refreshed 1s before expiry: every account is refreshed
+        # about once a second, by whichever process gets there first.
+        WHOOP_TOKEN_REFRESH_MARGIN="1",
+    )
+
+    from whoop import service
+
+    elders = [service.DEFAULT_ELDER] + [f"elder-{i}" for i in range(args.elders)]
+    for elder_id in elders[1:]:
+        service.credential_store.set_refresh_token(elder_id, f"acct-{elder_id}")
+
+    print(f"{args.processes} processes x {args.threads} threads, {len(elders)} accounts, {args.seconds:g}s"
+          f"{', NO account lock' if args.unsafe else ''}")
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(target=_worker, args=(elders, args.threads, args.seconds, args.unsafe, results))
+        for _ in range(args.processes)
+    ]
+    started = time.monotonic()
+    for process in processes:
+        process.start()
+    totals = Counter()
+    for _ in processes:
+        totals.update(results.get())
+    for process in processes:
+        process.join()
+    elapsed = time.monotonic() - started
+    whoop.stop()
+
+    latest_ok = 0
+    for elder_id in elders:
+        stored = service._load_tokens(elder_id)
+        if stored and stored["refresh_token"] not in whoop.spent_refresh_tokens:
+            latest_ok += 1
+    calls = sum(totals.values())
+    # Without sharing, each process would refresh each account about once per second on its own.
+    unshared = args.processes * len(elders) * args.seconds
+
+    print(f"\n  token lookups             {calls}  {dict(totals)}")
+    print(f"  refresh grants at WHOOP   {whoop.grants}  ({whoop.grants / elapsed:.1f}/s;"
+          f" about {unshared / elapsed:.0f}/s if every process refreshed on its own)")
+    print(f"  invalid_grant responses   {whoop.invalid_grants}")
+    print(f"  accounts still connected  {latest_ok}/{len(elders)} (latest refresh token stored)")
+
+    checks = [
+        ("no invalid_grant", whoop.invalid_grants == 0),
+        ("every lookup succeeded", totals["ok"] == calls and calls > 0),
+        ("every account kept its latest refresh token", latest_ok == len(elders)),
+        ("refreshes shared across processes", whoop.grants < unshared / 2),
+    ]
+    print()
+    for name, ok in checks:
+        print(f"  {'ok  ' if ok else 'FAIL'} {name}")
+    if not all(ok for _, ok in checks):
+        print("\nFAIL")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+Local stand-ins for the external services the backend talks to.
+
+Each stub is a threaded HTTP server on 127.0.0.1 that answers the handful
+of routes the backend (or the Beeper sync client) actually calls, with
+realistic payload shapes and an optional injected latency so load tests
+exercise the same code paths as production without network access, API
+keys or cost:
+
+* anthropic: POST /v1/messages (point ANTHROPIC_BASE_URL here)
+* whoop:     POST /oauth/oauth2/token, GET /developer/v2/{activity/sleep,cycle,recovery} (WHOOP_API_BASE)
+* vital:     POST /analyze-audio (VITAL_API_URL)
+* s3:        ListObjectsV2 on /{bucket} (AWS_ENDPOINT_URL)
+* beeper:    GET /v1/chats/{id}/messages, POST /v1/assets/download (BEEPER_API_BASE)
+"""
+
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _anthropic(handler, method, path, query, body):
+    if method != "POST" or path != "/v1/messages":
+        return 404, {"type": "error", "error": {"type": "not_found_error", "message": path}}
+    request = json.loads(body or b"{}")
+    prompt_chars = sum(len(str(m.get("content", ""))) for m in request.get("messages", []))
+    if "JSON" in json.dumps(request.get("messages", [])):
+        text = json.dumps([
+            {
+                "Action title": "Daily word-retrieval practice",
+                "Action explanation": "Ten minutes of naming exercises each morning.",
+                "Action reason": "Word-finding pauses were flagged in recent calls.",
+            }
+        ])
+    else:
+        text = "Speech patterns are broadly stable; mild word-finding pauses are worth monitoring."
+    return 200, {
+        "id": f"msg_stub_{random.getrandbits(48):012x}",
+        "type": "message",
+        "role": "assistant",
+        "model": request.get("model", "claude-stub"),
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": max(1, prompt_chars // 4), "output_tokens": max(1, len(text) // 4)},
+    }
+
+
+def _parse_iso(value: str | None, default: datetime) -> datetime:
+    if not value:
+        return default
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _whoop_record(kind: str, start: datetime) -> dict:
+    day = start.toordinal()
+    base = {"id": f"{kind}-{start:%Y%m%d}", "user_id": 1, "created_at": _iso(start), "updated_at": _iso(start),
+            "start": _iso(start), "end": _iso(start + timedelta(hours=8)), "score_state": "SCORED"}
+    if kind == "sleep":
+        base["score"] = {
+            "stage_summary": {"total_in_bed_time_milli": 28_800_000, "total_awake_time_milli": 1_800_000,
+                              "total_light_sleep_time_milli": 12_600_000,
+                              "total_slow_wave_sleep_time_milli": 7_200_000,
+                              "total_rem_sleep_time_milli": 7_200_000, "disturbance_count": 3},
+            "sleep_needed": {"baseline_milli": 27_000_000, "need_from_sleep_debt_milli": 1_200_000,
+                             "need_from_recent_strain_milli": 600_000, "need_from_recent_nap_milli": 0},
+            "respiratory_rate": 15.2, "sleep_performance_percentage": 80 + day % 9,
+            "sleep_consistency_percentage": 75, "sleep_efficiency_percentage": 91.5,
+        }
+    elif kind == "cycle":
+        base["score"] = {"strain": 8.5 + day % 7, "kilojoule": 8200.0, "average_heart_rate": 68, "max_heart_rate": 141}
+    else:
+        del base["id"]  # recoveries are identified by their cycle
+        base.update(cycle_id=day, sleep_id=f"sleep-{start:%Y%m%d}")
+        base["score"] = {"user_calibrating": False, "recovery_score": 50 + 3 * (day % 12),
+                         "resting_heart_rate": 58, "hrv_rmssd_milli": 40.0 + day % 9,
+                         "spo2_percentage": 96.5, "skin_temp_celsius": 33.4}
+    return base
+
+
+def _whoop_page(kind: str, query: dict) -> dict:
+    """One record per day starting at 22:00 UTC inside [start, end), newest first, paged by nextToken."""
+    now = datetime.now(timezone.utc)
+    start = _parse_iso(query.get("start", [None])[0], now - timedelta(days=7))
+    end = _parse_iso(query.get("end", [None])[0], now)
+    limit = min(int(query.get("limit", ["10"])[0]), 25)
+    offset = int(query.get("nextToken", ["0"])[0])
+    first = datetime(start.year, start.month, start.day, 22, tzinfo=timezone.utc)
+    if first < start:
+        first += timedelta(days=1)
+    days = max(0, (end - first + timedelta(days=1) - timedelta(microseconds=1)).days)
+    starts = [first + timedelta(days=d) for d in reversed(range(days)) if first + timedelta(days=d) < end]
+    page = starts[offset:offset + limit]
+    more = offset + limit < len(starts)
+    return {"records": [_whoop_record(kind, s) for s in page], "next_token": str(offset + limit) if more else None}
+
+
+def _whoop(handler, method, path, query, body):
+    stub = handler.stub
+    if method == "POST" and path == "/oauth/oauth2/token":
+        form = parse_qs((body or b"").decode())
+        refresh = form.get("refresh_token", ["stub-refresh"])[0]
+        if refresh.startswith("revoked"):
+            return 400, {"error": "invalid_grant", "error_description": "refresh token revoked"}
+        account, _, _ = refresh.partition("~")
+        new_refresh = refresh
+        if stub.rotate_refresh_tokens:
+            # Like WHOOP: every grant issues a new refresh token and spends the old one.
+            with stub._lock:
+                if refresh in stub.spent_refresh_tokens:
+                    stub.invalid_grants += 1
+                    return 400, {"error": "invalid_grant", "error_description": "refresh token already used"}
+                stub.spent_refresh_tokens.add(refresh)
+                stub.grants += 1
+                new_refresh = f"{account}~{stub.grants}"
+        # The access token names its account, so API calls can be attributed to one.
+        return 200, {
+            "access_token": f"stub-access-{account}-{random.getrandbits(32):08x}",
+            "expires_in": stub.token_ttl,
+            "refresh_token": new_refresh,
+            "scope": "read:sleep read:cycles read:recovery offline",
+            "token_type": "bearer",
+        }
+    kinds = {"/developer/v2/activity/sleep": "sleep", "/developer/v2/cycle": "cycle", "/developer/v2/recovery": "recovery"}
+    if method == "GET" and path in kinds:
+        account = (handler.headers.get("Authorization") or "").removeprefix("Bearer stub-access-").rpartition("-")[0]
+        with stub._lock:
+            stub.account_requests[account] = stub.account_requests.get(account, 0) + 1
+            failing_until = stub.account_faults.get(account)
+        if failing_until is not None and time.monotonic() < failing_until:
+            return 503, {"error": "injected", "account": account}
+        throttled = stub._throttle()
+        if throttled is not None:
+            return 429, {"error": "rate limited", "retry_after": throttled}
+        return 200, _whoop_page(kinds[path], query)
+    return 404, {"error": "not found"}
+
+
+def _vital(handler, method, path, query, body):
+    if method == "POST" and path == "/analyze-audio":
+        return 200, {"status": "ok", "results": {"fatigue": 0.31, "stress": 0.22, "cognitive_load": 0.4}}
+    return 404, {"error": "not found"}
+
+
+def _s3(handler, method, path, query, body):
+    if method == "GET" and query.get("list-type") == ["2"]:
+        bucket = path.strip("/").split("/")[0]
+        prefix = query.get("prefix", [""])[0]
+        now = datetime.now(timezone.utc)
+        contents = "".join(
+            f"<Contents><Key>{prefix}{i:04d}_photo.jpg</Key>"
+            f"<LastModified>{_iso(now - timedelta(hours=i))}</LastModified>"
+            f"<ETag>&quot;stub{i}&quot;</ETag><Size>204800</Size><StorageClass>STANDARD</StorageClass></Contents>"
+            for i in range(12)
+        )
+        xml = (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+            f"<Name>{bucket}</Name><Prefix>{prefix}</Prefix><KeyCount>12</KeyCount><MaxKeys>1000</MaxKeys>"
+            f"<IsTruncated>false</IsTruncated>{contents}</ListBucketResult>"
+        )
+        return 200, xml.encode()
+    if method == "PUT":
+        return 200, b""
+    return 404, b""
+
+
+def _beeper(handler, method, path, query, body):
+    if method == "GET" and path.startswith("/v1/chats/") and path.endswith("/messages"):
+        items = [
+            {"id": f"m{i}", "sortKey": f"{int(time.time())}{i:03d}", "type": "IMAGE",
+             "attachments": [{"id": f"mxc://stub/{i}", "fileName": f"photo{i}.jpg", "mimeType": "image/jpeg"}]}
+            for i in range(3)
+        ]
+        return 200, {"items": items}
+    if method == "POST" and path == "/v1/assets/download":
+        return 200, {"srcURL": "file:///dev/null"}
+    return 404, {"error": "not found"}
+
+
+SERVICES = {"anthropic": _anthropic, "whoop": _whoop, "vital": _vital, "s3": _s3, "beeper": _beeper}
+
+
+class StubServer:
+    """
+    One stub service on an ephemeral port, with ``latency`` seconds (+/- jitter)
+    added to each response. ``fail_next`` queues injected failures, and
+    ``connections`` counts accepted TCP connections (to check keep-alive).
+
+    The WHOOP stub also enforces ``rate_limits`` ((count, period_seconds)
+    pairs over a sliding window, answering 429 with Retry-After) on its API
+    routes, fails every API call of an account listed in ``account_faults``
+    (refresh token -> monotonic deadline) with 503 until the deadline, and
+    answers invalid_grant for refresh tokens starting with "revoked".
+    ``api_times`` holds the monotonic time of every API call it let through.
+    With ``rotate_refresh_tokens`` every grant rotates the refresh token and
+    reusing a spent one is answered with invalid_grant (counted in
+    ``invalid_grants``); access tokens last ``token_ttl`` seconds.
+    """
+
+    def __init__(self, name: str, latency: float = 0.0, jitter: float = 0.0,
+                 rate_limits: list[tuple[int, float]] | None = None,
+                 rotate_refresh_tokens: bool = False, token_ttl: int = 3600):
+        route = SERVICES[name]
+        stub = self
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self.connections = 0
+        self._faults: list[dict] = []
+        self._faults_lock = threading.Lock()
+        self.rate_limits = rate_limits or []
+        self.account_faults: dict[str, float] = {}
+        self.account_requests: dict[str, int] = {}
+        self.api_times: list[float] = []
+        self.throttled = 0
+        self.rotate_refresh_tokens = rotate_refresh_tokens
+        self.token_ttl = token_ttl
+        self.spent_refresh_tokens: set[str] = set()
+        self.grants = 0
+        self.invalid_grants = 0
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # headers and body go out in separate writes
+            stub = self
+
+            def setup(self):
+                stub.connections += 1
+                super().setup()
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                parsed = urlparse(self.path)
+                stub.requests += 1
+                fault = stub._take_fault(parsed.path)
+                delay = stub.latency + random.uniform(-stub.jitter, stub.jitter) + (fault or {}).get("delay", 0)
+                if delay > 0:
+                    time.sleep(delay)
+                if fault and fault["status"]:
+                    status, payload = fault["status"], {"error": "injected", "status": fault["status"]}
+                else:
+                    status, payload = route(self, self.command, parsed.path, parse_qs(parsed.query), body)
+                if isinstance(payload, (dict, list)):
+                    data, content_type = json.dumps(payload).encode(), "application/json"
+                else:
+                    data, content_type = payload, "application/xml"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                headers = dict((fault or {}).get("headers") or {})
+                if status == 429 and isinstance(payload, dict) and "retry_after" in payload:
+                    headers.setdefault("Retry-After", str(payload["retry_after"]))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client gave up (e.g. an injected delay past its timeout)
+
+            do_GET = do_POST = do_PUT = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = threading.Thread(target=self.server.serve_forever, name=f"stub-{name}", daemon=True)
+
+    def fail_next(self, status: int | None, count: int = 1, headers: dict | None = None,
+                  delay: float = 0.0, path_prefix: str = "") -> None:
+        """
+        Answer the next ``count`` requests under ``path_prefix`` with ``status``
+        (and ``headers``) after ``delay`` extra seconds; status None only delays.
+        """
+        with self._faults_lock:
+            self._faults.extend(
+                {"status": status, "headers": headers, "delay": delay, "path_prefix": path_prefix}
+                for _ in range(count)
+            )
+
+    def _throttle(self) -> int | None:
+        """Count one API call against ``rate_limits``; seconds to wait if it is over one, else None."""
+        now = time.monotonic()
+        with self._lock:
+            for count, period in self.rate_limits:
+                recent = [t for t in self.api_times[-count:] if t > now - period]
+                if len(recent) >= count:
+                    self.throttled += 1
+                    return max(1, int(recent[0] + period - now + 0.999))
+            self.api_times.append(now)
+        return None
+
+    def _take_fault(self, path: str) -> dict | None:
+        with self._faults_lock:
+            for i, fault in enumerate(self._faults):
+                if path.startswith(fault["path_prefix"]):
+                    return self._faults.pop(i)
+        return None
+
+    def start(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def start_stubs(latency: dict[str, float] | None = None, jitter: float = 0.0) -> dict[str, StubServer]:
+    latency = latency or {}
+    return {name: StubServer(name, latency.get(name, 0.0), jitter).start() for name in SERVICES}
+
+
+def whoop_token_env() -> dict[str, str]:
+    """Token file and lock directory in a fresh temp dir, so runs never touch the real ones."""
+    directory = tempfile.mkdtemp(prefix="whoop-stub-")
+    return {
+        "WHOOP_REFRESH_TOKEN_FILE": os.path.join(directory, "refresh_token.json"),
+        "WHOOP_LOCK_DIR": os.path.join(directory, "locks"),
+    }
+
+
+def stub_env(stubs: dict[str, StubServer]) -> dict[str, str]:
+    """Environment that points the backend (and Beeper client) at the stubs."""
+    return {
+        **whoop_token_env(),
+        "ANTHROPIC_BASE_URL": stubs["anthropic"].url,
+        "ANTHROPIC_API_KEY": "stub-key",
+        "WHOOP_API_BASE": stubs["whoop"].url,
+        "WHOOP_CLIENT_ID": "stub-client",
+        "WHOOP_CLIENT_SECRET": "stub-secret",
+        "WHOOP_REFRESH_TOKEN": "stub-refresh",
+        "VITAL_API_URL": stubs["vital"].url + "/analyze-audio",
+        "AWS_ENDPOINT_URL": stubs["s3"].url,
+        "AWS_ACCESS_KEY_ID": "stub",
+        "AWS_SECRET_ACCESS_KEY": "stub",
+        "AWS_DEFAULT_REGION": "us-east-1",
+        "AWS_S3_BUCKET": "loadtest-bucket",
+        "BEEPER_API_BASE": stubs["beeper"].url,
+        "BEEPER_ACCESS_TOKEN": "stub",
+    }
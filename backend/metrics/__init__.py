@@ -0,0 +1,4 @@
+from .registry import Counter, Gauge, Histogram, Registry, registry
+from .middleware import MetricsMiddleware
+
+__all__ = ["Counter", "Gauge", "Histogram", "Registry", "registry", "MetricsMiddleware"]
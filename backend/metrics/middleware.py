@@ -0,0 +1,74 @@
+import time
+
+from metrics.registry import SIZE_BUCKETS, registry
+
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route")
+)
+REQUESTS = registry.counter(
+    "http_requests_total", "HTTP responses by route and status code.", ("method", "route", "status")
+)
+IN_FLIGHT = registry.gauge("http_requests_in_flight", "HTTP requests currently being served.")
+REQUEST_SIZE = registry.histogram(
+    "http_request_size_bytes", "Request body size (Content-Length).", ("route",), buckets=SIZE_BUCKETS
+)
+RESPONSE_SIZE = registry.histogram(
+    "http_response_size_bytes", "Response body size.", ("route",), buckets=SIZE_BUCKETS
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status, in-flight and payload size per route.
+
+    Routes are labelled by their template (e.g. /jobs/{job_id}), never the raw
+    path, so label cardinality stays bounded; unmatched paths share one label.
+    Requests answered before routing (e.g. a 429 from admission control) are
+    labelled with their path when it is one of the app's static ``routes``.
+    """
+
+    def __init__(self, app, routes: list | None = None):
+        self.app = app
+        self._routes = routes or []
+        self._static_paths: set[str] | None = None
+
+    def _route_label(self, scope) -> str:
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        if self._static_paths is None:
+            self._static_paths = {r.path for r in self._routes if "{" not in getattr(r, "path", "{")}
+        path = scope.get("path", "")
+        return path if path in self._static_paths else "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        response_bytes = 0
+        IN_FLIGHT.inc()
+
+        async def send_wrapper(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec()
+            route = self._route_label(scope)
+            method = scope.get("method", "")
+            REQUEST_LATENCY.labels(method, route).observe(time.perf_counter() - started)
+            REQUESTS.labels(method, route, status).inc()
+            for name, value in scope.get("headers") or ():
+                if name == b"content-length":
+                    REQUEST_SIZE.labels(route).observe(int(value))
+                    break
+            RESPONSE_SIZE.labels(route).observe(response_bytes)
@@ -0,0 +1,270 @@
+"""
+Minimal Prometheus-style metrics registry.
+
+Counters, gauges and histograms are sharded per thread: each thread only
+ever writes its own shard (a small list), so the hot path takes no lock and
+never loses an update. A scrape sums the shards. Label children are cached
+by their label values, so recording a sample allocates at most the label
+tuple.
+
+Modules declare their metrics at import time with ``counter()``,
+``gauge()`` and ``histogram()`` on the shared ``registry``; state owned by
+other objects (queue depth, breaker state) is exposed with
+``gauge(...).set_function(fn)`` or a collector, evaluated only on scrape.
+"""
+
+import math
+from bisect import bisect_left
+from threading import get_ident
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def render_family(name: str, kind: str, documentation: str, samples: list[tuple[dict, float]]) -> list[str]:
+    """Text lines for one metric family from (labels, value) pairs; for collectors."""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_format_value(value)}")
+    return lines
+
+
+class _Sharded:
+    """Per-thread value slots; only the owning thread writes a slot."""
+
+    __slots__ = ("_shards", "_size")
+
+    def __init__(self, size: int):
+        self._shards: dict[int, list] = {}
+        self._size = size
+
+    def shard(self) -> list:
+        shard = self._shards.get(get_ident())
+        if shard is None:
+            shard = self._shards.setdefault(get_ident(), [0.0] * self._size)
+        return shard
+
+    def totals(self) -> list:
+        totals = [0.0] * self._size
+        for shard in list(self._shards.values()):
+            for i, v in enumerate(shard):
+                totals[i] += v
+        return totals
+
+
+class _CounterChild:
+    __slots__ = ("_values",)
+
+    def __init__(self):
+        self._values = _Sharded(1)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._values.shard()[0] += amount
+
+    def value(self) -> float:
+        return self._values.totals()[0]
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ("_function",)
+
+    def __init__(self):
+        super().__init__()
+        self._function = None
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._values.shard()[0] -= amount
+
+    def set_function(self, fn) -> None:
+        """Report ``fn()`` at scrape time instead of the inc/dec total."""
+        self._function = fn
+
+    def value(self) -> float:
+        return float(self._function()) if self._function is not None else super().value()
+
+
+class _HistogramChild:
+    __slots__ = ("_buckets", "_values")
+
+    def __init__(self, buckets: tuple):
+        self._buckets = buckets
+        # One slot per bucket, then +Inf, then the sum.
+        self._values = _Sharded(len(buckets) + 2)
+
+    def observe(self, value: float) -> None:
+        shard = self._values.shard()
+        shard[bisect_left(self._buckets, value)] += 1
+        shard[-1] += value
+
+    def totals(self) -> tuple[list, float]:
+        totals = self._values.totals()
+        return totals[:-1], totals[-1]
+
+    def quantile(self, q: float) -> float:
+        """Bucket-interpolated quantile; the +Inf bucket reports the largest finite bound."""
+        counts, _ = self.totals()
+        rank = q * sum(counts)
+        seen = 0.0
+        for i, count in enumerate(counts):
+            if count and seen + count >= rank:
+                if i == len(self._buckets):
+                    return self._buckets[-1]
+                lower = self._buckets[i - 1] if i > 0 else 0.0
+                return lower + (self._buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return 0.0
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children.setdefault(tuple(str(v) for v in values), self._new_child())
+            self._children.setdefault(values, child)
+        return child
+
+    def samples(self):
+        """(label values, child) pairs, once per child; for views built on the registry."""
+        seen = set()
+        for values, child in list(self._children.items()):
+            if id(child) in seen:
+                continue
+            seen.add(id(child))
+            yield tuple(str(v) for v in values), child
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self.samples():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value())}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+    def set_function(self, fn) -> None:
+        self._default.set_function(fn)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self.samples():
+            counts, total = child.totals()
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            # Re-imports (e.g. uvicorn --reload) get the metric already registered.
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector) -> None:
+        """``collector()`` returns Prometheus text lines; called on each scrape."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                print(f"[metrics] collector {getattr(collector, '__name__', collector)} failed: {e}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
@@ -0,0 +1,4 @@
+from .serialization import EncodedCache, JSONBytesResponse, join_json_array, json_bytes
+from .compression import CompressionMiddleware
+
+__all__ = ["EncodedCache", "JSONBytesResponse", "join_json_array", "json_bytes", "CompressionMiddleware"]
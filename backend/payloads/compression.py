@@ -0,0 +1,123 @@
+"""
+Response compression negotiated from Accept-Encoding.
+
+Brotli is used when the client accepts it and the optional ``brotli``
+package is installed, gzip otherwise. Only complete bodies of compressible
+types over ``minimum_size`` are compressed. Streamed responses (NDJSON from
+/analyze-pipeline) and bodies that already carry a Content-Encoding pass
+through untouched, so streaming keeps its latency.
+"""
+
+import gzip
+import importlib.util
+
+from metrics.registry import registry
+
+
+COMPRESSIBLE_TYPES = (b"application/json", b"text/", b"application/xml", b"application/javascript")
+
+COMPRESSED_RESPONSES = registry.counter(
+    "http_compressed_responses_total", "Responses compressed, by encoding.", ("encoding",)
+)
+COMPRESSION_BYTES = registry.counter(
+    "http_compression_bytes_total", "Response bytes before and after compression.", ("stage",)
+)
+
+
+def _accepted(header: str) -> dict[str, float]:
+    """Accept-Encoding as {coding: q}."""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = q
+    return accepted
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        # find_spec does not import the module; it is imported on the first brotli response.
+        self.brotli_available = importlib.util.find_spec("brotli") is not None
+        self._brotli = None
+
+    def _choose(self, scope) -> str | None:
+        for name, value in scope.get("headers") or ():
+            if name == b"accept-encoding":
+                accepted = _accepted(value.decode("latin-1"))
+                if self.brotli_available and accepted.get("br", 0) > 0:
+                    return "br"
+                if accepted.get("gzip", accepted.get("*", 0)) > 0:
+                    return "gzip"
+                return None
+        return None
+
+    def _compress(self, encoding: str, body: bytes) -> bytes:
+        if encoding == "br":
+            if self._brotli is None:
+                import brotli
+
+                self._brotli = brotli
+            return self._brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    async def __call__(self, scope, receive, send):
+        encoding = self._choose(scope) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = start.get("headers") or []
+            content_type = next((v for k, v in headers if k == b"content-type"), b"")
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or any(k == b"content-encoding" for k, _ in headers)
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            compressed = self._compress(encoding, body)
+            COMPRESSED_RESPONSES.labels(encoding).inc()
+            COMPRESSION_BYTES.labels("uncompressed").inc(len(body))
+            COMPRESSION_BYTES.labels("compressed").inc(len(compressed))
+            headers = [(k, v) for k, v in headers if k not in (b"content-length", b"vary")]
+            vary = [v for k, v in start.get("headers") or [] if k == b"vary"]
+            headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", b", ".join(vary + [b"Accept-Encoding"])),
+            ]
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed, "more_body": False})
+
+        await self.app(scope, receive, send_wrapper)
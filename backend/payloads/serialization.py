@@ -0,0 +1,112 @@
+"""
+Fast JSON encoding for large response bodies.
+
+FastAPI's default path walks every returned value through
+jsonable_encoder and then json.dumps; for a multi-session analysis with
+raw metrics and evidence that is most of the request time. json_bytes()
+encodes dicts, lists and the analyzer dataclasses straight to bytes,
+with orjson when it is installed (optional, ``pip install orjson``) and
+the stdlib encoder otherwise. Returning JSONBytesResponse from an endpoint
+skips jsonable_encoder entirely.
+
+EncodedCache keeps the encoded bytes of immutable values, such as a stored
+session at a given version, so repeated reads skip encoding as well.
+"""
+
+import dataclasses
+import json
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+
+from fastapi.responses import Response
+
+
+_orjson = None
+_orjson_checked = False
+
+
+def _get_orjson():
+    global _orjson, _orjson_checked
+    if not _orjson_checked:
+        try:
+            import orjson
+        except ImportError:
+            orjson = None
+        _orjson, _orjson_checked = orjson, True
+    return _orjson
+
+
+def _default(value):
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_bytes(value) -> bytes:
+    """Compact UTF-8 JSON for ``value`` (dicts, lists, dataclasses, datetimes)."""
+    orjson = _get_orjson()
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class JSONBytesResponse(Response):
+    """JSON response encoded with json_bytes; ``content`` may also be pre-encoded bytes."""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            return bytes(content)
+        return json_bytes(content)
+
+
+def join_json_array(items: list[bytes]) -> bytes:
+    """Encoded JSON array from already-encoded elements."""
+    return b"[" + b",".join(items) + b"]"
+
+
+class EncodedCache:
+    """
+    Thread-safe LRU of encoded JSON keyed by something that changes whenever
+    the value does (e.g. a session's id and version plus the response shape).
+    """
+
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[object, bytes] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_encode(self, key, value_fn) -> bytes:
+        """Cached bytes for ``key``, else ``json_bytes(value_fn())`` (stored if it fits)."""
+        with self._lock:
+            encoded = self._entries.get(key)
+            if encoded is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return encoded
+            self.misses += 1
+        encoded = json_bytes(value_fn())
+        if len(encoded) > self.max_bytes // 16:
+            return encoded  # too big to be worth evicting everything else for
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = encoded
+                self._bytes += len(encoded)
+                while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= len(evicted)
+        return encoded
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
@@ -1,24 +1,45 @@
-import anthropic
 import pprint
 import json
 import re
+import time
 from datetime import datetime
 
-client = anthropic.Anthropic()
+from llm.circuit_breaker import CircuitOpenError
+from llm.client import create_message
+from llm.router import log_route, route
 
-def get_preventative_care_recommendations(ai_summary: str):
+# Extra instruction per routing prompt variant (see llm.router).
+_TRIAGE_HINTS = {
+    "brief": "The rule-based screen for this session shows baseline performance, so apply Case B.\n",
+    "standard": "",
+}
+
+
+def extract_json(text: str) -> str:
+    """The JSON inside a ```json fenced block in a Claude reply, or the whole reply if there is none."""
+    json_match = re.search(r"```json\n(.*?)\n```", text, re.DOTALL)
+    return json_match.group(1) if json_match else text
+
+
+def get_preventative_care_recommendations(
+    ai_summary: str,
+    risk_score: float | None = None,
+    flagged_count: int | None = None,
+):
     """
     Generates preventative care recommendations based on AI and rule-based summaries.
 
     Args:
         ai_summary (str): AI-generated summary of the session.
-        risk_score (str): Overall cognitive risk score for the session.
-        rule_based_summary (str): Rule-based summary of the session.
+        risk_score (float | None): Rule-based risk score, used to pick the model tier.
+        flagged_count (int | None): Number of flagged markers, used to pick the model tier.
 
     Returns:
         dict: A dictionary containing preventative care recommendations or an error message.
     """
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    selected = route("preventative_care", risk_score, flagged_count)
+    triage_hint = _TRIAGE_HINTS[selected.prompt_variant]
 
     prompt_content = f"""
 To incorporate your request, I have added a "Triage & Selection Logic" section to the instructions. This ensures the agent first assesses the "linguistic biomarkers" (like word-finding pauses, vague descriptors, or simplified syntax) before deciding whether to launch a full rehabilitative suite or a standard cognitive "workout."
@@ -83,7 +104,7 @@ Tone & Style:
 Here is the AI-generated summary of the session:
 {ai_summary}
 
-Based on the above information, and following the "Triage & Selection Logic" and "Protocols" provided, please provide recommendations as a JSON array. Each object in the array should have the following fields:
+{triage_hint}Based on the above information, and following the "Triage & Selection Logic" and "Protocols" provided, please provide recommendations as a JSON array. Each object in the array should have the following fields:
 - "Action title": A concise title for the action.
 - "Action explanation": A concise explanation of the action.
 - "Action reason": A concise reason why this action is recommended based on the provided report.
@@ -91,25 +112,27 @@ Based on the above information, and following the "Triage & Selection Logic" and
 Do not use emojis.
 """
 
-    message = client.messages.create(
-        model="claude-opus-4-6",
-        max_tokens=2000,
-        messages=[
-            {
-                "role": "user",
-                "content": prompt_content,
-            }
-        ],
-        system="Your response MUST be a JSON array of objects, as described in the user prompt. Do not include any other text or formatting outside the JSON array.",
-    )
+    started = time.perf_counter()
+    try:
+        message = create_message(
+            "preventative_care",
+            model=selected.model,
+            max_tokens=selected.max_tokens,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt_content,
+                }
+            ],
+            system="Your response MUST be a JSON array of objects, as described in the user prompt. Do not include any other text or formatting outside the JSON array.",
+        )
+    except Exception as e:
+        outcome = "circuit_open" if isinstance(e, CircuitOpenError) else "error"
+        log_route("preventative_care", selected, started, outcome=outcome)
+        raise
+    log_route("preventative_care", selected, started)
     try:
-        json_match = re.search(r"```json\n(.*?)\n```", message.content[0].text, re.DOTALL)
-        if json_match:
-            json_string = json_match.group(1)
-        else:
-            json_string = message.content[0].text
-            
-        recommendations = json.loads(json_string)
+        recommendations = json.loads(extract_json(message.content[0].text))
         return recommendations
     except json.JSONDecodeError as e:
         print(f"Error decoding JSON from Claude: {e}")
@@ -0,0 +1,297 @@
+"""
+Local preventative-care recommendation engine.
+
+The Cognitive-Linguistic Coach prompt in preventative_care.py describes a
+deterministic triage: Case A (signs of cognitive strain) gets the SFA, VNeST
+and PCA protocols, Case B (baseline performance) gets exactly two "General
+Cognitive Workout" tasks. This module runs that triage locally and fills the
+protocols from a precomputed template library, so recommendations come back
+in milliseconds. Claude is only used, optionally, to personalize the free-text
+"Action reason" fields, and those results are cached.
+"""
+
+import hashlib
+import json
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from threading import Lock
+
+from llm.client import create_message
+
+from .preventative_care import extract_json
+
+
+PERSONALIZE_MODEL = "claude-haiku-4-5"
+PERSONALIZE_CACHE_SIZE = 512
+
+# Risk score (0-100) at or above which a summary is treated as Case A.
+CASE_A_RISK_MIN = 25.0
+
+
+@dataclass
+class TriageProfile:
+    """Result of classifying a session summary."""
+    case: str                                  # "A" (cognitive strain) or "B" (baseline)
+    risk_score: float | None = None
+    markers: list = field(default_factory=list)  # profile tags, e.g. "word_finding"
+
+
+# --- Template library ---
+
+SFA_OBJECTS = [
+    "a grandfather clock", "a pressure cooker", "a sewing machine",
+    "a telescope", "a wheelbarrow", "a metronome", "a lighthouse",
+]
+VNEST_VERBS = ["Organize", "Repair", "Negotiate", "Prepare", "Mitigate", "Analyze", "Restore"]
+NO_PRONOUN_SCENARIOS = [
+    "planning a family picnic when rain is forecast",
+    "returning a faulty kettle to a busy shop",
+    "giving a neighbour directions to the post office",
+    "hosting grandchildren who arrive a day early",
+]
+SRT_FACTS = [
+    "the Italian phrase 'buongiorno' means 'good morning'",
+    "a group of owls is called a parliament",
+    "honey never spoils if kept sealed",
+    "the Eiffel Tower grows about 15 cm taller in summer",
+]
+
+PROTOCOLS = {
+    "SFA": {
+        "title": "Semantic Feature Analysis: {param}",
+        "explanation": (
+            "Describe {param} by its group, use, action, properties, location and association. "
+            "When a description is vague, push for a specific technical or descriptive term."
+        ),
+        "params": SFA_OBJECTS,
+    },
+    "VNeST": {
+        "title": "Verb Network Strengthening: \"{param}\"",
+        "explanation": (
+            "Name three agent-patient pairs for the verb \"{param}\" (who does it, what is acted upon), "
+            "then expand one pair into a full sentence with when, where and why."
+        ),
+        "params": VNEST_VERBS,
+    },
+    "PCA": {
+        "title": "Phonological Components Analysis",
+        "explanation": (
+            "At the next tip-of-the-tongue moment, work through rhyme, first sound, first letter, "
+            "syllable count and final sound of the missing word before saying it."
+        ),
+        "params": [""],
+    },
+    "NO_PRONOUN": {
+        "title": "No-Pronoun Constraint Game",
+        "explanation": (
+            "Describe {param} for 60 seconds without pronouns. Each he, she, it or they restarts the "
+            "sentence with a specific noun."
+        ),
+        "params": NO_PRONOUN_SCENARIOS,
+    },
+    "SRT": {
+        "title": "Spaced Retrieval Training",
+        "explanation": (
+            "Learn that {param}, then recall it after 30 seconds, 2 minutes and 5 minutes during the session."
+        ),
+        "params": SRT_FACTS,
+    },
+}
+
+REASONS = {
+    "lexical": "The report shows reduced vocabulary diversity, and naming features of objects broadens word retrieval.",
+    "word_finding": "The report points to word-finding difficulty, which this exercise targets directly.",
+    "pronoun": "The report shows heavy reliance on pronouns and vague nouns, and this task forces specific wording.",
+    "disfluency": "The report notes fillers and false starts, and structured retrieval practice supports fluent speech.",
+    "pauses": "The report notes increased pausing, and practising retrieval cues can shorten search time.",
+    "repetition": "The report notes repeated statements, and spaced recall strengthens memory for new information.",
+    "baseline": "Speech in the report is fluid and cognitively dense, so this keeps executive function challenged.",
+}
+
+# Which profile tags each protocol addresses, in preference order.
+PROTOCOL_TARGETS = {
+    "SFA": ["lexical", "word_finding"],
+    "VNeST": ["word_finding", "lexical", "disfluency"],
+    "PCA": ["word_finding", "pauses"],
+    "NO_PRONOUN": ["pronoun"],
+    "SRT": ["repetition"],
+}
+
+CASE_A_PROTOCOLS = ["SFA", "VNeST", "PCA"]
+
+
+# --- Triage ---
+
+_CATEGORY_TAGS = {
+    "lexical_diversity": "lexical",
+    "anomia": "word_finding",
+    "pronoun_usage": "pronoun",
+    "disfluency": "disfluency",
+    "pause_patterns": "pauses",
+    "repetition": "repetition",
+}
+
+_TEXT_SIGNALS = {
+    "lexical": r"lexical|vocabulary (?:loss|diversity|richness)|type-token",
+    "word_finding": r"word[- ]finding|word retrieval|tip[- ]of[- ]the[- ]tongue|anomia",
+    "pronoun": r"pronoun|vague (?:nouns?|words?|descriptors?)",
+    "disfluency": r"filler|false starts?|disfluen",
+    "pauses": r"paus(?:e|es|ing)|hesitation",
+    "repetition": r"repeat(?:ed|ing|s)? (?:stories|story|phrases)|repetiti",
+}
+_NEGATION = re.compile(r"\b(?:no|not|without|zero|minimal|low|normal|healthy|excellent|strong|rather than|instead of)\b[^.\n]{0,40}$")
+_RISK_SCORE = re.compile(r"risk score[^0-9\n]{0,40}(\d+(?:\.\d+)?)\s*(?:/|out of)\s*100", re.IGNORECASE)
+
+
+def classify_markers(markers: list[dict], risk_score: float | None = None) -> TriageProfile:
+    """Triage from rule-based markers (analyze_transcript()["markers"])."""
+    tags = []
+    for m in markers:
+        tag = _CATEGORY_TAGS.get(m.get("category", ""))
+        if m.get("flagged") and tag and tag not in tags:
+            tags.append(tag)
+    strained = bool(tags) if risk_score is None else (risk_score >= CASE_A_RISK_MIN or len(tags) >= 2)
+    return TriageProfile(case="A" if strained else "B", risk_score=risk_score, markers=tags)
+
+
+def classify_summary(ai_summary: str) -> TriageProfile:
+    """
+    Triage from a free-text summary.
+
+    Accepts either the caretaker summary text or a full /analyze-transcript-ai
+    response serialized as JSON, in which case the rule-based markers are used.
+    """
+    try:
+        payload = json.loads(ai_summary)
+    except ValueError:
+        payload = None
+    if isinstance(payload, dict):
+        rule_based = payload.get("rule_based") or {}
+        if rule_based.get("markers"):
+            return classify_markers(rule_based["markers"], payload.get("risk_score"))
+        ai_summary = str(payload.get("ai_summary", ai_summary))
+
+    match = _RISK_SCORE.search(ai_summary)
+    risk_score = float(match.group(1)) if match else None
+
+    tags = []
+    lowered = ai_summary.lower()
+    for tag, pattern in _TEXT_SIGNALS.items():
+        for hit in re.finditer(pattern, lowered):
+            line_start = lowered.rfind("\n", 0, hit.start()) + 1
+            if not _NEGATION.search(lowered[line_start:hit.start()]):
+                tags.append(tag)
+                break
+
+    if risk_score is not None:
+        strained = risk_score >= CASE_A_RISK_MIN
+    else:
+        strained = len(tags) >= 2
+    return TriageProfile(case="A" if strained else "B", risk_score=risk_score, markers=tags)
+
+
+# --- Template filling ---
+
+def _pick(options: list[str], seed: str) -> str:
+    digest = hashlib.sha256(seed.encode()).digest()
+    return options[int.from_bytes(digest[:4], "big") % len(options)]
+
+
+def _select_protocols(profile: TriageProfile) -> list[str]:
+    if profile.case == "A":
+        return CASE_A_PROTOCOLS
+    if "pronoun" in profile.markers:
+        return ["NO_PRONOUN", "SRT"]
+    return ["VNeST", "SRT"]
+
+
+def _reason(protocol: str, profile: TriageProfile) -> str:
+    for tag in PROTOCOL_TARGETS[protocol]:
+        if tag in profile.markers:
+            return REASONS[tag]
+    if profile.case == "A":
+        return "The report shows signs of cognitive strain, and this protocol is part of the three-task rehabilitation set."
+    return REASONS["baseline"]
+
+
+def build_recommendations(profile: TriageProfile, seed: str = "") -> list[dict]:
+    """Fill the protocol templates for a triage profile (deterministic for a given seed)."""
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    recommendations = []
+    for protocol in _select_protocols(profile):
+        template = PROTOCOLS[protocol]
+        param = _pick(template["params"], f"{seed}:{protocol}")
+        recommendations.append({
+            "Action title": template["title"].format(param=param),
+            "Action explanation": template["explanation"].format(param=param),
+            "Action reason": _reason(protocol, profile),
+            "Time": current_time,
+        })
+    return recommendations
+
+
+# --- Personalization (cached) ---
+
+_personalize_cache: OrderedDict[str, list[str]] = OrderedDict()
+_personalize_lock = Lock()
+
+
+def _personalized_reasons(ai_summary: str, recommendations: list[dict]) -> list[str]:
+    titles = [r["Action title"] for r in recommendations]
+    key = hashlib.sha256(json.dumps([ai_summary, titles]).encode()).hexdigest()
+    with _personalize_lock:
+        if key in _personalize_cache:
+            _personalize_cache.move_to_end(key)
+            return _personalize_cache[key]
+
+    prompt = (
+        "Here is a cognitive health summary for an older adult:\n"
+        f"{ai_summary}\n\n"
+        "For each of these exercises, write one warm, specific sentence explaining to the family "
+        "caretaker why it fits this person, grounded in the summary:\n"
+        + "\n".join(f"- {t}" for t in titles)
+        + "\n\nReturn only a JSON array of strings, one per exercise, in the same order. Do not use emojis."
+    )
+    message = create_message(
+        "preventative_care_personalize",
+        model=PERSONALIZE_MODEL,
+        max_tokens=400,
+        messages=[{"role": "user", "content": prompt}],
+    )
+    reasons = json.loads(extract_json(message.content[0].text))
+    if not isinstance(reasons, list) or len(reasons) != len(titles):
+        raise ValueError("unexpected personalization response")
+
+    with _personalize_lock:
+        _personalize_cache[key] = reasons
+        while len(_personalize_cache) > PERSONALIZE_CACHE_SIZE:
+            _personalize_cache.popitem(last=False)
+    return reasons
+
+
+def recommend(ai_summary: str, personalize: bool = False) -> list[dict]:
+    """
+    Preventative care recommendations without a full LLM generation.
+
+    Returns the same list-of-actions shape as get_preventative_care_recommendations().
+    With ``personalize``, the "Action reason" fields are rewritten by Claude;
+    if that call fails the template reasons are kept.
+    """
+    profile = classify_summary(ai_summary)
+    recommendations = build_recommendations(profile, seed=ai_summary)
+    if personalize:
+        try:
+            for rec, reason in zip(recommendations, _personalized_reasons(ai_summary, recommendations)):
+                rec["Action reason"] = str(reason)
+        except Exception as e:
+            print("Preventative care personalization failed:", e)
+    return recommendations
+
+
+def recommend_from_analysis(analysis: dict) -> list[dict]:
+    """Recommendations straight from an analyze_transcript() result (no summary text needed)."""
+    profile = classify_markers(analysis.get("markers", []), analysis.get("risk_score"))
+    seed = f"{analysis.get('session_id', '')}:{analysis.get('session_date', '')}"
+    return build_recommendations(profile, seed=seed)
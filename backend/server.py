@@ -1,25 +1,66 @@
-from fastapi import FastAPI
+import settings  # noqa: F401  (loads backend/.env before any module reads its configuration)
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Literal
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-import requests
 from analysis import TranscriptAnalyzer, generate_summary, generate_longitudinal_summary
-from analysis.transcript_analyzer import analyze_transcript, analyze_sessions
+from analysis.ai_summary import longitudinal_payload
+from analysis.transcript_analyzer import (
+    analyze_transcript, analyze_sessions, analyze_transcript_result, analyze_sessions_result,
+)
 from preventative_care.preventative_care import get_preventative_care_recommendations
+from preventative_care.recommendation_engine import recommend, recommend_from_analysis
+from llm.circuit_breaker import CircuitOpenError, claude_breaker
 from companionship.controller import router as companionship_router
 from whoop.controller import router as whoop_router
+from whoop.service import whoop_client
+from whoop.scheduler import SCHEDULER_ENABLED, whoop_scheduler
+from whoop.sync import shutdown as whoop_sync_shutdown
+from llm.controller import router as llm_router
+from sessions.controller import router as sessions_router, session_store
+from jobs.callbacks import CallbackURLError
+from jobs.controller import router as jobs_router, job_queue, job_status
+from admission import AdmissionMiddleware, admission
+from admission.controller import router as admission_router
+from metrics import MetricsMiddleware
+from metrics.controller import router as metrics_router
+from payloads import CompressionMiddleware, JSONBytesResponse
 from fastapi.middleware.cors import CORSMiddleware # Import CORSMiddleware
 import os
 from datetime import datetime
-from dotenv import load_dotenv  # <--- Add this
-# Load the .env file immediately
-load_dotenv()
 
 # Now you can verify it loaded (optional)
 if not os.getenv("ANTHROPIC_API_KEY"):
     print("WARNING: ANTHROPIC_API_KEY not found in environment!")
-app = FastAPI()
 
-# In-memory session store
-_sessions: list[dict] = []
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background job workers; jobs left queued by a previous process resume here.
+    job_queue.start()
+    # Keeps every connected elder's WHOOP store fresh (see whoop/scheduler.py).
+    if SCHEDULER_ENABLED:
+        whoop_scheduler.start()
+    yield
+    await whoop_scheduler.stop()
+    await whoop_sync_shutdown()
+    job_queue.stop()
+    await whoop_client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Per-client rate limits and concurrency caps for the analysis endpoints (see admission/limiter.py).
+# Added before CORS so CORS wraps it and 429s still carry CORS headers.
+app.add_middleware(AdmissionMiddleware, controller=admission)
+# Wraps admission control, so latency and status include time spent queued or rejected there.
+app.add_middleware(MetricsMiddleware, routes=app.router.routes)
+# gzip (or brotli, if installed) for large JSON bodies; inside CORS, outside metrics, so
+# response-size metrics report uncompressed bytes and compression has its own counters.
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
 
 # Add CORS middleware — allow all origins in dev for mobile + dashboard access
 app.add_middleware(
@@ -28,10 +69,16 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Retry-After"],
 )
 
 app.include_router(companionship_router, prefix="/companionship")
 app.include_router(whoop_router)
+app.include_router(llm_router)
+app.include_router(sessions_router)
+app.include_router(jobs_router)
+app.include_router(admission_router)
+app.include_router(metrics_router)
 
 analyzer = TranscriptAnalyzer()
 
@@ -40,6 +87,7 @@ class TranscriptRequest(BaseModel):
     transcript: str
     session_id: str = ""
     session_date: str = ""
+    elder_id: str = "default"
 
 
 class SessionEntry(BaseModel):
@@ -48,12 +96,27 @@ class SessionEntry(BaseModel):
     date: str = ""
 
 
-class LongitudinalRequest(BaseModel):
+class PipelineRequest(TranscriptRequest):
+    stream: bool = False
+
+
+class JobOptions(BaseModel):
+    """Set background=true to get a job id back immediately instead of waiting for Claude."""
+    background: bool = False
+    priority: Literal["live", "backfill"] = "live"
+    callback_url: str | None = None
+
+
+class LongitudinalRequest(JobOptions):
     sessions: list[SessionEntry]
 
 
-class PreventativeCareRequest(BaseModel):
+class PreventativeCareRequest(JobOptions):
     ai_summary: str
+    risk_score: float | None = None
+    flagged_markers: int | None = None
+    engine: str = "template"  # "template" (local triage) or "llm" (full Claude generation)
+    personalize: bool = False
 
 # 2. Define a route (the path) and the HTTP method (get)
 @app.get("/")
@@ -65,7 +128,7 @@ async def root():
 @app.get("/health")
 async def health():
     """Health check for analytics service (mobile/frontend can ping this)."""
-    return {"ok": True, "service": "analytics"}
+    return {"ok": True, "service": "analytics", "claude_circuit": claude_breaker.snapshot()}
 
 @app.get("/vital-api")
 async def root():
@@ -73,8 +136,13 @@ async def root():
     
     return {"message": response}
 
+VITAL_API_URL = os.getenv("VITAL_API_URL", "https://api.qr.sonometrik.vitalaudio.io/analyze-audio")
+
+
 def callVitalApi(file_path):
-    url = "https://api.qr.sonometrik.vitalaudio.io/analyze-audio"
+    import requests  # only this debug endpoint needs it; keep it off the startup path
+
+    url = VITAL_API_URL
 
     headers = {
         "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:147.0) Gecko/20100101 Firefox/147.0",
@@ -123,18 +191,26 @@ def callVitalApi(file_path):
 @app.post("/analyze-transcript")
 async def analyze_single_transcript(req: TranscriptRequest):
     """Analyze a single Zingage call transcript for cognitive decline markers (rule-based only)."""
-    result = analyze_transcript(req.transcript, req.session_id, req.session_date)
-    return result
+    result = analyze_transcript_result(req.transcript, req.session_id, req.session_date)
+    return JSONBytesResponse(result)
 
 
 @app.post("/analyze-transcript-ai")
 async def analyze_single_transcript_ai(req: TranscriptRequest):
     """Analyze a transcript with rule-based scoring + Claude AI summary and interventions."""
     rule_based = analyze_transcript(req.transcript, req.session_id, req.session_date)
+    # Claude call off the event loop; admission control bounds how many run at once.
+    result = await asyncio.to_thread(_summarize_with_fallback, rule_based)
+    await asyncio.to_thread(_save_session, req, result)
+    return result
+
+
+def _summarize_with_fallback(rule_based: dict) -> dict:
+    """Claude summary for a rule-based analysis, or the rule-based summary if Claude is unavailable."""
     if os.getenv("ANTHROPIC_API_KEY"):
         try:
             ai_result = generate_summary(rule_based)
-            result = {**ai_result, "rule_based": rule_based}
+            return {**ai_result, "rule_based": rule_based}
         except Exception as e:
             err_str = str(e)
             print("Analytics AI summary failed:", e)
@@ -143,7 +219,7 @@ async def analyze_single_transcript_ai(req: TranscriptRequest):
             fallback = rule_based.get("summary", "Analysis complete. AI summary unavailable.")
             if "401" in err_str or "invalid x-api-key" in err_str:
                 fallback = fallback + " (Claude API key invalid — set ANTHROPIC_API_KEY in backend/.env)"
-            result = {
+            return {
                 "ai_summary": fallback,
                 "risk_score": rule_based.get("risk_score", 0),
                 "rule_based_summary": rule_based.get("summary", ""),
@@ -151,18 +227,34 @@ async def analyze_single_transcript_ai(req: TranscriptRequest):
                 "session_date": rule_based.get("session_date", ""),
                 "rule_based": rule_based,
             }
-    else:
-        result = {
-            "ai_summary": rule_based.get("summary", "Analysis complete. Set ANTHROPIC_API_KEY in backend/.env for AI-generated insights."),
-            "risk_score": rule_based.get("risk_score", 0),
-            "rule_based_summary": rule_based.get("summary", ""),
-            "session_id": rule_based.get("session_id", ""),
-            "session_date": rule_based.get("session_date", ""),
-            "rule_based": rule_based,
-        }
-
-    # Auto-save to in-memory session store
-    _sessions.append({
+    return {
+        "ai_summary": rule_based.get("summary", "Analysis complete. Set ANTHROPIC_API_KEY in backend/.env for AI-generated insights."),
+        "risk_score": rule_based.get("risk_score", 0),
+        "rule_based_summary": rule_based.get("summary", ""),
+        "session_id": rule_based.get("session_id", ""),
+        "session_date": rule_based.get("session_date", ""),
+        "rule_based": rule_based,
+    }
+
+
+def _save_session(req: TranscriptRequest, result: dict) -> dict:
+    """
+    Auto-save an analysis to the session store. Re-analyzing a session the
+    elder already has (same session_id) updates it in place, giving it a new
+    version for /sessions/changes, instead of storing a duplicate. Blocking
+    SQLite; async handlers call it through asyncio.to_thread.
+    """
+    existing = req.session_id and session_store.get(req.session_id, req.elder_id)
+    if existing:
+        updated = session_store.update(existing["id"], {
+            "transcript": req.transcript,
+            "analysis_result": result,
+            "session_date": req.session_date,
+        })
+        if updated is not None:
+            return updated
+    return session_store.add({
+        "elder_id": req.elder_id,
         "transcript": req.transcript,
         "analysis_result": result,
         "session_id": req.session_id,
@@ -170,48 +262,149 @@ async def analyze_single_transcript_ai(req: TranscriptRequest):
         "timestamp": datetime.utcnow().isoformat(),
     })
 
-    return result
 
+@app.post("/analyze-pipeline")
+async def analyze_pipeline(req: PipelineRequest):
+    """
+    One round trip for the dashboard: rule-based analysis, Claude summary and
+    marker-based preventative care recommendations.
+
+    The transcript is analyzed once; the summary and recommendations then run
+    concurrently and the combined result is saved like /analyze-transcript-ai.
+    With stream=true the response is NDJSON, one {"part", "data"} line per
+    part as it finishes, ending with the saved "session".
+    """
+    rule_based = await asyncio.to_thread(analyze_transcript, req.transcript, req.session_id, req.session_date)
+
+    async def run_part(name: str, fn, *args):
+        return name, await asyncio.to_thread(fn, *args)
 
-@app.get("/sessions")
-async def get_all_sessions():
-    """Return all stored session results."""
-    return _sessions
+    tasks = [
+        asyncio.create_task(run_part("summary", _summarize_with_fallback, rule_based)),
+        asyncio.create_task(run_part("recommendations", recommend_from_analysis, rule_based)),
+    ]
 
+    async def finish(parts: dict) -> dict:
+        result = {**parts["summary"], "recommendations": parts["recommendations"]}
+        return await asyncio.to_thread(_save_session, req, result)
 
-@app.get("/sessions/latest")
-async def get_latest_session():
-    """Return the most recent session result."""
-    if not _sessions:
-        return {"error": "No sessions found"}
-    return _sessions[-1]
+    if not req.stream:
+        parts = dict(await asyncio.gather(*tasks))
+        return await finish(parts)
+
+    async def ndjson():
+        yield json.dumps({"part": "rule_based", "data": rule_based}) + "\n"
+        parts = {}
+        for next_done in asyncio.as_completed(tasks):
+            name, data = await next_done
+            parts[name] = data
+            yield json.dumps({"part": name, "data": data}) + "\n"
+        yield json.dumps({"part": "session", "data": await finish(parts)}) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
 
 @app.post("/analyze-sessions")
 async def analyze_multiple_sessions(req: LongitudinalRequest):
     """Analyze multiple call transcripts over time (rule-based only)."""
     sessions = [{"text": s.text, "session_id": s.session_id, "date": s.date} for s in req.sessions]
-    result = analyze_sessions(sessions)
-    return result
+    # Encoded straight from the dataclasses; per-session evidence makes this the largest response.
+    result = analyze_sessions_result(sessions)
+    return JSONBytesResponse(result)
+
+
+async def _submit_job(kind: str, req: JobOptions) -> JSONResponse:
+    """Queue ``req`` as a background job and answer 202 with the id to poll."""
+    payload = req.model_dump(exclude={"background", "priority", "callback_url"})
+    try:
+        # Callback URL check (DNS) and the SQLite insert both block.
+        job = await asyncio.to_thread(
+            job_queue.submit, kind, payload, priority=req.priority, callback_url=req.callback_url
+        )
+    except CallbackURLError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return JSONResponse(
+        status_code=202,
+        content={**job_status(job), "status_url": f"/jobs/{job['id']}"},
+        headers={"Location": f"/jobs/{job['id']}"},
+    )
+
+
+def _longitudinal_rule_based(payload: dict) -> dict:
+    sessions = [{"text": s["text"], "session_id": s["session_id"], "date": s["date"]} for s in payload["sessions"]]
+    return analyze_sessions(sessions)
+
+
+def _longitudinal_fallback(rule_based: dict) -> dict:
+    ai_result = longitudinal_payload(
+        rule_based, rule_based.get("summary", "Analysis complete. AI summary unavailable.")
+    )
+    return {**ai_result, "rule_based": rule_based}
+
+
+def _longitudinal_job(payload: dict) -> dict:
+    rule_based = _longitudinal_rule_based(payload)
+    return {**generate_longitudinal_summary(rule_based), "rule_based": rule_based}
+
+
+job_queue.register(
+    "analyze_sessions_ai",
+    _longitudinal_job,
+    fallback=lambda payload, error: _longitudinal_fallback(_longitudinal_rule_based(payload)),
+)
 
 
 @app.post("/analyze-sessions-ai")
 async def analyze_multiple_sessions_ai(req: LongitudinalRequest):
-    """Analyze multiple sessions with rule-based scoring + Claude AI trends and interventions."""
-    sessions = [{"text": s.text, "session_id": s.session_id, "date": s.date} for s in req.sessions]
-    rule_based = analyze_sessions(sessions)
-    ai_result = generate_longitudinal_summary(rule_based)
-    return {**ai_result, "rule_based": rule_based}
+    """
+    Analyze multiple sessions with rule-based scoring + Claude AI trends and interventions.
+
+    With background=true this returns 202 and a job id; poll /jobs/{id} or
+    pass callback_url to have the result POSTed when it is ready.
+    """
+    if req.background:
+        return await _submit_job("analyze_sessions_ai", req)
+    rule_based = _longitudinal_rule_based(req.model_dump())
+    try:
+        ai_result = await asyncio.to_thread(generate_longitudinal_summary, rule_based)
+    except Exception as e:
+        print("Analytics longitudinal AI summary failed:", e)
+        return JSONBytesResponse(_longitudinal_fallback(rule_based))
+    return JSONBytesResponse({**ai_result, "rule_based": rule_based})
+
+
+def _preventative_care_job(payload: dict):
+    if payload["engine"] != "llm":
+        return recommend(payload["ai_summary"], personalize=payload["personalize"])
+    return get_preventative_care_recommendations(
+        payload["ai_summary"], payload["risk_score"], payload["flagged_markers"]
+    )
+
+
+# After the last retry the local triage answers instead of Claude.
+job_queue.register(
+    "preventative_care",
+    _preventative_care_job,
+    fallback=lambda payload, error: recommend(payload["ai_summary"]),
+)
 
 
 @app.post("/preventative-care-recommendations")
 async def get_preventative_care_recommendations_endpoint(req: PreventativeCareRequest):
     """
     Generates preventative care recommendations based on provided summaries.
+
+    By default the triage and protocol selection run locally from templates;
+    set engine="llm" for a full Claude generation. With background=true this
+    returns 202 and a job id (see /analyze-sessions-ai).
     """
+    if req.background:
+        return await _submit_job("preventative_care", req)
     try:
-        recommendations = get_preventative_care_recommendations(req.ai_summary)
-        return recommendations
+        return await asyncio.to_thread(_preventative_care_job, req.model_dump())
+    except CircuitOpenError:
+        # Claude is failing right now; the local triage answers without waiting.
+        return recommend(req.ai_summary)
     except Exception as e:
         err_str = str(e)
         if "401" in err_str or "invalid x-api-key" in err_str or "AuthenticationError" in err_str:
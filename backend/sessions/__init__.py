@@ -0,0 +1,3 @@
+from .store import SessionStore, SQLiteSessionStore, InMemorySessionStore, get_session_store
+
+__all__ = ["SessionStore", "SQLiteSessionStore", "InMemorySessionStore", "get_session_store"]
@@ -0,0 +1,179 @@
+import asyncio
+
+from fastapi import APIRouter, Header, HTTPException, Response
+
+from payloads import EncodedCache, JSONBytesResponse, join_json_array
+from sessions.store import INDEXED_COLUMNS, get_session_store
+
+router = APIRouter(tags=["sessions"])
+
+# Durable session store (SQLite by default, see sessions/store.py)
+session_store = get_session_store()
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Optional heavy parts of a stored session, only returned via ?include=
+INCLUDABLE = {"transcript", "evidence"}
+
+# Encoded JSON of stored sessions, keyed by (id, version, response shape). A session's
+# version changes on every update, so entries never go stale; old ones just age out.
+encoded_sessions = EncodedCache()
+
+
+def _strip_evidence(result: dict) -> dict:
+    """Drop marker evidence, flagged excerpts and repeated pairs from an analysis result."""
+    rule_based = result.get("rule_based")
+    if not isinstance(rule_based, dict):
+        return result
+    raw_metrics = {k: v for k, v in rule_based.get("raw_metrics", {}).items() if k != "repeated_pairs"}
+    return {
+        **result,
+        "rule_based": {
+            **{k: v for k, v in rule_based.items() if k != "flagged_excerpts"},
+            "markers": [{k: v for k, v in m.items() if k != "evidence"} for m in rule_based.get("markers", [])],
+            "raw_metrics": raw_metrics,
+        },
+    }
+
+
+def _shape(entry: dict, include: set[str]) -> dict:
+    if "transcript" not in include:
+        entry = {k: v for k, v in entry.items() if k != "transcript"}
+    if "evidence" not in include and isinstance(entry.get("analysis_result"), dict):
+        entry = {**entry, "analysis_result": _strip_evidence(entry["analysis_result"])}
+    return entry
+
+
+def _project(entry: dict, fields: list[str]) -> dict:
+    """Keep only ``fields``; dotted paths (e.g. analysis_result.ai_summary) reach into nested dicts."""
+    projected = {"id": entry.get("id")}
+    for path in fields:
+        value = entry
+        for part in path.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        if path == "risk_score" and value is None:
+            value = (entry.get("analysis_result") or {}).get("risk_score")
+        projected[path] = value
+    return projected
+
+
+def _encoded(entry: dict, include: set[str], fields: list[str] | None = None) -> bytes:
+    shape = (tuple(sorted(include)), tuple(fields or ()))
+    key = (entry["id"], entry.get("version", 0), shape)
+    if fields:
+        return encoded_sessions.get_or_encode(key, lambda: _project(_shape(entry, include | INCLUDABLE), fields))
+    return encoded_sessions.get_or_encode(key, lambda: _shape(entry, include))
+
+
+def _csv(value: str | None) -> list[str]:
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+
+def _etag(*parts) -> str:
+    return '"' + "-".join(str(p) for p in parts) + '"'
+
+
+def _not_modified(etag: str, if_none_match: str | None) -> bool:
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+
+
+@router.get("/sessions")
+async def get_sessions(
+    elder_id: str | None = None,
+    after: int | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    date_from: str | None = None,
+    date_to: str | None = None,
+    fields: str | None = None,
+    include: str | None = None,
+):
+    """
+    Return stored session results, oldest first, one page at a time.
+
+    Pagination is keyset-based: pass the ``X-Next-Cursor`` response header
+    back as ``after`` until it is absent. ``fields`` projects each session to
+    the listed fields (e.g. ``fields=risk_score,session_date``); transcripts
+    and marker evidence are omitted unless requested with
+    ``include=transcript,evidence``.
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=422, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    include_set = set(_csv(include))
+    if include_set - INCLUDABLE:
+        raise HTTPException(status_code=422, detail=f"include accepts: {', '.join(sorted(INCLUDABLE))}")
+    field_list = _csv(fields)
+
+    # Indexed fields are served from their columns without decoding stored JSON.
+    columns = field_list if field_list and set(field_list) <= set(INDEXED_COLUMNS) else None
+    page = await asyncio.to_thread(
+        session_store.query, elder_id, date_from, date_to, after=after, limit=limit + 1, columns=columns
+    )
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    headers = {"X-Next-Cursor": str(page[-1]["id"])} if has_more else None
+    if columns is not None:
+        return JSONBytesResponse(page, headers=headers)
+    return JSONBytesResponse(join_json_array([_encoded(e, include_set, field_list) for e in page]), headers=headers)
+
+
+@router.get("/sessions/changes")
+async def get_session_changes(
+    since: int = 0,
+    elder_id: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    include: str | None = None,
+    if_none_match: str | None = Header(default=None),
+):
+    """
+    Change feed: sessions added or updated after version ``since``.
+
+    Each stored session carries a monotonically increasing ``version``.
+    Clients keep the returned ``version`` and pass it back as ``since``;
+    while ``has_more`` is true the next page is available immediately. The
+    ETag identifies the store version (per elder filter), so a caught-up poll
+    with If-None-Match and no new sessions costs a 304 and no body.
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=422, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    include_set = set(_csv(include))
+    if include_set - INCLUDABLE:
+        raise HTTPException(status_code=422, detail=f"include accepts: {', '.join(sorted(INCLUDABLE))}")
+
+    current = await asyncio.to_thread(session_store.current_version, elder_id)
+    # Identifies the store version for this elder filter only, so every caught-up
+    # client shares one tag; only a caught-up poll can be answered with a 304.
+    etag = _etag("v", elder_id or "*", current)
+    if since >= current and _not_modified(etag, if_none_match):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    changes = []
+    if current > since:
+        changes = await asyncio.to_thread(session_store.changes, since, elder_id, limit=limit + 1)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    version = changes[-1]["version"] if has_more else max(current, since)
+    body = (
+        b'{"version":%d,"has_more":%s,"changes":' % (version, b"true" if has_more else b"false")
+        + join_json_array([_encoded(e, include_set) for e in changes])
+        + b"}"
+    )
+    return JSONBytesResponse(body, headers={"ETag": etag})
+
+
+@router.get("/sessions/latest")
+async def get_latest_session(
+    elder_id: str | None = None,
+    if_none_match: str | None = Header(default=None),
+):
+    """Return the most recent session result (ETag'd by its id and version)."""
+    latest = await asyncio.to_thread(session_store.latest, elder_id)
+    if latest is None:
+        return {"error": "No sessions found"}
+    etag = _etag("s", latest["id"], latest.get("version", 0))
+    if _not_modified(etag, if_none_match):
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONBytesResponse(_encoded(latest, INCLUDABLE), headers={"ETag": etag})
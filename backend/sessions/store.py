@@ -0,0 +1,419 @@
+"""
+Durable storage for analyzed call sessions.
+
+Replaces the module-level ``_sessions`` list in server.py, which grew without
+bound, was lost on every restart and was not shared between workers.
+
+SQLiteSessionStore keeps one row per session in a WAL-mode database with
+indexes on elder, session_id and date, so the server holds no session data
+in memory and ``latest`` is a single index seek. InMemorySessionStore has
+the same interface for tests and local experiments.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent / "sessions.db"
+DEFAULT_ELDER_ID = "default"
+
+# Fields stored as their own columns and available to query(columns=...).
+INDEXED_COLUMNS = ("id", "version", "elder_id", "session_id", "session_date", "timestamp", "risk_score")
+
+
+class SessionStore:
+    """Interface shared by the session store implementations."""
+
+    def add(self, entry: dict) -> dict:
+        """Persist a session entry and return it as stored."""
+        raise NotImplementedError
+
+    def add_many(self, entries: list[dict]) -> None:
+        for entry in entries:
+            self.add(entry)
+
+    def get(self, session_id: str, elder_id: str | None = None) -> dict | None:
+        raise NotImplementedError
+
+    def latest(self, elder_id: str | None = None) -> dict | None:
+        raise NotImplementedError
+
+    def query(
+        self,
+        elder_id: str | None = None,
+        date_from: str | None = None,
+        date_to: str | None = None,
+        after: int | None = None,
+        limit: int | None = None,
+        columns: list[str] | None = None,
+    ) -> list[dict]:
+        """
+        Sessions in insertion order, optionally filtered by elder and
+        session_date range. Each entry carries its store ``id``; pass the last
+        one as ``after`` to fetch the next page (keyset pagination).
+
+        With ``columns`` (a subset of INDEXED_COLUMNS) only those fields are
+        returned, read straight from the index columns without decoding the
+        stored JSON.
+        """
+        raise NotImplementedError
+
+    def update(self, row_id: int, changes: dict) -> dict | None:
+        """Merge ``changes`` into a stored session and give it a new version."""
+        raise NotImplementedError
+
+    def changes(self, since: int = 0, elder_id: str | None = None, limit: int | None = None) -> list[dict]:
+        """Sessions added or updated after version ``since``, in version order."""
+        raise NotImplementedError
+
+    def current_version(self, elder_id: str | None = None) -> int:
+        """Highest version in the store (or for one elder); 0 when empty."""
+        raise NotImplementedError
+
+    def elder_ids(self) -> list[str]:
+        raise NotImplementedError
+
+    def add_report(self, elder_id: str, report: dict) -> None:
+        """Persist a longitudinal report (see analysis.batch_reports)."""
+        raise NotImplementedError
+
+    def latest_report(self, elder_id: str) -> dict | None:
+        raise NotImplementedError
+
+
+def _normalize(entry: dict) -> dict:
+    return {
+        **entry,
+        "elder_id": entry.get("elder_id") or DEFAULT_ELDER_ID,
+        "session_id": entry.get("session_id", ""),
+        "session_date": entry.get("session_date", ""),
+        "timestamp": entry.get("timestamp") or datetime.utcnow().isoformat(),
+    }
+
+
+class SQLiteSessionStore(SessionStore):
+    """SQLite (WAL) session store; safe to share between threads and worker processes."""
+
+    def __init__(self, path: str | Path = DEFAULT_DB_PATH):
+        self.path = str(path)
+        self._local = threading.local()
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self) -> None:
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                elder_id TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                session_date TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                risk_score REAL,
+                data TEXT NOT NULL,
+                version INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_elder ON sessions (elder_id, id);
+            CREATE INDEX IF NOT EXISTS idx_sessions_session_id ON sessions (session_id);
+            CREATE INDEX IF NOT EXISTS idx_sessions_elder_date ON sessions (elder_id, session_date);
+            CREATE INDEX IF NOT EXISTS idx_sessions_date ON sessions (session_date);
+
+            CREATE TABLE IF NOT EXISTS reports (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                elder_id TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_reports_elder ON reports (elder_id, id);
+
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+        conn = self._conn()
+        columns = {r[1] for r in conn.execute("PRAGMA table_info(sessions)")}
+        if "version" not in columns:
+            # Stores created before the change feed: existing rows take their id as version.
+            conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            conn.execute("UPDATE sessions SET version = id")
+        conn.executescript("""
+            CREATE INDEX IF NOT EXISTS idx_sessions_version ON sessions (version);
+            CREATE INDEX IF NOT EXISTS idx_sessions_elder_version ON sessions (elder_id, version);
+        """)
+        conn.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('version', (SELECT COALESCE(MAX(version), 0) FROM sessions))"
+        )
+
+    def _reserve_versions(self, conn: sqlite3.Connection, count: int) -> int:
+        """Advance the version counter by ``count`` (inside a write transaction); returns the new value."""
+        return conn.execute(
+            "UPDATE meta SET value = value + ? WHERE key = 'version' RETURNING value", (count,)
+        ).fetchone()[0]
+
+    @staticmethod
+    def _row(entry: dict) -> tuple:
+        risk = (entry.get("analysis_result") or {}).get("risk_score")
+        return (
+            entry["elder_id"], entry["session_id"], entry["session_date"],
+            entry["timestamp"], risk, json.dumps(entry),
+        )
+
+    def add(self, entry: dict) -> dict:
+        entry = _normalize(entry)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = self._reserve_versions(conn, 1)
+            cursor = conn.execute(
+                "INSERT INTO sessions (elder_id, session_id, session_date, timestamp, risk_score, data, version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*self._row(entry), version),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return {**entry, "id": cursor.lastrowid, "version": version}
+
+    def add_many(self, entries: list[dict]) -> None:
+        rows = [self._row(_normalize(e)) for e in entries]
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            first = self._reserve_versions(conn, len(rows)) - len(rows) + 1
+            conn.executemany(
+                "INSERT INTO sessions (elder_id, session_id, session_date, timestamp, risk_score, data, version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((*row, first + i) for i, row in enumerate(rows)),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def update(self, row_id: int, changes: dict) -> dict | None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM sessions WHERE id = ?", (row_id,)).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return None
+            entry = {**json.loads(row[0]), **changes}
+            version = self._reserve_versions(conn, 1)
+            conn.execute(
+                "UPDATE sessions SET elder_id = ?, session_id = ?, session_date = ?, timestamp = ?, "
+                "risk_score = ?, data = ?, version = ? WHERE id = ?",
+                (*self._row(entry), version, row_id),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return {**entry, "id": row_id, "version": version}
+
+    def changes(self, since: int = 0, elder_id: str | None = None, limit: int | None = None) -> list[dict]:
+        sql = "SELECT id, version, data FROM sessions WHERE version > ?"
+        params: list = [since]
+        if elder_id is not None:
+            sql += " AND elder_id = ?"
+            params.append(elder_id)
+        sql += " ORDER BY version"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [{**json.loads(r[2]), "id": r[0], "version": r[1]} for r in self._conn().execute(sql, params)]
+
+    def current_version(self, elder_id: str | None = None) -> int:
+        if elder_id is None:
+            row = self._conn().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        else:
+            row = self._conn().execute(
+                "SELECT MAX(version) FROM sessions WHERE elder_id = ?", (elder_id,)
+            ).fetchone()
+        return (row[0] if row else 0) or 0
+
+    def get(self, session_id: str, elder_id: str | None = None) -> dict | None:
+        sql = "SELECT id, version, data FROM sessions WHERE session_id = ?"
+        params: list = [session_id]
+        if elder_id is not None:
+            sql += " AND elder_id = ?"
+            params.append(elder_id)
+        row = self._conn().execute(sql + " ORDER BY id DESC LIMIT 1", params).fetchone()
+        return {**json.loads(row[2]), "id": row[0], "version": row[1]} if row else None
+
+    def latest(self, elder_id: str | None = None) -> dict | None:
+        if elder_id is None:
+            row = self._conn().execute("SELECT id, version, data FROM sessions ORDER BY id DESC LIMIT 1").fetchone()
+        else:
+            row = self._conn().execute(
+                "SELECT id, version, data FROM sessions WHERE elder_id = ? ORDER BY id DESC LIMIT 1", (elder_id,)
+            ).fetchone()
+        return {**json.loads(row[2]), "id": row[0], "version": row[1]} if row else None
+
+    def query(
+        self,
+        elder_id: str | None = None,
+        date_from: str | None = None,
+        date_to: str | None = None,
+        after: int | None = None,
+        limit: int | None = None,
+        columns: list[str] | None = None,
+    ) -> list[dict]:
+        clauses, params = [], []
+        if elder_id is not None:
+            clauses.append("elder_id = ?")
+            params.append(elder_id)
+        if date_from:
+            clauses.append("session_date >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("session_date <= ?")
+            params.append(date_to)
+        if after is not None:
+            clauses.append("id > ?")
+            params.append(after)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        order = " ORDER BY id" + (" LIMIT ?" if limit is not None else "")
+        if limit is not None:
+            params.append(limit)
+
+        if columns is not None:
+            unknown = set(columns) - set(INDEXED_COLUMNS)
+            if unknown:
+                raise ValueError(f"not an indexed column: {', '.join(sorted(unknown))}")
+            selected = ["id", *(c for c in columns if c != "id")]
+            rows = self._conn().execute(f"SELECT {', '.join(selected)} FROM sessions{where}{order}", params)
+            return [dict(zip(selected, r)) for r in rows]
+        rows = self._conn().execute(f"SELECT id, version, data FROM sessions{where}{order}", params)
+        return [{**json.loads(r[2]), "id": r[0], "version": r[1]} for r in rows]
+
+    def elder_ids(self) -> list[str]:
+        return [r[0] for r in self._conn().execute("SELECT DISTINCT elder_id FROM sessions ORDER BY elder_id")]
+
+    def add_report(self, elder_id: str, report: dict) -> None:
+        self._conn().execute(
+            "INSERT INTO reports (elder_id, created_at, data) VALUES (?, ?, ?)",
+            (elder_id, datetime.utcnow().isoformat(), json.dumps(report)),
+        )
+
+    def latest_report(self, elder_id: str) -> dict | None:
+        row = self._conn().execute(
+            "SELECT created_at, data FROM reports WHERE elder_id = ? ORDER BY id DESC LIMIT 1", (elder_id,)
+        ).fetchone()
+        return {**json.loads(row[1]), "created_at": row[0]} if row else None
+
+
+class InMemorySessionStore(SessionStore):
+    """Process-local store with the same interface; keeps at most ``max_sessions`` entries."""
+
+    def __init__(self, max_sessions: int = 10_000):
+        self._sessions: deque[dict] = deque(maxlen=max_sessions)
+        self._reports: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._version = 0
+
+    def add(self, entry: dict) -> dict:
+        entry = _normalize(entry)
+        with self._lock:
+            self._version += 1
+            entry["id"] = self._next_id
+            entry["version"] = self._version
+            self._next_id += 1
+            self._sessions.append(entry)
+        return entry
+
+    def update(self, row_id: int, changes: dict) -> dict | None:
+        with self._lock:
+            for i, entry in enumerate(self._sessions):
+                if entry["id"] == row_id:
+                    self._version += 1
+                    updated = {**entry, **changes, "id": row_id, "version": self._version}
+                    # In place: query() and latest() go by insertion order, which an update must not change.
+                    self._sessions[i] = updated
+                    return updated
+        return None
+
+    def changes(self, since: int = 0, elder_id: str | None = None, limit: int | None = None) -> list[dict]:
+        with self._lock:
+            matches = [e for e in self._sessions if e["version"] > since and elder_id in (None, e["elder_id"])]
+        # Updated entries keep their place, so the deque is in id order, not version order.
+        matches.sort(key=lambda e: e["version"])
+        return matches[:limit] if limit is not None else matches
+
+    def current_version(self, elder_id: str | None = None) -> int:
+        with self._lock:
+            if elder_id is None:
+                return self._version
+            return max((e["version"] for e in self._sessions if e["elder_id"] == elder_id), default=0)
+
+    def get(self, session_id: str, elder_id: str | None = None) -> dict | None:
+        with self._lock:
+            for entry in reversed(self._sessions):
+                if entry["session_id"] == session_id and elder_id in (None, entry["elder_id"]):
+                    return entry
+        return None
+
+    def latest(self, elder_id: str | None = None) -> dict | None:
+        with self._lock:
+            for entry in reversed(self._sessions):
+                if elder_id in (None, entry["elder_id"]):
+                    return entry
+        return None
+
+    def query(
+        self,
+        elder_id: str | None = None,
+        date_from: str | None = None,
+        date_to: str | None = None,
+        after: int | None = None,
+        limit: int | None = None,
+        columns: list[str] | None = None,
+    ) -> list[dict]:
+        with self._lock:
+            matches = [
+                e for e in self._sessions
+                if elder_id in (None, e["elder_id"])
+                and (not date_from or e["session_date"] >= date_from)
+                and (not date_to or e["session_date"] <= date_to)
+                and (after is None or e["id"] > after)
+            ]
+        if limit is not None:
+            matches = matches[:limit]
+        if columns is not None:
+            selected = ["id", *(c for c in columns if c != "id")]
+            return [
+                {c: (e.get("analysis_result") or {}).get(c) if c == "risk_score" else e.get(c) for c in selected}
+                for e in matches
+            ]
+        return matches
+
+    def elder_ids(self) -> list[str]:
+        with self._lock:
+            return sorted({e["elder_id"] for e in self._sessions})
+
+    def add_report(self, elder_id: str, report: dict) -> None:
+        with self._lock:
+            self._reports[elder_id] = {**report, "created_at": datetime.utcnow().isoformat()}
+
+    def latest_report(self, elder_id: str) -> dict | None:
+        with self._lock:
+            return self._reports.get(elder_id)
+
+
+def get_session_store() -> SessionStore:
+    """Store configured by SESSION_STORE ("sqlite" or "memory") and SESSION_DB_PATH."""
+    if os.getenv("SESSION_STORE", "sqlite") == "memory":
+        return InMemorySessionStore()
+    return SQLiteSessionStore(os.getenv("SESSION_DB_PATH", str(DEFAULT_DB_PATH)))
@@ -0,0 +1,15 @@
+"""
+Process-wide environment loading.
+
+backend/.env is read once, by whichever entry point imports this module
+first (server.py, the batch-report CLI, the WHOOP script), before any module
+reads its configuration. Modules must not call load_dotenv themselves.
+"""
+
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+load_dotenv(BACKEND_DIR / ".env")
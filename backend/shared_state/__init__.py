@@ -0,0 +1,3 @@
+from .store import KVStore, SQLiteKVStore, InMemoryKVStore, get_kv_store, shared_state
+
+__all__ = ["KVStore", "SQLiteKVStore", "InMemoryKVStore", "get_kv_store", "shared_state"]
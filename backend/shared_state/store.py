@@ -0,0 +1,199 @@
+"""
+Key-value store for state that must be shared by every worker process.
+
+Module-level dicts and flags only exist in the process that set them, so
+with several uvicorn workers (or serverless instances) an OAuth callback or
+a sync-status poll lands on a process that never saw the matching write.
+Anything that has to survive that goes through ``shared_state`` instead.
+
+Values are JSON-serializable; keys may carry a TTL after which they read as
+absent. ``pop``, ``set_if_absent`` and ``incr`` are atomic across processes
+with SQLiteKVStore (single statements with RETURNING), which shares the
+sessions database file by default. InMemoryKVStore has the same interface
+for tests and single-process runs.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent / "sessions.db"
+
+# Expired rows are deleted every this many writes (reads ignore them regardless).
+PURGE_EVERY_WRITES = 256
+
+
+class KVStore:
+    """Interface shared by the key-value store implementations."""
+
+    def get(self, key: str, default=None):
+        raise NotImplementedError
+
+    def set(self, key: str, value, ttl: float | None = None) -> None:
+        """Store ``value``; with ``ttl`` (seconds) the key expires after that long."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def pop(self, key: str, default=None):
+        """Atomically read and delete ``key``; for single-use tokens."""
+        raise NotImplementedError
+
+    def set_if_absent(self, key: str, value, ttl: float | None = None) -> bool:
+        """Store ``value`` only if ``key`` is missing or expired; True if it was stored."""
+        raise NotImplementedError
+
+    def incr(self, key: str, amount: int = 1, ttl: float | None = None) -> int:
+        """Atomically add ``amount`` to an integer value (missing counts as 0); returns the new value."""
+        raise NotImplementedError
+
+
+def _expiry(ttl: float | None) -> float | None:
+    return time.time() + ttl if ttl is not None else None
+
+
+class SQLiteKVStore(KVStore):
+    """SQLite (WAL) key-value store; safe to share between threads and worker processes."""
+
+    def __init__(self, path: str | Path = DEFAULT_DB_PATH):
+        self.path = str(path)
+        self._local = threading.local()
+        self._writes = 0
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _wrote(self) -> None:
+        self._writes += 1
+        if self._writes % PURGE_EVERY_WRITES == 0:
+            self._conn().execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),))
+
+    def get(self, key: str, default=None):
+        row = self._conn().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key: str, value, ttl: float | None = None) -> None:
+        self._conn().execute(
+            "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (key, json.dumps(value), _expiry(ttl)),
+        )
+        self._wrote()
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def pop(self, key: str, default=None):
+        row = self._conn().execute(
+            "DELETE FROM kv WHERE key = ? RETURNING value, expires_at", (key,)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return default
+        return json.loads(row[0])
+
+    def set_if_absent(self, key: str, value, ttl: float | None = None) -> bool:
+        row = self._conn().execute(
+            "INSERT INTO kv (key, value, expires_at) VALUES (:key, :value, :expires) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE kv.expires_at IS NOT NULL AND kv.expires_at <= :now "
+            "RETURNING 1",
+            {"key": key, "value": json.dumps(value), "expires": _expiry(ttl), "now": time.time()},
+        ).fetchone()
+        self._wrote()
+        return row is not None
+
+    def incr(self, key: str, amount: int = 1, ttl: float | None = None) -> int:
+        # An expired counter restarts from zero; the TTL is set when the counter is (re)created.
+        row = self._conn().execute(
+            "INSERT INTO kv (key, value, expires_at) VALUES (:key, :amount, :expires) "
+            "ON CONFLICT (key) DO UPDATE SET "
+            "  value = CASE WHEN kv.expires_at IS NOT NULL AND kv.expires_at <= :now "
+            "               THEN :amount ELSE CAST(kv.value AS INTEGER) + :amount END, "
+            "  expires_at = CASE WHEN kv.expires_at IS NOT NULL AND kv.expires_at <= :now "
+            "                    THEN :expires ELSE kv.expires_at END "
+            "RETURNING value",
+            {"key": key, "amount": amount, "expires": _expiry(ttl), "now": time.time()},
+        ).fetchone()
+        self._wrote()
+        return int(row[0])
+
+
+class InMemoryKVStore(KVStore):
+    """Process-local key-value store (not shared between workers)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: dict[str, tuple[object, float | None]] = {}
+
+    def _live(self, key: str):
+        """(value, expires_at) if present and unexpired; call with the lock held."""
+        item = self._data.get(key)
+        if item is not None and item[1] is not None and item[1] <= time.time():
+            del self._data[key]
+            return None
+        return item
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            item = self._live(key)
+        return json.loads(json.dumps(item[0])) if item else default
+
+    def set(self, key: str, value, ttl: float | None = None) -> None:
+        json.dumps(value)  # same contract as the SQLite store
+        with self._lock:
+            self._data[key] = (value, _expiry(ttl))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def pop(self, key: str, default=None):
+        with self._lock:
+            item = self._live(key)
+            if item is None:
+                return default
+            del self._data[key]
+        return item[0]
+
+    def set_if_absent(self, key: str, value, ttl: float | None = None) -> bool:
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._data[key] = (value, _expiry(ttl))
+            return True
+
+    def incr(self, key: str, amount: int = 1, ttl: float | None = None) -> int:
+        with self._lock:
+            item = self._live(key)
+            value = (int(item[0]) if item else 0) + amount
+            self._data[key] = (value, item[1] if item else _expiry(ttl))
+            return value
+
+
+def get_kv_store() -> KVStore:
+    """Store configured by SHARED_STATE ("sqlite" or "memory") and SHARED_STATE_DB_PATH (defaults to SESSION_DB_PATH)."""
+    if os.getenv("SHARED_STATE", "sqlite") == "memory":
+        return InMemoryKVStore()
+    return SQLiteKVStore(
+        os.getenv("SHARED_STATE_DB_PATH") or os.getenv("SESSION_DB_PATH") or str(DEFAULT_DB_PATH)
+    )
+
+
+# The instance every module shares.
+shared_state = get_kv_store()
@@ -0,0 +1,258 @@
+"""
+Per-elder physiology baselines and anomaly flags from stored WHOOP records.
+
+Each metric (HRV, resting heart rate, SpO2, skin temperature, respiratory
+rate) becomes one elders x days matrix with NaN for missing days, and every
+statistic is computed for the whole matrix at once with NumPy, so a year of
+daily data for thousands of elders is one batch rather than a Python loop
+per elder:
+
+* Robust baseline: the median and MAD of the trailing ``window`` days (the
+  day itself excluded), needing ``min_history`` of them. A day's robust z is
+  (value - median) / (1.4826 * MAD), the modified z-score.
+* EWMA baseline: an exponentially weighted mean and standard deviation with
+  a half-life of ``halflife`` days, carried over missing days and over days
+  the robust z already marks as outliers.
+
+A day is flagged when both z-scores reach ``threshold`` (3.5 by default) in
+the same direction: a MAD over a few weeks is noisy enough that on its own
+it flags close to 1% of ordinary days, and requiring the EWMA to agree cuts
+that to a fraction while keeping most real changes.
+
+Spreads are floored at a small per-metric minimum (MIN_SCALE), so a very
+steady baseline does not turn a one-unit change into a huge z. Each flag
+says whether the change goes in the metric's concerning direction (low HRV
+or SpO2, high resting heart rate or respiratory rate; either way for skin
+temperature).
+
+NumPy is imported when first needed, keeping it off the app's import path.
+"""
+
+from datetime import date, timedelta
+from functools import lru_cache
+
+from whoop.store import normalize_time
+
+
+# name: (resource, score field, concerning direction)
+METRICS = {
+    "hrv": ("recovery", "hrv_rmssd_milli", "low"),
+    "resting_hr": ("recovery", "resting_heart_rate", "high"),
+    "spo2": ("recovery", "spo2_percentage", "low"),
+    "skin_temp": ("recovery", "skin_temp_celsius", "both"),
+    "respiratory_rate": ("sleep", "respiratory_rate", "high"),
+}
+# Smallest spread used for z-scores, in each metric's unit.
+MIN_SCALE = {"hrv": 2.0, "resting_hr": 1.0, "spo2": 0.5, "skin_temp": 0.1, "respiratory_rate": 0.3}
+
+WINDOW_DAYS = 28
+MIN_HISTORY_DAYS = 7
+THRESHOLD = 3.5
+EWMA_HALFLIFE_DAYS = 7.0
+# MAD -> standard deviation for normally distributed data.
+MAD_TO_SD = 1.4826
+# Elders per chunk for the rolling median, bounding the (elders, days, window) temporaries.
+CHUNK_ROWS = 256
+
+
+@lru_cache(maxsize=64)
+def _offset_minutes(offset: str | None) -> int:
+    """WHOOP's timezone_offset ("-05:00") in minutes; 0 if missing."""
+    if not offset or offset[0] not in "+-" or len(offset) < 6:
+        return 0
+    minutes = int(offset[1:3]) * 60 + int(offset[4:6])
+    return minutes if offset[0] == "+" else -minutes
+
+
+def _utc_prefix(stamp: str) -> str:
+    """"YYYY-MM-DDTHH:MM:SS" in UTC; WHOOP's own timestamps are UTC already and are only sliced."""
+    if stamp.endswith("Z") or stamp.endswith("+00:00"):
+        return stamp[:19]
+    return normalize_time(stamp)[:19]
+
+
+def daily_matrices(series: list[list[dict]], fields: list[str], first_day: date, days: int) -> dict:
+    """
+    {field: (len(series), days) float matrix of ``score[field]`` per elder
+    and day, NaN where missing}. A record's day is the local calendar day of
+    its start (shifted by timezone_offset). When a day has several records,
+    the most recently updated wins.
+    """
+    import numpy as np
+
+    rows, stamps, offsets, order, scores = [], [], [], [], []
+    for row, records in enumerate(series):
+        for record in records:
+            stamp = record.get("start") or record.get("created_at")
+            if not stamp:
+                continue
+            rows.append(row)
+            stamps.append(_utc_prefix(stamp))
+            offsets.append(_offset_minutes(record.get("timezone_offset")))
+            order.append(record.get("updated_at") or record.get("created_at") or "")
+            scores.append(record.get("score") or {})
+    matrices = {field: np.full((len(series), days), np.nan) for field in fields}
+    if not rows:
+        return matrices
+    local = np.array(stamps, dtype="datetime64[s]") + np.array(offsets, dtype="timedelta64[m]")
+    cols = (local.astype("datetime64[D]") - np.datetime64(first_day, "D")).astype(np.intp)
+    # In updated_at order, so that for duplicate cells the last (newest) write wins.
+    sort = np.argsort(np.array(order), kind="stable")
+    sort = sort[(cols[sort] >= 0) & (cols[sort] < days)]
+    rows = np.asarray(rows, dtype=np.intp)[sort]
+    cols = cols[sort]
+    for field in fields:
+        values = np.array([score.get(field) for score in scores], dtype=float)[sort]  # None -> NaN
+        present = ~np.isnan(values)
+        matrices[field][rows[present], cols[present]] = values[present]
+    return matrices
+
+
+def _nanmedian_last(windows, count):
+    """Median along the last axis ignoring NaN, given the non-NaN ``count`` per window (sorting puts NaN last)."""
+    import numpy as np
+
+    ordered = np.sort(windows, axis=-1)
+    lo = np.maximum(count - 1, 0) // 2
+    hi = count // 2
+    median = (np.take_along_axis(ordered, lo[..., None], -1) + np.take_along_axis(ordered, hi[..., None], -1)) / 2
+    return median[..., 0]
+
+
+def rolling_median_mad(values, window: int = WINDOW_DAYS, min_history: int = MIN_HISTORY_DAYS):
+    """Median and MAD of the ``window`` days before each day (NaN with fewer than ``min_history``)."""
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    elders, days = values.shape
+    median = np.full((elders, days), np.nan)
+    mad = np.full((elders, days), np.nan)
+    padded = np.concatenate([np.full((elders, window), np.nan), values], axis=1)
+    for lo in range(0, elders, CHUNK_ROWS):
+        # windows[e, t] is values[e, t - window : t], so a day never counts in its own baseline.
+        windows = sliding_window_view(padded[lo:lo + CHUNK_ROWS], window, axis=1)[:, :days]
+        count = np.count_nonzero(~np.isnan(windows), axis=2)
+        enough = count >= min_history
+        chunk_median = _nanmedian_last(windows, count)
+        chunk_mad = _nanmedian_last(np.abs(windows - chunk_median[..., None]), count)
+        median[lo:lo + CHUNK_ROWS] = np.where(enough, chunk_median, np.nan)
+        mad[lo:lo + CHUNK_ROWS] = np.where(enough, chunk_mad, np.nan)
+    return median, mad
+
+
+def ewma(values, halflife: float = EWMA_HALFLIFE_DAYS, min_history: int = MIN_HISTORY_DAYS, skip=None):
+    """
+    Exponentially weighted mean and standard deviation as of the day before
+    each day, updated on days with data and carried over missing ones (and
+    over days where ``skip`` is True, so outliers do not inflate it). One
+    step per day, each over every elder at once.
+    """
+    import numpy as np
+
+    elders, days = values.shape
+    alpha = 1 - 0.5 ** (1 / halflife)
+    mean = np.full(elders, np.nan)
+    var = np.zeros(elders)
+    seen = np.zeros(elders, dtype=int)
+    means = np.full((elders, days), np.nan)
+    stds = np.full((elders, days), np.nan)
+    for t in range(days):
+        ready = seen >= min_history
+        means[:, t] = np.where(ready, mean, np.nan)
+        stds[:, t] = np.where(ready, np.sqrt(var), np.nan)
+        x = values[:, t]
+        has = ~np.isnan(x)
+        if skip is not None:
+            has &= ~skip[:, t]
+        first = has & (seen == 0)
+        update = has & ~first
+        diff = np.where(update, x - mean, 0.0)
+        # West's incremental form of the exponentially weighted variance.
+        var = np.where(update, (1 - alpha) * (var + alpha * diff * diff), var)
+        mean = np.where(first, x, np.where(update, mean + alpha * diff, mean))
+        seen += has
+    return means, stds
+
+
+def score_matrix(values, metric: str, *, window: int = WINDOW_DAYS, min_history: int = MIN_HISTORY_DAYS,
+                 halflife: float = EWMA_HALFLIFE_DAYS, threshold: float = THRESHOLD) -> dict:
+    """Baselines, z-scores and anomaly flags for an elders x days matrix of ``metric``."""
+    import numpy as np
+
+    median, mad = rolling_median_mad(values, window, min_history)
+    floor = MIN_SCALE.get(metric, 0.0)
+    with np.errstate(invalid="ignore"):
+        z = (values - median) / np.maximum(MAD_TO_SD * mad, floor)
+        outlier = np.abs(z) >= threshold  # False wherever z is NaN
+        ewma_mean, ewma_std = ewma(values, halflife, min_history, skip=outlier)
+        ewma_z = (values - ewma_mean) / np.maximum(ewma_std, floor)
+        # Both baselines have to agree: a MAD over a few weeks is itself noisy, and
+        # on its own flags close to 1% of ordinary days at 3.5.
+        anomaly = outlier & (np.abs(ewma_z) >= threshold) & (np.sign(z) == np.sign(ewma_z))
+    return {"median": median, "mad": mad, "ewma": ewma_mean, "ewma_std": ewma_std,
+            "z": z, "ewma_z": ewma_z, "anomaly": anomaly}
+
+
+def _number(value, digits: int = 2):
+    return None if value != value else round(float(value), digits)  # NaN -> None
+
+
+def detect_anomalies(records_by_elder: dict[str, dict[str, list[dict]]], *, end: date, days: int,
+                     metrics: tuple[str, ...] = tuple(METRICS), window: int = WINDOW_DAYS,
+                     min_history: int = MIN_HISTORY_DAYS, halflife: float = EWMA_HALFLIFE_DAYS,
+                     threshold: float = THRESHOLD) -> dict:
+    """
+    Anomalies in the ``days`` days up to and including ``end`` for every
+    elder in ``records_by_elder`` ({elder_id: {resource: records}}, which
+    should reach back ``window`` days further for the baselines). Each
+    metric is scored for all elders in one batch. Returns, per elder and
+    metric, the latest baseline and reading and the flagged days, newest first.
+    """
+    import numpy as np
+
+    elder_ids = list(records_by_elder)
+    total = days + window
+    first_day = end - timedelta(days=total - 1)
+    result = {elder_id: {} for elder_id in elder_ids}
+    matrices = {}
+    for resource in dict.fromkeys(METRICS[m][0] for m in metrics):
+        fields = [METRICS[m][1] for m in metrics if METRICS[m][0] == resource]
+        series = [records_by_elder[e].get(resource) or [] for e in elder_ids]
+        matrices[resource] = daily_matrices(series, fields, first_day, total)
+    for metric in metrics:
+        resource, field, concerning = METRICS[metric]
+        values = matrices[resource][field]
+        scored = score_matrix(values, metric, window=window, min_history=min_history,
+                              halflife=halflife, threshold=threshold)
+        has = ~np.isnan(values)
+        # Last day with a reading, per elder (-1 if none).
+        latest = np.where(has.any(axis=1), total - 1 - np.argmax(has[:, ::-1], axis=1), -1)
+        flagged_rows, flagged_cols = np.nonzero(scored["anomaly"][:, window:])
+        flagged: dict[int, list[int]] = {}
+        for row, col in zip(flagged_rows.tolist(), (flagged_cols + window).tolist()):
+            flagged.setdefault(row, []).append(col)
+
+        for row, elder_id in enumerate(elder_ids):
+            def reading(col: int) -> dict:
+                value, z = values[row, col], scored["z"][row, col]
+                # None when on the baseline, or before there is one (z is NaN).
+                direction = "high" if z > 0 else "low" if z < 0 else None
+                return {
+                    "date": (first_day + timedelta(days=col)).isoformat(),
+                    "value": _number(value),
+                    "median": _number(scored["median"][row, col]),
+                    "mad": _number(scored["mad"][row, col]),
+                    "z": _number(z),
+                    "ewma": _number(scored["ewma"][row, col]),
+                    "ewmaZ": _number(scored["ewma_z"][row, col]),
+                    "direction": direction,
+                    "concerning": direction is not None and concerning in ("both", direction),
+                }
+
+            col = int(latest[row])
+            result[elder_id][metric] = {
+                "days": int(has[row, window:].sum()),
+                "latest": reading(col) if col >= 0 else None,
+                "anomalies": [reading(c) for c in reversed(flagged.get(row, []))],
+            }
+    return result
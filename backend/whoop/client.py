@@ -0,0 +1,298 @@
+"""
+Async WHOOP API client.
+
+One httpx.AsyncClient per event loop keeps a pool of keep-alive
+connections to WHOOP, so requests after the first skip the TCP and TLS
+handshakes, and the event loop is never blocked on the network. Every
+request has connect/read timeouts. Throttling (429), 5xx responses and
+transport errors are retried with full-jitter exponential backoff; a 429
+waits for its Retry-After instead when one is given. A 401 drops the cached
+access token and retries once with a fresh one.
+
+WHOOP's rate limits apply to the app as a whole, not per account, so a
+client can share one RateLimiter across every elder it fetches for: each
+request waits for a slot under every configured limit, and a 429 pauses
+the limiter so all callers back off together instead of each discovering
+the limit on its own. Given a shared_state store, the limiter also counts
+requests there, so every worker process together stays under the limits.
+
+Configuration (env):
+    WHOOP_CONNECT_TIMEOUT   seconds, default 5
+    WHOOP_READ_TIMEOUT      seconds, default 20
+    WHOOP_MAX_RETRIES       retries after the first attempt, default 3
+    WHOOP_BACKOFF_BASE      seconds, default 0.5 (doubles per retry)
+    WHOOP_BACKOFF_CAP       seconds, default 8
+    WHOOP_MAX_RETRY_AFTER   longest Retry-After honoured, default 60
+    WHOOP_MAX_CONNECTIONS   pool size, default 20
+    WHOOP_RATE_LIMITS       "count/seconds" pairs, default "100/60,10000/86400"
+                            (WHOOP's default per-app limits); empty disables
+
+httpx is imported on first use, keeping it off the import path of the app.
+"""
+
+import asyncio
+import inspect
+import os
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from metrics.registry import registry
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# shared_state keys of the cross-process rate limit (see RateLimiter).
+RATE_KEY_PREFIX = "whoop:rate:"
+RATE_PAUSE_KEY = "whoop:rate_paused_until"
+
+WHOOP_REQUESTS = registry.counter(
+    "whoop_api_requests_total", "WHOOP API calls by endpoint and status (\"error\" if no response).",
+    ("endpoint", "status"),
+)
+WHOOP_LATENCY = registry.histogram(
+    "whoop_api_request_duration_seconds", "WHOOP API call latency.", ("endpoint",)
+)
+WHOOP_RETRIES = registry.counter(
+    "whoop_api_retries_total", "WHOOP API retries by endpoint and reason.", ("endpoint", "reason")
+)
+WHOOP_RATE_WAIT = registry.histogram(
+    "whoop_rate_limit_wait_seconds", "Time WHOOP requests waited for the app-wide rate limiter.", ("endpoint",)
+)
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateLimiter:
+    """
+    Async limiter for ``limits``, a list of (count, period_seconds): no more
+    than ``count`` requests start in any ``period``-long window, for every
+    pair. acquire() reserves the earliest slot all limits allow (a sliding
+    window log of the last ``count`` slots per limit) and sleeps until it,
+    so waiters are served in arrival order without polling or locks. The
+    state is plain floats on the monotonic clock, so one instance can be
+    shared by every event loop in the process.
+
+    That only caps this process. With a ``store`` (a shared_state KVStore)
+    each request then also claims a slot in per-window counters kept in the
+    store, waiting for the next window while one is full, so the limits
+    hold for all processes together; a 429 pause is shared the same way.
+    The shared windows are fixed (aligned to the epoch), so requests from
+    several processes can bunch up at a window boundary; the local log
+    keeps each process smooth and WHOOP's 429s pause everyone.
+    """
+
+    def __init__(self, limits: list[tuple[int, float]], store=None):
+        self.limits = [(int(count), float(period)) for count, period in limits if count > 0 and period > 0]
+        self.store = store
+        self._slots = [deque(maxlen=count) for count, _ in self.limits]
+        self._last = 0.0
+        self._paused_until = 0.0
+
+    @classmethod
+    def from_env(cls, store=None) -> "RateLimiter":
+        spec = os.environ.get("WHOOP_RATE_LIMITS", "100/60,10000/86400")
+        limits = []
+        for part in filter(None, (p.strip() for p in spec.split(","))):
+            count, _, period = part.partition("/")
+            limits.append((int(count), float(period or 1)))
+        return cls(limits, store)
+
+    def reserve(self, now: float | None = None) -> float:
+        """Claim the next free slot; returns how many seconds from ``now`` it is."""
+        now = time.monotonic() if now is None else now
+        # Slots never go backwards, so each log stays sorted and its oldest entry is [0].
+        slot = max(now, self._paused_until, self._last)
+        for (count, period), slots in zip(self.limits, self._slots):
+            if len(slots) == count:
+                slot = max(slot, slots[0] + period)
+        for slots in self._slots:
+            slots.append(slot)
+        self._last = slot
+        return slot - now
+
+    async def acquire(self, endpoint: str = "") -> None:
+        started = time.monotonic()
+        wait = self.reserve(started)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        if self.store is not None and self.limits:
+            await self._claim_shared()
+        WHOOP_RATE_WAIT.labels(endpoint).observe(time.monotonic() - started)
+
+    async def _claim_shared(self) -> None:
+        """Count this request in every limit's current window across processes."""
+        while True:
+            now = time.time()
+            paused_until = await asyncio.to_thread(self.store.get, RATE_PAUSE_KEY, 0)
+            if paused_until > now:
+                await asyncio.sleep(paused_until - now)
+                continue
+            retry_at = None
+            for count, period in self.limits:
+                window = int(now // period)
+                key = f"{RATE_KEY_PREFIX}{count}/{period:g}:{window}"
+                # Keys carry their window, so the TTL only has to outlive it.
+                if await asyncio.to_thread(self.store.incr, key, ttl=2 * period) > count:
+                    retry_at = (window + 1) * period
+                    break
+            if retry_at is None:
+                return
+            # Full: try the next window, spread out so waiting workers do not all return at once.
+            await asyncio.sleep(retry_at - now + random.uniform(0, min(1.0, period)))
+
+    async def pause(self, seconds: float) -> None:
+        """No slot is handed out for ``seconds`` (WHOOP answered 429), by any process sharing the store."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        if self.store is not None:
+            until = time.time() + seconds
+            if until > await asyncio.to_thread(self.store.get, RATE_PAUSE_KEY, 0):
+                await asyncio.to_thread(self.store.set, RATE_PAUSE_KEY, until, ttl=seconds)
+
+
+class WhoopClient:
+    """
+    ``token_provider(elder_id)`` is an async callable returning an access
+    token; ``on_unauthorized(elder_id)`` (plain or async) is called when WHOOP rejects it.
+    Every attempt, retries included, first waits for ``rate_limiter``.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        token_provider,
+        on_unauthorized=None,
+        *,
+        connect_timeout: float | None = None,
+        read_timeout: float | None = None,
+        max_retries: int | None = None,
+        backoff_base: float | None = None,
+        backoff_cap: float | None = None,
+        max_retry_after: float | None = None,
+        max_connections: int | None = None,
+        rate_limiter: RateLimiter | None = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.token_provider = token_provider
+        self.on_unauthorized = on_unauthorized
+        self.connect_timeout = connect_timeout if connect_timeout is not None else _env_float("WHOOP_CONNECT_TIMEOUT", 5)
+        self.read_timeout = read_timeout if read_timeout is not None else _env_float("WHOOP_READ_TIMEOUT", 20)
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get("WHOOP_MAX_RETRIES", 3))
+        self.backoff_base = backoff_base if backoff_base is not None else _env_float("WHOOP_BACKOFF_BASE", 0.5)
+        self.backoff_cap = backoff_cap if backoff_cap is not None else _env_float("WHOOP_BACKOFF_CAP", 8)
+        self.max_retry_after = max_retry_after if max_retry_after is not None else _env_float("WHOOP_MAX_RETRY_AFTER", 60)
+        self.max_connections = max_connections or int(os.environ.get("WHOOP_MAX_CONNECTIONS", 20))
+        self.rate_limiter = rate_limiter
+        self._client = None
+        self._loop = None
+
+    def _http(self):
+        # httpx clients are bound to the loop they were first used on; scripts that call
+        # asyncio.run() repeatedly get a fresh pool per loop.
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60,
+                ),
+                headers={"Accept": "application/json"},
+            )
+            self._loop = loop
+        return self._client
+
+    def _backoff(self, attempt: int) -> float:
+        """Full jitter: uniform over [0, min(cap, base * 2**attempt)]."""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    async def request(self, endpoint: str, method: str, path: str, *, elder_id: str, params: dict | None = None):
+        """
+        ``method`` ``path`` (relative to base_url) with retries; returns the
+        final httpx.Response, raising httpx.HTTPStatusError if it is an error.
+        """
+        import httpx
+
+        client = self._http()
+        url = f"{self.base_url}{path}"
+        reauthorized = False
+        attempt = 0
+        while True:
+            token = await self.token_provider(elder_id)
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire(endpoint)
+            started = time.perf_counter()
+            status = "error"
+            try:
+                response = await client.request(
+                    method, url, params=params, headers={"Authorization": f"Bearer {token}"}
+                )
+                status = str(response.status_code)
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise
+                WHOOP_RETRIES.labels(endpoint, type(e).__name__).inc()
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            finally:
+                WHOOP_LATENCY.labels(endpoint).observe(time.perf_counter() - started)
+                WHOOP_REQUESTS.labels(endpoint, status).inc()
+
+            if response.status_code == 401 and not reauthorized and self.on_unauthorized is not None:
+                result = self.on_unauthorized(elder_id)
+                if inspect.isawaitable(result):
+                    await result
+                reauthorized = True
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                delay = self._backoff(attempt)
+                if response.status_code == 429:
+                    retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+                    if retry_after is not None:
+                        if retry_after > self.max_retry_after:
+                            response.raise_for_status()
+                        # A little jitter on top so throttled callers do not all return at once.
+                        delay = retry_after + random.uniform(0, self.backoff_base)
+                    if self.rate_limiter is not None:
+                        await self.rate_limiter.pause(delay)
+                WHOOP_RETRIES.labels(endpoint, status).inc()
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            response.raise_for_status()
+            return response
+
+    async def get_json(self, endpoint: str, path: str, *, elder_id: str, params: dict | None = None) -> dict:
+        response = await self.request(endpoint, "GET", path, elder_id=elder_id, params=params)
+        return response.json()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            client, self._client, self._loop = self._client, None, None
+            await client.aclose()
@@ -1,15 +1,25 @@
+import asyncio
+import json
 import os
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import RedirectResponse
+from datetime import datetime, timedelta, timezone
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
 
 from whoop.service import (
-    get_weekly_sleep,
-    get_weekly_cycle,
-    get_weekly_recovery,
+    DEFAULT_ELDER,
+    DEFAULT_RANGE_DAYS,
     get_auth_url,
     exchange_code_for_token,
     is_whoop_connected,
+    iter_records,
+    RESOURCE_PATHS,
 )
+from whoop.anomalies import METRICS, THRESHOLD, WINDOW_DAYS, detect_anomalies
+from whoop.scheduler import whoop_scheduler
+from whoop.scoring import summary_scores
+from whoop.store import RESOURCES
+from whoop.sync import BACKFILL_DAYS, SyncPending, stored_records, sync
 
 router = APIRouter(prefix="/whoop", tags=["whoop"])
 
@@ -26,14 +36,15 @@ def _whoop_error(e: Exception) -> HTTPException:
 
 
 @router.get("/status")
-async def whoop_status():
-    return {"connected": is_whoop_connected()}
+async def whoop_status(elder_id: str = DEFAULT_ELDER):
+    return {"connected": await asyncio.to_thread(is_whoop_connected, elder_id)}
 
 
 @router.get("/auth-url")
-async def whoop_auth_url():
+async def whoop_auth_url(elder_id: str = DEFAULT_ELDER):
+    """WHOOP authorization URL; the callback stores the account under ``elder_id``."""
     try:
-        url = get_auth_url()
+        url = get_auth_url(elder_id)
         return {"authUrl": url}
     except Exception as e:
         raise _whoop_error(e)
@@ -50,31 +61,205 @@ async def whoop_callback(code: str | None = None, state: str | None = None):
         return RedirectResponse(url=f"{FRONTEND_DASHBOARD_URL}?whoop=error")
 
 
-@router.get("/sleep/weekly")
-async def weekly_sleep():
-    """Return sleep data for the past 7 days from WHOOP API."""
+# Seconds a client is asked to wait before retrying while the first sync runs.
+SYNCING_RETRY_AFTER_SECONDS = 5
+
+
+def _syncing(e: SyncPending) -> JSONResponse:
+    """202 while another worker runs the elder's first sync; there is nothing real to show yet."""
+    return JSONResponse(
+        status_code=202,
+        content={"status": "syncing", "detail": str(e)},
+        headers={"Retry-After": str(SYNCING_RETRY_AFTER_SECONDS)},
+    )
+
+
+def _weekly_response(records: list[dict], state: dict | None) -> dict:
+    synced_at = state and datetime.fromtimestamp(state["synced_at"], timezone.utc).isoformat()
+    return {"records": records, "synced_at": synced_at}
+
+
+async def _weekly(resource: str, elder_id: str, refresh: bool) -> dict:
+    # Someone is looking at this elder: the scheduler keeps them fresher while they are.
+    whoop_scheduler.touch(elder_id)
+    end = datetime.now(timezone.utc)
     try:
-        records = get_weekly_sleep()
-        return {"records": records}
+        records, state = await stored_records(elder_id, resource, end - timedelta(days=DEFAULT_RANGE_DAYS), end, refresh)
+    except SyncPending as e:
+        return _syncing(e)
     except Exception as e:
         raise _whoop_error(e)
+    return _weekly_response(records, state)
+
+
+@router.get("/sleep/weekly")
+async def weekly_sleep(elder_id: str = DEFAULT_ELDER, refresh: bool = False):
+    """Sleep records for the past 7 days from the local WHOOP store (see whoop/sync.py)."""
+    return await _weekly("sleep", elder_id, refresh)
 
 
 @router.get("/cycle/weekly")
-async def weekly_cycle():
-    """Return physiological cycle data (strain, HR) for the past 7 days from WHOOP API."""
+async def weekly_cycle(elder_id: str = DEFAULT_ELDER, refresh: bool = False):
+    """Physiological cycle data (strain, HR) for the past 7 days from the local WHOOP store."""
+    return await _weekly("cycle", elder_id, refresh)
+
+
+@router.get("/recovery/weekly")
+async def weekly_recovery(elder_id: str = DEFAULT_ELDER, refresh: bool = False):
+    """Recovery scores and metrics for the past 7 days from the local WHOOP store."""
+    return await _weekly("recovery", elder_id, refresh)
+
+
+@router.get("/summary")
+async def whoop_summary(elder_id: str = DEFAULT_ELDER, include: str | None = None, refresh: bool = False):
+    """
+    One round trip for the dashboard and the sync workflow: the past week's
+    sleep, cycle and recovery, read concurrently from the local store (one
+    token refresh at most, shared by all three), plus the derived scores
+    (see whoop/scoring.py). ``include=records`` adds the raw records.
+    """
+    if include not in (None, "", "records"):
+        raise HTTPException(status_code=422, detail="include accepts: records")
+    whoop_scheduler.touch(elder_id)
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=DEFAULT_RANGE_DAYS)
     try:
-        records = get_weekly_cycle()
-        return {"records": records}
+        results = await asyncio.gather(*(stored_records(elder_id, r, start, end, refresh) for r in RESOURCES))
+    except SyncPending as e:
+        return _syncing(e)
     except Exception as e:
         raise _whoop_error(e)
+    (sleep, _), (cycle, _), (recovery, _) = results
+    synced = [state["synced_at"] for _, state in results if state]
+    payload = {
+        "elderId": elder_id,
+        "sleepCount": len(sleep),
+        "cycleCount": len(cycle),
+        "recoveryCount": len(recovery),
+        # Oldest of the three, i.e. how stale the summary can be.
+        "syncedAt": datetime.fromtimestamp(min(synced), timezone.utc).isoformat() if synced else None,
+        "scores": summary_scores(sleep, cycle, recovery),
+    }
+    if include == "records":
+        payload.update(sleep=sleep, cycle=cycle, recovery=recovery)
+    return payload
 
 
-@router.get("/recovery/weekly")
-async def weekly_recovery():
-    """Return recovery scores and metrics for the past 7 days from WHOOP API."""
+# Most elders one anomalies request may cover.
+MAX_ANOMALY_ELDERS = 100
+
+
+@router.get("/anomalies")
+async def whoop_anomalies(
+    elder_id: list[str] = Query(default=[DEFAULT_ELDER]),
+    days: int = Query(default=30, ge=1),
+    window: int = Query(default=WINDOW_DAYS, ge=7, le=90),
+    threshold: float = Query(default=THRESHOLD, gt=0),
+    metrics: str | None = None,
+    refresh: bool = False,
+):
+    """
+    Days in the past ``days`` whose HRV, resting heart rate, SpO2, skin
+    temperature or respiratory rate is far from the elder's own baseline
+    over the previous ``window`` days (see whoop/anomalies.py). Repeat
+    ``elder_id`` to check several elders in one batch; ``metrics`` is a
+    comma-separated subset of the metric names. ``days + window`` may not
+    exceed WHOOP_BACKFILL_DAYS, the history a sync keeps, and ``refresh``
+    is only accepted for a single elder.
+    """
+    selected = tuple(m for m in (metrics or "").split(",") if m) or tuple(METRICS)
+    unknown = [m for m in selected if m not in METRICS]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"metrics accepts: {', '.join(METRICS)}")
+    elder_ids = list(dict.fromkeys(elder_id))
+    if len(elder_ids) > MAX_ANOMALY_ELDERS:
+        raise HTTPException(status_code=422, detail=f"at most {MAX_ANOMALY_ELDERS} elders per request")
+    if refresh and len(elder_ids) > 1:
+        # Each elder would sync every resource inline before the response.
+        raise HTTPException(status_code=422, detail="refresh is only allowed for a single elder")
+    if days + window > BACKFILL_DAYS:
+        # Older days were never synced; they would read as missing data, not as no anomalies.
+        raise HTTPException(
+            status_code=422, detail=f"days + window may not exceed {BACKFILL_DAYS} (WHOOP_BACKFILL_DAYS)"
+        )
+    if len(elder_ids) == 1:
+        whoop_scheduler.touch(elder_ids[0])
+    resources = sorted({METRICS[m][0] for m in selected})
+    end = datetime.now(timezone.utc)
+    # One extra day so that records starting just before local midnight of the first day are included.
+    start = end - timedelta(days=days + window + 1)
+
+    async def rows(e: str, r: str) -> list[dict] | None:
+        try:
+            return (await stored_records(e, r, start, end, refresh))[0]
+        except SyncPending:
+            return None  # first sync still running in another worker
+
+    try:
+        results = await asyncio.gather(*(rows(e, r) for e in elder_ids for r in resources))
+    except Exception as e:
+        raise _whoop_error(e)
+    records = {e: {} for e in elder_ids}
+    syncing = set()
+    for (e, r), found in zip(((e, r) for e in elder_ids for r in resources), results):
+        if found is None:
+            syncing.add(e)
+        records[e][r] = found
+    ready = {e: records[e] for e in elder_ids if e not in syncing}
+    # NumPy work off the event loop.
+    scored = await asyncio.to_thread(
+        detect_anomalies, ready, end=end.date(), days=days, metrics=selected, window=window, threshold=threshold
+    ) if ready else {}
+    return {
+        "days": days,
+        "window": window,
+        "threshold": threshold,
+        "elders": [
+            {"elderId": e, "status": "syncing", "metrics": None} if e in syncing else {"elderId": e, "metrics": scored[e]}
+            for e in elder_ids
+        ],
+    }
+
+
+@router.post("/sync")
+async def sync_whoop(elder_id: str = DEFAULT_ELDER):
+    """Fetch new and rescored WHOOP records into the local store now; returns per-resource counts."""
     try:
-        records = get_weekly_recovery()
-        return {"records": records}
+        return {"elder_id": elder_id, "results": await sync(elder_id)}
     except Exception as e:
         raise _whoop_error(e)
+
+
+# Longest range one history request may cover.
+MAX_HISTORY_DAYS = 3 * 366
+
+
+@router.get("/history/{resource}")
+async def history(resource: str, start: datetime, end: datetime | None = None, elder_id: str = DEFAULT_ELDER):
+    """
+    Every sleep, cycle or recovery record in [start, end) as NDJSON, one
+    record per line, streamed as WHOOP pages arrive. Long ranges are fetched
+    as concurrent sub-ranges, so lines are not in time order. A failure after
+    streaming has started ends the stream with an {"error": ...} line.
+    """
+    if resource not in RESOURCE_PATHS:
+        raise HTTPException(status_code=404, detail=f"resource must be one of: {', '.join(RESOURCE_PATHS)}")
+    end = end or datetime.now(timezone.utc)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if not start < end:
+        raise HTTPException(status_code=422, detail="start must be before end")
+    if end - start > timedelta(days=MAX_HISTORY_DAYS):
+        raise HTTPException(status_code=422, detail=f"range may not exceed {MAX_HISTORY_DAYS} days")
+
+    async def ndjson():
+        try:
+            async for record in iter_records(resource, start, end, elder_id):
+                yield json.dumps(record) + "\n"
+        except Exception as e:
+            _whoop_error(e)
+            yield json.dumps({"error": f"Whoop service error: {e}"}) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
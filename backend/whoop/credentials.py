@@ -0,0 +1,176 @@
+"""
+Per-elder WHOOP credentials.
+
+Each elder connects their own WHOOP account; the OAuth callback stores the
+account's refresh token here under the elder id, and every refresh that
+rotates it writes the new one back. An account whose refresh token WHOOP
+rejects (invalid_grant) is marked revoked rather than deleted, so the
+scheduler (whoop/scheduler.py) stops syncing it and the dashboard can ask
+for a reconnect.
+
+The "default" elder keeps the single-account setup working: its tokens live
+in whoop/.whoop_refresh_token (seeded from WHOOP_REFRESH_TOKEN), see
+whoop/token_store.py.
+
+SQLiteCredentialStore shares the WHOOP database file and is safe across
+threads and worker processes. InMemoryCredentialStore has the same
+interface for tests and simulations.
+
+Alongside the refresh token each row keeps the latest access token and its
+expiry (epoch seconds), so that after one process refreshes an account the
+others reuse its access token rather than refreshing again with a refresh
+token WHOOP has already rotated (see whoop/token_store.py).
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from whoop.store import DEFAULT_DB_PATH
+
+STATUS_ACTIVE = "active"
+STATUS_REVOKED = "revoked"
+
+
+class CredentialStore:
+    """Interface shared by the credential store implementations."""
+
+    def get_refresh_token(self, elder_id: str) -> str | None:
+        """The elder's refresh token, or None if not connected or revoked."""
+        tokens = self.tokens(elder_id)
+        return tokens["refresh_token"] if tokens else None
+
+    def tokens(self, elder_id: str) -> dict | None:
+        """{"refresh_token", "access_token", "expires_at"} if the elder is connected and active."""
+        raise NotImplementedError
+
+    def set_refresh_token(self, elder_id: str, token: str, access_token: str | None = None,
+                          expires_at: float | None = None) -> None:
+        """Store (or rotate) the elder's refresh token, and the access token it came with, and mark the account active."""
+        raise NotImplementedError
+
+    def mark_revoked(self, elder_id: str) -> None:
+        """WHOOP rejected the refresh token; keep the row but stop using it."""
+        raise NotImplementedError
+
+    def elder_ids(self) -> list[str]:
+        """Elders with an active credential, in a stable order."""
+        raise NotImplementedError
+
+    def status(self, elder_id: str) -> str | None:
+        """"active", "revoked" or None if the elder never connected."""
+        raise NotImplementedError
+
+
+class SQLiteCredentialStore(CredentialStore):
+    """SQLite (WAL) credential store; safe to share between threads and worker processes."""
+
+    def __init__(self, path: str | Path = DEFAULT_DB_PATH):
+        self.path = str(path)
+        self._local = threading.local()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS whoop_credentials (
+                elder_id TEXT PRIMARY KEY,
+                refresh_token TEXT NOT NULL,
+                status TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                access_token TEXT,
+                expires_at REAL
+            );
+        """)
+        columns = {row["name"] for row in self._conn().execute("PRAGMA table_info(whoop_credentials)")}
+        for column, kind in (("access_token", "TEXT"), ("expires_at", "REAL")):
+            if column not in columns:
+                self._conn().execute(f"ALTER TABLE whoop_credentials ADD COLUMN {column} {kind}")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def tokens(self, elder_id: str) -> dict | None:
+        row = self._conn().execute(
+            "SELECT refresh_token, access_token, expires_at FROM whoop_credentials WHERE elder_id = ? AND status = ?",
+            (elder_id, STATUS_ACTIVE),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def set_refresh_token(self, elder_id: str, token: str, access_token: str | None = None,
+                          expires_at: float | None = None) -> None:
+        self._conn().execute(
+            """
+            INSERT INTO whoop_credentials (elder_id, refresh_token, status, updated_at, access_token, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (elder_id) DO UPDATE
+            SET refresh_token = excluded.refresh_token, status = excluded.status, updated_at = excluded.updated_at,
+                access_token = excluded.access_token, expires_at = excluded.expires_at
+            """,
+            (elder_id, token, STATUS_ACTIVE, time.time(), access_token, expires_at),
+        )
+
+    def mark_revoked(self, elder_id: str) -> None:
+        self._conn().execute(
+            "UPDATE whoop_credentials SET status = ?, updated_at = ?, access_token = NULL WHERE elder_id = ?",
+            (STATUS_REVOKED, time.time(), elder_id),
+        )
+
+    def elder_ids(self) -> list[str]:
+        rows = self._conn().execute(
+            "SELECT elder_id FROM whoop_credentials WHERE status = ? ORDER BY elder_id", (STATUS_ACTIVE,)
+        )
+        return [row["elder_id"] for row in rows]
+
+    def status(self, elder_id: str) -> str | None:
+        row = self._conn().execute(
+            "SELECT status FROM whoop_credentials WHERE elder_id = ?", (elder_id,)
+        ).fetchone()
+        return row["status"] if row else None
+
+
+class InMemoryCredentialStore(CredentialStore):
+    """Process-local credential store (lost on restart)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows: dict[str, dict] = {}
+
+    def tokens(self, elder_id: str) -> dict | None:
+        with self._lock:
+            row = self._rows.get(elder_id)
+            if row is None or row["status"] != STATUS_ACTIVE:
+                return None
+            return {k: row[k] for k in ("refresh_token", "access_token", "expires_at")}
+
+    def set_refresh_token(self, elder_id: str, token: str, access_token: str | None = None,
+                          expires_at: float | None = None) -> None:
+        with self._lock:
+            self._rows[elder_id] = {"refresh_token": token, "access_token": access_token,
+                                    "expires_at": expires_at, "status": STATUS_ACTIVE}
+
+    def mark_revoked(self, elder_id: str) -> None:
+        with self._lock:
+            if elder_id in self._rows:
+                self._rows[elder_id].update(status=STATUS_REVOKED, access_token=None)
+
+    def elder_ids(self) -> list[str]:
+        with self._lock:
+            return sorted(e for e, row in self._rows.items() if row["status"] == STATUS_ACTIVE)
+
+    def status(self, elder_id: str) -> str | None:
+        with self._lock:
+            row = self._rows.get(elder_id)
+        return row["status"] if row else None
+
+
+def get_credential_store() -> CredentialStore:
+    """Store configured by WHOOP_STORE ("sqlite" or "memory") and WHOOP_DB_PATH (defaults to SESSION_DB_PATH)."""
+    if os.getenv("WHOOP_STORE", "sqlite") == "memory":
+        return InMemoryCredentialStore()
+    return SQLiteCredentialStore(os.getenv("WHOOP_DB_PATH") or os.getenv("SESSION_DB_PATH") or str(DEFAULT_DB_PATH))
@@ -0,0 +1,309 @@
+"""
+Background sync of every connected elder's WHOOP data.
+
+Each connected elder (whoop/credentials.py, plus the default account) is
+synced into the local store (whoop/sync.py) every WHOOP_SCHEDULE_INTERVAL
+seconds, by WHOOP_SCHEDULE_CONCURRENCY workers. The app-wide request rate
+is capped by the WHOOP client's RateLimiter (whoop/client.py), which every
+request goes through and which counts requests in shared_state across
+worker processes, so the scheduler only has to decide who goes next:
+
+* Fair queuing: elders are ordered by when their next sync is due, and
+  an elder is back in the queue only after its previous sync finished,
+  so under a rate limit too tight for everyone to be on time all elders
+  fall behind equally rather than some being starved.
+* Priority: an elder whose dashboard is open (any /whoop read marks it
+  active for WHOOP_ACTIVE_TTL seconds) is synced every
+  WHOOP_ACTIVE_INTERVAL seconds and goes ahead of every inactive elder
+  that is due.
+* Backoff per account: a failed sync pushes that elder's next attempt
+  back exponentially (WHOOP_SCHEDULE_BACKOFF_BASE doubling up to
+  WHOOP_SCHEDULE_BACKOFF_CAP, with jitter) without slowing anyone else.
+  An elder whose WHOOP access was revoked is dropped until they connect
+  again.
+
+The list of elders is re-read every WHOOP_SCHEDULE_REFRESH seconds, so new
+connections are picked up without a restart. Set WHOOP_SCHEDULER=0 to run
+no scheduler in a process (e.g. all but one worker). Several schedulers
+stay under the shared rate limit and syncs are single-flight across
+workers (see whoop/sync.py), but they compete for the same slots.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import time
+
+from metrics.registry import registry
+from whoop.service import WhoopAuthError, connected_elders
+from whoop.sync import sync
+
+
+WHOOP_SCHEDULED_SYNCS = registry.counter(
+    "whoop_scheduled_syncs_total", "Scheduler syncs by priority and result.", ("priority", "result")
+)
+WHOOP_SCHEDULE_LAG = registry.histogram(
+    "whoop_schedule_lag_seconds", "How late scheduled syncs started, by priority.", ("priority",)
+)
+WHOOP_SCHEDULED_ELDERS = registry.gauge(
+    "whoop_scheduled_elders", "Elders known to the scheduler by state.", ("state",)
+)
+
+# WHOOP_SCHEDULER=0 leaves this process without a scheduler.
+SCHEDULER_ENABLED = os.environ.get("WHOOP_SCHEDULER", "1") != "0"
+
+ACTIVE, INACTIVE = 0, 1
+STATES = ("active", "background", "backing_off", "revoked")
+PRIORITY_LABELS = {ACTIVE: "active", INACTIVE: "background"}
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+class _Elder:
+    __slots__ = ("elder_id", "due", "failures", "last_synced", "active_until", "running", "version", "revoked")
+
+    def __init__(self, elder_id: str, due: float):
+        self.elder_id = elder_id
+        self.due = due
+        self.failures = 0
+        self.last_synced = None
+        self.active_until = 0.0
+        self.running = False
+        self.version = 0  # heap entries with an older version are stale
+        self.revoked = False
+
+
+class SyncScheduler:
+    """
+    ``sync(elder_id)`` is an async callable that syncs one elder, and
+    ``elders()`` returns the elder ids to schedule. ``is_revoked(exc)`` says
+    whether a sync failure means the account must reconnect.
+    """
+
+    def __init__(
+        self,
+        sync,
+        elders,
+        *,
+        is_revoked=lambda exc: False,
+        concurrency: int | None = None,
+        interval: float | None = None,
+        active_interval: float | None = None,
+        active_ttl: float | None = None,
+        backoff_base: float | None = None,
+        backoff_cap: float | None = None,
+        refresh_every: float | None = None,
+        clock=time.monotonic,
+    ):
+        self.sync = sync
+        self.elders = elders
+        self.is_revoked = is_revoked
+        self.concurrency = concurrency or int(os.environ.get("WHOOP_SCHEDULE_CONCURRENCY", 8))
+        self.interval = interval if interval is not None else _env_float("WHOOP_SCHEDULE_INTERVAL", 60 * 60)
+        self.active_interval = active_interval if active_interval is not None else _env_float("WHOOP_ACTIVE_INTERVAL", 5 * 60)
+        self.active_ttl = active_ttl if active_ttl is not None else _env_float("WHOOP_ACTIVE_TTL", 5 * 60)
+        self.backoff_base = backoff_base if backoff_base is not None else _env_float("WHOOP_SCHEDULE_BACKOFF_BASE", 60)
+        self.backoff_cap = backoff_cap if backoff_cap is not None else _env_float("WHOOP_SCHEDULE_BACKOFF_CAP", 6 * 60 * 60)
+        self.refresh_every = refresh_every if refresh_every is not None else _env_float("WHOOP_SCHEDULE_REFRESH", 60)
+        self.clock = clock
+        self._elders: dict[str, _Elder] = {}
+        # One heap of (due, seq, version, elder_id) per priority; due active elders go first.
+        self._queues: dict[int, list[tuple]] = {ACTIVE: [], INACTIVE: []}
+        self._seq = itertools.count()
+        self._wakeup: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    # -- queue ---------------------------------------------------------------
+
+    def _push(self, elder: _Elder, due: float) -> None:
+        elder.due = due
+        elder.version += 1  # any entry already queued for this elder is now stale
+        priority = ACTIVE if elder.active_until > self.clock() else INACTIVE
+        heapq.heappush(self._queues[priority], (due, next(self._seq), elder.version, elder.elder_id))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def add(self, elder_id: str, due: float | None = None) -> None:
+        """Schedule ``elder_id`` (at ``due``, default now) unless it is already known."""
+        if elder_id in self._elders:
+            return
+        elder = self._elders[elder_id] = _Elder(elder_id, 0.0)
+        self._push(elder, self.clock() if due is None else due)
+
+    def remove(self, elder_id: str) -> None:
+        # Its queued entries go stale and are skipped.
+        self._elders.pop(elder_id, None)
+
+    def touch(self, elder_id: str) -> None:
+        """The elder's dashboard is open: sync them at the active interval, ahead of inactive elders."""
+        now = self.clock()
+        elder = self._elders.get(elder_id)
+        if elder is None or elder.revoked:
+            return
+        was_active = elder.active_until > now
+        elder.active_until = now + self.active_ttl
+        if elder.running:
+            return
+        due = elder.due
+        if elder.failures == 0:
+            # A backing-off account keeps its backoff even while someone is looking.
+            due = now if elder.last_synced is None else max(now, min(due, elder.last_synced + self.active_interval))
+        if not was_active or due < elder.due:
+            self._push(elder, due)
+
+    def refresh_elders(self, elder_ids) -> None:
+        """
+        Pick up newly connected elders and drop disconnected ones. A revoked
+        elder stays parked while still listed; reconnecting drops it from the
+        list (the credential is marked revoked) and adds it back fresh.
+        """
+        current = set(elder_ids)
+        for elder_id in current - self._elders.keys():
+            self.add(elder_id)
+        for elder_id in self._elders.keys() - current:
+            self.remove(elder_id)
+
+    def _next_interval(self, elder: _Elder, now: float) -> float:
+        return self.active_interval if elder.active_until > now else self.interval
+
+    def _backoff(self, failures: int) -> float:
+        """Exponential with jitter over the upper half, so failed accounts do not retry in lockstep."""
+        delay = min(self.backoff_cap, self.backoff_base * 2 ** (failures - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _live_head(self, priority: int, now: float) -> tuple | None:
+        """Head of a queue after dropping stale entries and demoting closed dashboards."""
+        queue = self._queues[priority]
+        while queue:
+            due, _, version, elder_id = queue[0]
+            elder = self._elders.get(elder_id)
+            if elder is None or elder.version != version or elder.running or elder.revoked:
+                heapq.heappop(queue)
+                continue
+            if priority == ACTIVE and elder.active_until <= now:
+                heapq.heappop(queue)
+                if elder.failures == 0 and elder.last_synced is not None:
+                    due = max(due, elder.last_synced + self.interval)
+                self._push(elder, due)
+                continue
+            return queue[0]
+        return None
+
+    async def _next(self) -> tuple[_Elder, int]:
+        """Wait for the next due elder; returns it with the priority it was queued at."""
+        while True:
+            now = self.clock()
+            heads = {}
+            for priority in (ACTIVE, INACTIVE):
+                head = self._live_head(priority, now)
+                if head is None:
+                    continue
+                if head[0] <= now:
+                    heapq.heappop(self._queues[priority])
+                    elder = self._elders[head[3]]
+                    elder.running = True
+                    WHOOP_SCHEDULE_LAG.labels(PRIORITY_LABELS[priority]).observe(now - head[0])
+                    return elder, priority
+                heads[priority] = head[0]
+            timeout = min(heads.values(), default=now + self.refresh_every) - now
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run_one(self, elder: _Elder, priority: int) -> None:
+        label = PRIORITY_LABELS[priority]
+        try:
+            await self.sync(elder.elder_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            now = self.clock()
+            if self.is_revoked(e):
+                elder.revoked = True
+                WHOOP_SCHEDULED_SYNCS.labels(label, "revoked").inc()
+                print(f"WHOOP scheduler: elder {elder.elder_id} must reconnect WHOOP ({e})")
+                return
+            elder.failures += 1
+            WHOOP_SCHEDULED_SYNCS.labels(label, "error").inc()
+            delay = self._backoff(elder.failures)
+            print(f"WHOOP scheduler: sync for {elder.elder_id} failed ({type(e).__name__}: {e}); retry in {delay:.0f}s")
+            self._push(elder, now + delay)
+            return
+        finally:
+            elder.running = False
+        now = self.clock()
+        elder.failures = 0
+        elder.last_synced = now
+        WHOOP_SCHEDULED_SYNCS.labels(label, "ok").inc()
+        self._push(elder, now + self._next_interval(elder, now))
+
+    async def _worker(self) -> None:
+        while True:
+            elder, priority = await self._next()
+            await self._run_one(elder, priority)
+
+    async def _refresher(self) -> None:
+        while True:
+            try:
+                # Listing may hit the database; the queues are only touched on the loop.
+                self.refresh_elders(await asyncio.to_thread(self.elders))
+            except Exception as e:
+                print(f"WHOOP scheduler: could not list elders ({type(e).__name__}: {e})")
+            await asyncio.sleep(self.refresh_every)
+
+    def counts(self) -> dict[str, int]:
+        """Known elders by state: active, background, backing_off, revoked."""
+        now = self.clock()
+        states = {state: 0 for state in STATES}
+        for elder in self._elders.values():
+            if elder.revoked:
+                states["revoked"] += 1
+            elif elder.failures:
+                states["backing_off"] += 1
+            elif elder.active_until > now:
+                states["active"] += 1
+            else:
+                states["background"] += 1
+        return states
+
+    # -- lifecycle -----------------------------------------------------------
+
+    def start(self) -> None:
+        """Start the workers on the running loop (from the app's lifespan)."""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._refresher(), name="whoop-schedule-refresh")]
+        self._tasks += [
+            asyncio.create_task(self._worker(), name=f"whoop-schedule-{i}") for i in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def snapshot(self) -> dict:
+        now = self.clock()
+        return {
+            elder_id: {
+                "due_in": round(elder.due - now, 3),
+                "active": elder.active_until > now,
+                "failures": elder.failures,
+                "running": elder.running,
+                "revoked": elder.revoked,
+            }
+            for elder_id, elder in self._elders.items()
+        }
+
+
+whoop_scheduler = SyncScheduler(sync, connected_elders, is_revoked=lambda exc: isinstance(exc, WhoopAuthError))
+for _state in STATES:
+    WHOOP_SCHEDULED_ELDERS.labels(_state).set_function(lambda state=_state: whoop_scheduler.counts()[state])
@@ -0,0 +1,74 @@
+"""
+Dashboard scores derived from WHOOP sleep, cycle and recovery records.
+
+Ported from workflows_service/workflows/sync-whoop.ts so the workflow and
+the dashboard get the same numbers from one /whoop/summary call. Keys are
+camelCase because the dashboard reads this payload as-is.
+"""
+
+import math
+from datetime import datetime
+
+MILLIS_PER_HOUR = 1000 * 60 * 60
+# WHOOP strain is on a 0-21 scale.
+MAX_STRAIN = 21
+
+
+def _js_round(value: float) -> int:
+    """Math.round: halves round up, unlike Python's round-half-to-even."""
+    return math.floor(value + 0.5)
+
+
+def _timestamp(value: str | None) -> float:
+    if not value:
+        return 0.0
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def _latest(records: list[dict], field: str) -> dict | None:
+    # max() keeps the first of equal keys, like the stable sort in the workflow.
+    return max(records, key=lambda r: _timestamp(r.get(field)), default=None)
+
+
+def _score(record: dict | None) -> dict:
+    return (record or {}).get("score") or {}
+
+
+def summary_scores(sleep: list[dict], cycle: list[dict], recovery: list[dict]) -> dict:
+    """Scores from the latest sleep (by start), recovery (by created_at) and cycle (by start)."""
+    sleep_score = _score(_latest(sleep, "start"))
+    recovery_score = _score(_latest(recovery, "created_at"))
+    cycle_score = _score(_latest(cycle, "start"))
+
+    in_bed_ms = (sleep_score.get("stage_summary") or {}).get("total_in_bed_time_milli")
+    hours_in_bed = in_bed_ms / MILLIS_PER_HOUR if in_bed_ms is not None else None
+    needed = sleep_score.get("sleep_needed")
+    need_ms = sum(
+        needed.get(k) or 0
+        for k in ("baseline_milli", "need_from_sleep_debt_milli",
+                  "need_from_recent_strain_milli", "need_from_recent_nap_milli")
+    ) if needed is not None else 0
+    hours_needed = need_ms / MILLIS_PER_HOUR if need_ms > 0 else None
+    sleep_need_score = (
+        _js_round(hours_in_bed / hours_needed * 100)
+        if hours_in_bed is not None and hours_needed is not None else None
+    )
+    strain = cycle_score.get("strain")
+
+    return {
+        "sleep": sleep_score.get("sleep_performance_percentage"),
+        "sleepNeedScore": sleep_need_score,
+        "sleepConsistency": sleep_score.get("sleep_consistency_percentage"),
+        "sleepEfficiency": sleep_score.get("sleep_efficiency_percentage"),
+        "recovery": recovery_score.get("recovery_score"),
+        "recoveryRestingHeartRate": recovery_score.get("resting_heart_rate"),
+        "recoveryHrvRmssdMilli": recovery_score.get("hrv_rmssd_milli"),
+        "recoverySpo2Percentage": recovery_score.get("spo2_percentage"),
+        "strainPercent": _js_round(float(strain) / MAX_STRAIN * 100) if strain is not None else None,
+        "strainKilojoule": cycle_score.get("kilojoule"),
+        "strainAverageHeartRate": cycle_score.get("average_heart_rate"),
+        "strainMaxHeartRate": cycle_score.get("max_heart_rate"),
+    }
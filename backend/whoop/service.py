@@ -1,56 +1,167 @@
+import asyncio
 import os
 import random
 import string
-import requests
-from datetime import datetime, timedelta
+import time
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from urllib.parse import urlencode, urlparse, parse_qs
 from http.server import HTTPServer, BaseHTTPRequestHandler
 
-from dotenv import load_dotenv
-
-load_dotenv()
-load_dotenv(Path(__file__).resolve().parent.parent / ".env")
-
-AUTH_URL = "https://api.prod.whoop.com/oauth/oauth2/auth"
-TOKEN_URL = "https://api.prod.whoop.com/oauth/oauth2/token"
-API_BASE = "https://api.prod.whoop.com/developer"
+import settings  # noqa: F401  (loads backend/.env)
+from shared_state import shared_state
+from metrics.registry import registry
+from whoop.client import WHOOP_LATENCY, WHOOP_REQUESTS, RateLimiter, WhoopClient
+from whoop.credentials import get_credential_store
+from whoop.store import record_key
+from whoop.token_cache import access_tokens
+from whoop.token_store import FileTokenStore, account_lock
+
+# WHOOP_API_BASE points the client at another host (e.g. the load-test stub).
+WHOOP_BASE = os.environ.get("WHOOP_API_BASE", "https://api.prod.whoop.com").rstrip("/")
+AUTH_URL = f"{WHOOP_BASE}/oauth/oauth2/auth"
+TOKEN_URL = f"{WHOOP_BASE}/oauth/oauth2/token"
+API_BASE = f"{WHOOP_BASE}/developer"
 SCOPES = "read:sleep read:cycles read:recovery offline"
 
 BACKEND_BASE_URL = os.environ.get("BACKEND_BASE_URL", "http://localhost:8000").rstrip("/")
 REDIRECT_URI = f"{BACKEND_BASE_URL}/whoop/callback"
-OAUTH_STATES: dict[str, bool] = {}
+# OAuth state values live in shared_state so the callback can land on any worker.
+OAUTH_STATE_PREFIX = "whoop:oauth_state:"
+OAUTH_STATE_TTL_SECONDS = 600
+# Each elder connects their own WHOOP account (see whoop/credentials.py); the default
+# elder is the original single account, read from WHOOP_REFRESH_TOKEN or the token file.
+DEFAULT_ELDER = "default"
+# Access-token lifetime assumed when the token response omits expires_in.
+DEFAULT_TOKEN_TTL_SECONDS = 3600
+
+
+def _credentials() -> tuple[str, str]:
+    """(client_id, client_secret), read when first needed so the app starts without WHOOP configured."""
+    client_id = os.environ.get("WHOOP_CLIENT_ID")
+    client_secret = os.environ.get("WHOOP_CLIENT_SECRET")
+    if not client_id or not client_secret:
+        raise RuntimeError("WHOOP_CLIENT_ID and WHOOP_CLIENT_SECRET must be set in backend/.env")
+    return client_id, client_secret
+
 
-CLIENT_ID = os.environ["WHOOP_CLIENT_ID"]
-CLIENT_SECRET = os.environ["WHOOP_CLIENT_SECRET"]
 WHOOP_DIR = Path(__file__).resolve().parent
-REFRESH_TOKEN_FILE = WHOOP_DIR / ".whoop_refresh_token"
+REFRESH_TOKEN_FILE = Path(os.environ.get("WHOOP_REFRESH_TOKEN_FILE") or WHOOP_DIR / ".whoop_refresh_token")
+
+# The default elder's tokens (written atomically, see whoop/token_store.py) ...
+default_tokens = FileTokenStore(REFRESH_TOKEN_FILE)
+# ... and every other elder's
+credential_store = get_credential_store()
+
+WHOOP_TOKEN_REFRESHES = registry.counter(
+    "whoop_token_refreshes_total",
+    "Access-token refreshes by result: refreshed, reused (another process had just refreshed), revoked.",
+    ("result",),
+)
+
+
+class WhoopAuthError(RuntimeError):
+    """The elder has no usable WHOOP credential; they must connect WHOOP (again)."""
+
+
+# Token endpoint calls stay synchronous (they run under the token cache lock, usually
+# in a worker thread) but share one pooled session with the same timeouts.
+_session = None
+
 
+def _http():
+    global _session
+    if _session is None:
+        import requests
 
-def _get_refresh_token() -> str | None:
+        _session = requests.Session()
+    return _session
+
+
+def _timeouts() -> tuple[float, float]:
+    return whoop_client.connect_timeout, whoop_client.read_timeout
+
+
+def _whoop_request(endpoint: str, method: str, url: str, **kwargs):
+    """Pooled, time-limited request with latency and status recorded under ``endpoint``."""
+    started = time.perf_counter()
+    status = "error"
+    try:
+        response = _http().request(method, url, timeout=_timeouts(), **kwargs)
+        status = str(response.status_code)
+        return response
+    finally:
+        WHOOP_LATENCY.labels(endpoint).observe(time.perf_counter() - started)
+        WHOOP_REQUESTS.labels(endpoint, status).inc()
+
+
+def _load_tokens(elder_id: str = DEFAULT_ELDER) -> dict | None:
+    """{"refresh_token", "access_token", "expires_at"} stored for the elder, or None."""
+    if elder_id != DEFAULT_ELDER:
+        return credential_store.tokens(elder_id)
+    # The file holds the latest rotated token; WHOOP_REFRESH_TOKEN only seeds it, since
+    # WHOOP invalidates it on the first refresh. Delete the file to reseed from the env.
+    stored = default_tokens.load()
+    if stored:
+        return stored
     token = os.environ.get("WHOOP_REFRESH_TOKEN", "").strip()
-    if token:
-        return token
-    if REFRESH_TOKEN_FILE.exists():
-        return REFRESH_TOKEN_FILE.read_text().strip() or None
-    return None
+    return {"refresh_token": token, "access_token": None, "expires_at": None} if token else None
+
+
+def _get_refresh_token(elder_id: str = DEFAULT_ELDER) -> str | None:
+    tokens = _load_tokens(elder_id)
+    return tokens["refresh_token"] if tokens else None
+
+
+def _save_tokens(elder_id: str, refresh_token: str, access_token: str | None = None,
+                 expires_at: float | None = None) -> None:
+    """Store the elder's tokens; callers hold ``account_lock(elder_id)``."""
+    if elder_id != DEFAULT_ELDER:
+        credential_store.set_refresh_token(elder_id, refresh_token, access_token, expires_at)
+    else:
+        default_tokens.save(refresh_token, access_token, expires_at)
+
 
+def _revoke_refresh_token(elder_id: str) -> None:
+    if elder_id != DEFAULT_ELDER:
+        credential_store.mark_revoked(elder_id)
+    else:
+        default_tokens.delete()
+    access_tokens.invalidate(elder_id)
 
-def _set_refresh_token(token: str) -> None:
-    REFRESH_TOKEN_FILE.write_text(token)
 
+def connected_elders() -> list[str]:
+    """Elders with a WHOOP refresh token, the default elder first if it has one."""
+    elders = credential_store.elder_ids()
+    if _get_refresh_token(DEFAULT_ELDER) and DEFAULT_ELDER not in elders:
+        elders.insert(0, DEFAULT_ELDER)
+    return elders
 
-def refresh_access_token() -> tuple[str, str]:
-    token = _get_refresh_token()
+
+def refresh_access_token(elder_id: str = DEFAULT_ELDER) -> tuple[str, str]:
+    with account_lock(elder_id):
+        data = _refresh_grant(elder_id)
+    return data["access_token"], data["refresh_token"]
+
+
+def _refresh_grant(elder_id: str = DEFAULT_ELDER) -> dict:
+    """
+    Exchange the elder's refresh token and store the rotated refresh token
+    with the new access token; returns the token response. Callers hold
+    ``account_lock(elder_id)``: WHOOP invalidates the old refresh token, so
+    two processes must never send the same one.
+    """
+    client_id, client_secret = _credentials()
+    token = _get_refresh_token(elder_id)
     if not token:
-        raise RuntimeError("No refresh token. Connect WHOOP once from the dashboard (or set WHOOP_REFRESH_TOKEN after running OAuth).")
-    resp = requests.post(
-        TOKEN_URL,
+        raise WhoopAuthError(f"No refresh token for elder {elder_id!r}. Connect WHOOP from the dashboard (or set WHOOP_REFRESH_TOKEN after running OAuth).")
+    resp = _whoop_request(
+        "token", "POST", TOKEN_URL,
         data={
             "grant_type": "refresh_token",
             "refresh_token": token,
-            "client_id": CLIENT_ID,
-            "client_secret": CLIENT_SECRET,
+            "client_id": client_id,
+            "client_secret": client_secret,
             "scope": SCOPES,
         },
         headers={"Content-Type": "application/x-www-form-urlencoded"},
@@ -59,26 +170,29 @@ def refresh_access_token() -> tuple[str, str]:
         try:
             err = resp.json()
             if err.get("error") == "invalid_grant" or resp.status_code == 401:
-                if REFRESH_TOKEN_FILE.exists():
-                    REFRESH_TOKEN_FILE.unlink()
-                raise RuntimeError("Whoop refresh token expired or was revoked. Connect WHOOP again from the dashboard.")
+                _revoke_refresh_token(elder_id)
+                WHOOP_TOKEN_REFRESHES.labels("revoked").inc()
+                raise WhoopAuthError("Whoop refresh token expired or was revoked. Connect WHOOP again from the dashboard.")
         except (ValueError, KeyError):
             pass
     resp.raise_for_status()
     data = resp.json()
     new_refresh = data.get("refresh_token") or token
-    if new_refresh != token:
-        _set_refresh_token(new_refresh)
-    return data["access_token"], new_refresh
+    # Saved even when not rotated, so other processes can reuse the access token.
+    expires_in = data.get("expires_in", DEFAULT_TOKEN_TTL_SECONDS)
+    _save_tokens(elder_id, new_refresh, data.get("access_token"), time.time() + expires_in)
+    WHOOP_TOKEN_REFRESHES.labels("refreshed").inc()
+    return {**data, "refresh_token": new_refresh}
 
 
 LOCAL_REDIRECT_URI = "http://127.0.0.1:8765/callback"
 
 
 def run_oauth_flow() -> str:
+    client_id, client_secret = _credentials()
     state = "".join(random.choices(string.ascii_letters + string.digits, k=8))
     params = {
-        "client_id": CLIENT_ID,
+        "client_id": client_id,
         "redirect_uri": LOCAL_REDIRECT_URI,
         "response_type": "code",
         "scope": SCOPES,
@@ -113,13 +227,13 @@ def run_oauth_flow() -> str:
     code = code_holder.get("code")
     if not code:
         raise RuntimeError("No authorization code received. Ensure redirect URI is http://127.0.0.1:8765/callback in WHOOP Developer Dashboard.")
-    resp = requests.post(
-        TOKEN_URL,
+    resp = _whoop_request(
+        "token", "POST", TOKEN_URL,
         data={
             "grant_type": "authorization_code",
             "code": code,
-            "client_id": CLIENT_ID,
-            "client_secret": CLIENT_SECRET,
+            "client_id": client_id,
+            "client_secret": client_secret,
             "redirect_uri": LOCAL_REDIRECT_URI,
         },
         headers={"Content-Type": "application/x-www-form-urlencoded"},
@@ -128,16 +242,20 @@ def run_oauth_flow() -> str:
     data = resp.json()
     new_refresh = data.get("refresh_token")
     if new_refresh:
-        _set_refresh_token(new_refresh)
+        with account_lock(DEFAULT_ELDER):
+            _save_tokens(DEFAULT_ELDER, new_refresh, data.get("access_token"),
+                         time.time() + data.get("expires_in", DEFAULT_TOKEN_TTL_SECONDS))
         print("Refresh token saved to", REFRESH_TOKEN_FILE)
     return data["access_token"]
 
 
-def get_auth_url() -> str:
+def get_auth_url(elder_id: str = DEFAULT_ELDER) -> str:
+    client_id, client_secret = _credentials()
     state = "".join(random.choices(string.ascii_letters + string.digits, k=12))
-    OAUTH_STATES[state] = True
+    # The state remembers which elder is connecting, since the callback only gets code and state back.
+    shared_state.set(OAUTH_STATE_PREFIX + state, elder_id, ttl=OAUTH_STATE_TTL_SECONDS)
     params = {
-        "client_id": CLIENT_ID,
+        "client_id": client_id,
         "redirect_uri": REDIRECT_URI,
         "response_type": "code",
         "scope": SCOPES,
@@ -146,17 +264,21 @@ def get_auth_url() -> str:
     return f"{AUTH_URL}?{urlencode(params)}"
 
 
-def exchange_code_for_token(code: str, state: str) -> None:
-    if state not in OAUTH_STATES:
+def exchange_code_for_token(code: str, state: str) -> str:
+    """Store the refresh token for the elder that started this OAuth flow; returns the elder id."""
+    client_id, client_secret = _credentials()
+    elder_id = shared_state.pop(OAUTH_STATE_PREFIX + state)
+    if elder_id is None:
         raise ValueError("invalid or expired state")
-    del OAUTH_STATES[state]
-    resp = requests.post(
-        TOKEN_URL,
+    if not isinstance(elder_id, str):
+        elder_id = DEFAULT_ELDER  # state issued before per-elder accounts
+    resp = _whoop_request(
+        "token", "POST", TOKEN_URL,
         data={
             "grant_type": "authorization_code",
             "code": code,
-            "client_id": CLIENT_ID,
-            "client_secret": CLIENT_SECRET,
+            "client_id": client_id,
+            "client_secret": client_secret,
             "redirect_uri": REDIRECT_URI,
         },
         headers={"Content-Type": "application/x-www-form-urlencoded"},
@@ -165,77 +287,189 @@ def exchange_code_for_token(code: str, state: str) -> None:
     data = resp.json()
     new_refresh = data.get("refresh_token")
     if new_refresh:
-        _set_refresh_token(new_refresh)
-
-
-def is_whoop_connected() -> bool:
-    return _get_refresh_token() is not None
-
-
-def get_access_token() -> str:
-    if _get_refresh_token():
-        access_token, _ = refresh_access_token()
-        return access_token
+        with account_lock(elder_id):
+            _save_tokens(elder_id, new_refresh, data.get("access_token"),
+                         time.time() + data.get("expires_in", DEFAULT_TOKEN_TTL_SECONDS))
+    if data.get("access_token"):
+        access_tokens.put(elder_id, data["access_token"], data.get("expires_in", DEFAULT_TOKEN_TTL_SECONDS))
+    return elder_id
+
+
+def is_whoop_connected(elder_id: str = DEFAULT_ELDER) -> bool:
+    return _get_refresh_token(elder_id) is not None
+
+
+def _refresh_for_cache(elder_id: str = DEFAULT_ELDER) -> tuple[str, float]:
+    """
+    Refresh under the account lock, single-flight across processes (the token
+    cache already makes it single-flight within one). A process that waited
+    for the lock usually finds the access token the holder just stored and
+    reuses it rather than refreshing again.
+    """
+    with account_lock(elder_id):
+        stored = _load_tokens(elder_id) or {}
+        remaining = (stored.get("expires_at") or 0) - time.time()
+        if stored.get("access_token") and remaining > access_tokens.margin:
+            WHOOP_TOKEN_REFRESHES.labels("reused").inc()
+            return stored["access_token"], remaining
+        data = _refresh_grant(elder_id)
+    return data["access_token"], data.get("expires_in", DEFAULT_TOKEN_TTL_SECONDS)
+
+
+def _forget_access_token(elder_id: str) -> None:
+    """Drop the stored access token too, so no process reuses one WHOOP rejected."""
+    with account_lock(elder_id):
+        stored = _load_tokens(elder_id)
+        if stored and stored.get("access_token"):
+            _save_tokens(elder_id, stored["refresh_token"])
+
+
+async def _unauthorized(elder_id: str) -> None:
+    access_tokens.invalidate(elder_id)
+    await asyncio.to_thread(_forget_access_token, elder_id)
+
+
+def get_access_token(elder_id: str = DEFAULT_ELDER) -> str:
+    """Cached access token, refreshed only when it is close to expiry (see whoop/token_cache.py)."""
+    if _get_refresh_token(elder_id):
+        return access_tokens.get(elder_id, lambda: _refresh_for_cache(elder_id))
+    if elder_id != DEFAULT_ELDER:
+        raise WhoopAuthError(f"Elder {elder_id!r} has not connected WHOOP.")
     return run_oauth_flow()
 
 
-def get_weekly_sleep() -> list[dict]:
-    access_token = get_access_token()
-    end_time = datetime.utcnow()
-    start_time = end_time - timedelta(days=DEFAULT_RANGE_DAYS)
-    params = {
-        "start": start_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
-        "end": end_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
-        "limit": 25,
-    }
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json",
-    }
-    url = f"{API_BASE}/v2/activity/sleep"
-    response = requests.get(url, headers=headers, params=params)
-    response.raise_for_status()
-    data = response.json()
-    return data.get("records", [])
-
-
-def _auth_headers() -> dict:
-    access_token = get_access_token()
-    return {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json",
-    }
-
-
-DEFAULT_RANGE_DAYS = 7
-
-
-def _default_range_params() -> dict:
-    end_time = datetime.utcnow()
-    start_time = end_time - timedelta(days=DEFAULT_RANGE_DAYS)
-    return {
-        "start": start_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
-        "end": end_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
-        "limit": 25,
-    }
-
+async def _access_token_async(elder_id: str) -> str:
+    token = access_tokens.peek(elder_id)
+    if token is not None:
+        return token
+    return await asyncio.to_thread(get_access_token, elder_id)
 
-def get_weekly_cycle() -> list[dict]:
-    url = f"{API_BASE}/v2/cycle"
-    response = requests.get(url, headers=_auth_headers(), params=_default_range_params())
-    response.raise_for_status()
-    data = response.json()
-    return data.get("records", [])
 
+# One limiter for every request this process makes, counted in shared_state so all
+# workers together stay under WHOOP's limits, which are per app, not per account
+# (see RateLimiter in whoop/client.py).
+whoop_rate_limiter = RateLimiter.from_env(shared_state)
+whoop_client = WhoopClient(API_BASE, _access_token_async, _unauthorized, rate_limiter=whoop_rate_limiter)
 
-def get_weekly_recovery() -> list[dict]:
-    url = f"{API_BASE}/v2/recovery"
-    response = requests.get(url, headers=_auth_headers(), params=_default_range_params())
-    response.raise_for_status()
-    data = response.json()
-    return data.get("records", [])
+DEFAULT_RANGE_DAYS = 7
+# WHOOP's maximum page size.
+PAGE_LIMIT = 25
+# Ranges longer than this are split into sub-ranges fetched concurrently, at most
+# FETCH_CONCURRENCY at a time per call.
+SHARD_DAYS = int(os.environ.get("WHOOP_SHARD_DAYS", 30))
+FETCH_CONCURRENCY = int(os.environ.get("WHOOP_FETCH_CONCURRENCY", 4))
+
+RESOURCE_PATHS = {
+    "sleep": "/v2/activity/sleep",
+    "cycle": "/v2/cycle",
+    "recovery": "/v2/recovery",
+}
+
+
+def _whoop_time(dt: datetime) -> str:
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.") + f"{dt.microsecond // 1000:03d}Z"
+
+
+def _shards(start: datetime, end: datetime, shard_days: int) -> list[tuple[datetime, datetime]]:
+    """[start, end) as consecutive sub-ranges of at most ``shard_days``, newest first."""
+    step = timedelta(days=max(1, shard_days))
+    shards = []
+    while start < end:
+        shards.append((start, min(start + step, end)))
+        start += step
+    return shards[::-1]
+
+
+async def iter_pages(resource: str, start: datetime, end: datetime, elder_id: str = DEFAULT_ELDER):
+    """Yield each page (list of records) of ``resource`` in [start, end), following next_token."""
+    path = RESOURCE_PATHS[resource]
+    params = {"start": _whoop_time(start), "end": _whoop_time(end), "limit": PAGE_LIMIT}
+    while True:
+        data = await whoop_client.get_json(resource, path, elder_id=elder_id, params=params)
+        records = data.get("records", [])
+        if records:
+            yield records
+        next_token = data.get("next_token")
+        if not next_token:
+            return
+        params = {**params, "nextToken": next_token}
+
+
+async def iter_records(
+    resource: str,
+    start: datetime,
+    end: datetime,
+    elder_id: str = DEFAULT_ELDER,
+    shard_days: int | None = None,
+    concurrency: int | None = None,
+):
+    """
+    Async generator over every ``resource`` record in [start, end).
+
+    Ranges longer than ``shard_days`` are split into sub-ranges whose pages
+    are fetched by up to ``concurrency`` workers at once. Records are yielded
+    as pages arrive, so across shards they are not in time order; a record
+    returned by two adjacent shards is yielded once. Pages pass through a
+    small bounded queue, so a slow consumer holds the fetchers back instead
+    of the whole history piling up in memory. Closing the generator early
+    cancels outstanding fetches.
+    """
+    shards = _shards(start, end, shard_days or SHARD_DAYS)
+    if len(shards) <= 1:
+        async for page in iter_pages(resource, start, end, elder_id):
+            for record in page:
+                yield record
+        return
+
+    pending = list(shards)
+    pages: asyncio.Queue = asyncio.Queue(maxsize=2 * (concurrency or FETCH_CONCURRENCY))
+    done = object()
+
+    async def worker():
+        try:
+            while pending:
+                shard_start, shard_end = pending.pop(0)
+                async for page in iter_pages(resource, shard_start, shard_end, elder_id):
+                    await pages.put(page)
+        except Exception as e:
+            await pages.put(e)
+        # Not in a finally: a cancelled worker must not block on a full queue.
+        await pages.put(done)
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency or FETCH_CONCURRENCY, len(shards)))]
+    seen: set = set()
+    running = len(workers)
+    try:
+        while running:
+            item = await pages.get()
+            if item is done:
+                running -= 1
+                continue
+            if isinstance(item, Exception):
+                raise item
+            for record in item:
+                record_id = record_key(record)
+                if record_id is not None:
+                    if record_id in seen:
+                        continue
+                    seen.add(record_id)
+                yield record
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
 
 
 if __name__ == "__main__":
     import json
-    print(json.dumps(get_weekly_sleep(), indent=2))
+
+    async def _main() -> list[dict]:
+        end_time = datetime.now(timezone.utc)
+        try:
+            return [r async for r in iter_records("sleep", end_time - timedelta(days=DEFAULT_RANGE_DAYS), end_time)]
+        finally:
+            await whoop_client.aclose()
+
+    print(json.dumps(asyncio.run(_main()), indent=2))
@@ -0,0 +1,229 @@
+"""
+Local time series of WHOOP sleep, cycle and recovery records per elder.
+
+Records are keyed by (elder_id, resource, id) and upserted; recoveries,
+which have no id of their own, are keyed by cycle_id. A record is only
+rewritten when its ``updated_at`` is newer than the stored copy, so
+re-syncing an overlapping window is cheap and idempotent. Each
+(elder_id, resource) also keeps a sync state: the high-water mark (latest
+record start seen) and when it was last synced, which whoop/sync.py uses to
+fetch only the recent window on the next run.
+
+Timestamps are stored as normalised UTC ISO strings
+(``2026-01-31T22:00:00.000Z``), which sort correctly as text.
+
+SQLiteWhoopStore shares the session database file by default and is safe
+across threads and worker processes. InMemoryWhoopStore has the same
+interface for tests and local experiments.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent / "sessions.db"
+
+RESOURCES = ("sleep", "cycle", "recovery")
+
+
+def normalize_time(value: str | datetime | None) -> str | None:
+    """UTC ISO timestamp with millisecond precision and a Z suffix."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    value = value.astimezone(timezone.utc)
+    return value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}Z"
+
+
+def record_key(record: dict) -> str | None:
+    """Stable id of a WHOOP record; recoveries have no id of their own and are keyed by cycle."""
+    key = record.get("id")
+    if key is None:
+        key = record.get("cycle_id")
+    return None if key is None else str(key)
+
+
+def _row(elder_id: str, resource: str, record: dict) -> tuple:
+    return (
+        elder_id,
+        resource,
+        record_key(record),
+        normalize_time(record.get("start") or record.get("created_at")),
+        normalize_time(record.get("updated_at") or record.get("created_at")) or "",
+        json.dumps(record),
+    )
+
+
+class WhoopStore:
+    """Interface shared by the WHOOP store implementations."""
+
+    def upsert(self, elder_id: str, resource: str, records: list[dict]) -> int:
+        """Insert new records and replace ones with a newer updated_at; returns how many changed."""
+        raise NotImplementedError
+
+    def records(self, elder_id: str, resource: str, start: datetime | None = None,
+                end: datetime | None = None) -> list[dict]:
+        """Stored records whose start is in [start, end), newest first."""
+        raise NotImplementedError
+
+    def sync_state(self, elder_id: str, resource: str) -> dict | None:
+        """{"high_water", "synced_at"} for the last successful sync, or None if never synced."""
+        raise NotImplementedError
+
+    def mark_synced(self, elder_id: str, resource: str, high_water: str | None, synced_at: float | None = None) -> None:
+        """Record a successful sync; the high-water mark never moves backwards."""
+        raise NotImplementedError
+
+
+class SQLiteWhoopStore(WhoopStore):
+    """SQLite (WAL) WHOOP store; safe to share between threads and worker processes."""
+
+    def __init__(self, path: str | Path = DEFAULT_DB_PATH):
+        self.path = str(path)
+        self._local = threading.local()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS whoop_records (
+                elder_id TEXT NOT NULL,
+                resource TEXT NOT NULL,
+                id TEXT NOT NULL,
+                start TEXT,
+                updated_at TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (elder_id, resource, id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_whoop_records_start ON whoop_records (elder_id, resource, start);
+            CREATE TABLE IF NOT EXISTS whoop_sync (
+                elder_id TEXT NOT NULL,
+                resource TEXT NOT NULL,
+                high_water TEXT,
+                synced_at REAL NOT NULL,
+                PRIMARY KEY (elder_id, resource)
+            );
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def upsert(self, elder_id: str, resource: str, records: list[dict]) -> int:
+        if not records:
+            return 0
+        conn = self._conn()
+        before = conn.total_changes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                """
+                INSERT INTO whoop_records (elder_id, resource, id, start, updated_at, data)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (elder_id, resource, id) DO UPDATE
+                SET start = excluded.start, updated_at = excluded.updated_at, data = excluded.data
+                WHERE excluded.updated_at > whoop_records.updated_at
+                """,
+                [_row(elder_id, resource, r) for r in records if record_key(r) is not None],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return conn.total_changes - before
+
+    def records(self, elder_id: str, resource: str, start: datetime | None = None,
+                end: datetime | None = None) -> list[dict]:
+        sql = "SELECT data FROM whoop_records WHERE elder_id = ? AND resource = ?"
+        params: list = [elder_id, resource]
+        if start is not None:
+            sql += " AND start >= ?"
+            params.append(normalize_time(start))
+        if end is not None:
+            sql += " AND start < ?"
+            params.append(normalize_time(end))
+        sql += " ORDER BY start DESC"
+        return [json.loads(row["data"]) for row in self._conn().execute(sql, params)]
+
+    def sync_state(self, elder_id: str, resource: str) -> dict | None:
+        row = self._conn().execute(
+            "SELECT high_water, synced_at FROM whoop_sync WHERE elder_id = ? AND resource = ?",
+            (elder_id, resource),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def mark_synced(self, elder_id: str, resource: str, high_water: str | None, synced_at: float | None = None) -> None:
+        self._conn().execute(
+            """
+            INSERT INTO whoop_sync (elder_id, resource, high_water, synced_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (elder_id, resource) DO UPDATE
+            SET high_water = NULLIF(MAX(COALESCE(whoop_sync.high_water, ''), COALESCE(excluded.high_water, '')), ''),
+                synced_at = excluded.synced_at
+            """,
+            (elder_id, resource, normalize_time(high_water), synced_at if synced_at is not None else time.time()),
+        )
+
+
+class InMemoryWhoopStore(WhoopStore):
+    """Process-local WHOOP store (lost on restart)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records: dict[tuple, tuple] = {}
+        self._sync: dict[tuple, dict] = {}
+
+    def upsert(self, elder_id: str, resource: str, records: list[dict]) -> int:
+        changed = 0
+        with self._lock:
+            for record in records:
+                if record_key(record) is None:
+                    continue
+                _, _, record_id, start, updated_at, data = _row(elder_id, resource, record)
+                key = (elder_id, resource, record_id)
+                stored = self._records.get(key)
+                if stored is None or updated_at > stored[1]:
+                    self._records[key] = (start, updated_at, data)
+                    changed += 1
+        return changed
+
+    def records(self, elder_id: str, resource: str, start: datetime | None = None,
+                end: datetime | None = None) -> list[dict]:
+        lo, hi = normalize_time(start), normalize_time(end)
+        with self._lock:
+            rows = [
+                (s, data) for (e, r, _), (s, _, data) in self._records.items()
+                if e == elder_id and r == resource
+                and (lo is None or (s or "") >= lo) and (hi is None or (s or "") < hi)
+            ]
+        rows.sort(key=lambda row: row[0] or "", reverse=True)
+        return [json.loads(data) for _, data in rows]
+
+    def sync_state(self, elder_id: str, resource: str) -> dict | None:
+        with self._lock:
+            state = self._sync.get((elder_id, resource))
+            return dict(state) if state else None
+
+    def mark_synced(self, elder_id: str, resource: str, high_water: str | None, synced_at: float | None = None) -> None:
+        with self._lock:
+            previous = (self._sync.get((elder_id, resource)) or {}).get("high_water") or ""
+            self._sync[(elder_id, resource)] = {
+                "high_water": max(previous, normalize_time(high_water) or "") or None,
+                "synced_at": synced_at if synced_at is not None else time.time(),
+            }
+
+
+def get_whoop_store() -> WhoopStore:
+    """Store configured by WHOOP_STORE ("sqlite" or "memory") and WHOOP_DB_PATH (defaults to SESSION_DB_PATH)."""
+    if os.getenv("WHOOP_STORE", "sqlite") == "memory":
+        return InMemoryWhoopStore()
+    return SQLiteWhoopStore(os.getenv("WHOOP_DB_PATH") or os.getenv("SESSION_DB_PATH") or str(DEFAULT_DB_PATH))
@@ -0,0 +1,180 @@
+"""
+Incremental sync of WHOOP records into the local store (whoop/store.py).
+
+The first sync of an (elder, resource) backfills WHOOP_BACKFILL_DAYS.
+Later syncs fetch only from the high-water mark (the latest record start
+already stored) minus WHOOP_SYNC_LOOKBACK_HOURS. WHOOP's collection
+endpoints filter by start time, not updated_at, and recent sleeps and
+recoveries are rescored for a while after they start, so the lookback
+window re-reads exactly the records that can still change. Upserts keep
+only the newer updated_at.
+
+The /whoop endpoints read from the store. A sync runs inline only when
+nothing has been synced yet (or on ?refresh=true); otherwise a sync older
+than WHOOP_SYNC_MAX_AGE seconds is refreshed in the background and the
+stored records are served immediately. Syncs are single-flight per
+(elder, resource): in-process callers share the running task, and a
+shared_state lock keeps other workers from syncing the same thing at the
+same time. A first read that finds another worker running the first sync
+waits up to WHOOP_SYNC_WAIT_SECONDS for it, then raises SyncPending rather
+than serve an empty store as if it were real.
+
+Store and lock calls are blocking SQLite, so they run in worker threads.
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from metrics.registry import registry
+from shared_state import shared_state
+from whoop.service import iter_records
+from whoop.store import RESOURCES, get_whoop_store, normalize_time
+
+
+# Durable WHOOP time series (SQLite by default, see whoop/store.py)
+whoop_store = get_whoop_store()
+
+BACKFILL_DAYS = int(os.environ.get("WHOOP_BACKFILL_DAYS", 90))
+LOOKBACK_HOURS = float(os.environ.get("WHOOP_SYNC_LOOKBACK_HOURS", 72))
+MAX_AGE_SECONDS = float(os.environ.get("WHOOP_SYNC_MAX_AGE", 15 * 60))
+UPSERT_BATCH = 200
+
+SYNC_LOCK_PREFIX = "whoop:sync:"
+SYNC_LOCK_TTL_SECONDS = 10 * 60
+SYNC_WAIT_SECONDS = float(os.environ.get("WHOOP_SYNC_WAIT_SECONDS", 30))
+SYNC_WAIT_POLL_SECONDS = 0.5
+
+WHOOP_SYNCS = registry.counter(
+    "whoop_syncs_total", "WHOOP store syncs by resource and result.", ("resource", "result")
+)
+WHOOP_SYNC_RECORDS = registry.counter(
+    "whoop_sync_records_total", "Records fetched during syncs and how many changed the store.",
+    ("resource", "outcome"),
+)
+
+_inflight: dict[tuple[str, str], asyncio.Task] = {}
+
+
+class SyncPending(RuntimeError):
+    """Nothing is stored yet and another worker is still running the first sync."""
+
+
+def _log_failure(task: asyncio.Task) -> None:
+    # Also marks the exception retrieved for background syncs nobody awaits.
+    if not task.cancelled() and task.exception() is not None:
+        print(f"WHOOP sync failed: {type(task.exception()).__name__}: {task.exception()}")
+
+
+async def _sync_resource(elder_id: str, resource: str) -> dict:
+    now = datetime.now(timezone.utc)
+    state = await asyncio.to_thread(whoop_store.sync_state, elder_id, resource)
+    if state and state["high_water"]:
+        start = datetime.fromisoformat(state["high_water"].replace("Z", "+00:00")) - timedelta(hours=LOOKBACK_HOURS)
+    else:
+        start = now - timedelta(days=BACKFILL_DAYS)
+
+    fetched = changed = 0
+    high_water = None
+    batch: list[dict] = []
+    async for record in iter_records(resource, start, now, elder_id):
+        fetched += 1
+        record_start = normalize_time(record.get("start"))
+        if record_start and (high_water is None or record_start > high_water):
+            high_water = record_start
+        batch.append(record)
+        if len(batch) >= UPSERT_BATCH:
+            changed += await asyncio.to_thread(whoop_store.upsert, elder_id, resource, batch)
+            batch = []
+    changed += await asyncio.to_thread(whoop_store.upsert, elder_id, resource, batch)
+    await asyncio.to_thread(whoop_store.mark_synced, elder_id, resource, high_water, synced_at=time.time())
+
+    WHOOP_SYNC_RECORDS.labels(resource, "fetched").inc(fetched)
+    WHOOP_SYNC_RECORDS.labels(resource, "changed").inc(changed)
+    return {"resource": resource, "from": normalize_time(start), "fetched": fetched, "changed": changed}
+
+
+def _lock_key(elder_id: str, resource: str) -> str:
+    return f"{SYNC_LOCK_PREFIX}{elder_id}:{resource}"
+
+
+async def _sync_locked(elder_id: str, resource: str) -> dict:
+    lock_key = _lock_key(elder_id, resource)
+    if not await asyncio.to_thread(shared_state.set_if_absent, lock_key, os.getpid(), ttl=SYNC_LOCK_TTL_SECONDS):
+        WHOOP_SYNCS.labels(resource, "skipped").inc()
+        return {"resource": resource, "skipped": "sync already running in another worker"}
+    try:
+        result = await _sync_resource(elder_id, resource)
+    except Exception:
+        WHOOP_SYNCS.labels(resource, "error").inc()
+        raise
+    finally:
+        await asyncio.to_thread(shared_state.delete, lock_key)
+    WHOOP_SYNCS.labels(resource, "ok").inc()
+    return result
+
+
+def _task(elder_id: str, resource: str) -> asyncio.Task:
+    """The running sync for (elder_id, resource), started if there is none."""
+    key = (elder_id, resource)
+    task = _inflight.get(key)
+    if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+        task = asyncio.create_task(_sync_locked(elder_id, resource))
+        _inflight[key] = task
+        task.add_done_callback(lambda t, key=key: _inflight.pop(key, None) if _inflight.get(key) is t else None)
+        task.add_done_callback(_log_failure)
+    return task
+
+
+async def sync(elder_id: str, resources: tuple[str, ...] = RESOURCES) -> list[dict]:
+    """Sync ``resources`` for one elder concurrently; joins syncs already in flight."""
+    # Shielded: a caller that goes away must not cancel a sync others are waiting on.
+    gathered = asyncio.gather(*(_task(elder_id, r) for r in resources))
+    # The tasks log their own failures; this only keeps an abandoned gather from warning.
+    gathered.add_done_callback(lambda f: f.cancelled() or f.exception())
+    return list(await asyncio.shield(gathered))
+
+
+async def shutdown() -> None:
+    """Cancel syncs still running on this loop (before the WHOOP client is closed)."""
+    loop = asyncio.get_running_loop()
+    tasks = [t for t in _inflight.values() if t.get_loop() is loop]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _stale(state: dict | None) -> bool:
+    return state is None or time.time() - state["synced_at"] > MAX_AGE_SECONDS
+
+
+async def _wait_for_other_worker(elder_id: str, resource: str) -> None:
+    """Wait (at most SYNC_WAIT_SECONDS) until no worker holds the sync lock."""
+    lock_key = _lock_key(elder_id, resource)
+    deadline = time.monotonic() + SYNC_WAIT_SECONDS
+    while time.monotonic() < deadline and await asyncio.to_thread(shared_state.get, lock_key) is not None:
+        await asyncio.sleep(SYNC_WAIT_POLL_SECONDS)
+
+
+async def stored_records(
+    elder_id: str, resource: str, start: datetime, end: datetime, refresh: bool = False
+) -> tuple[list[dict], dict]:
+    """
+    Records in [start, end) from the store, syncing inline first if the
+    store has never been synced (or ``refresh``) and in the background if
+    it is stale. Returns (records, sync_state). Raises SyncPending if
+    nothing has been synced yet and another worker's first sync did not
+    finish in time.
+    """
+    state = await asyncio.to_thread(whoop_store.sync_state, elder_id, resource)
+    if refresh or state is None:
+        result = await asyncio.shield(_task(elder_id, resource))
+        if state is None and result.get("skipped"):
+            await _wait_for_other_worker(elder_id, resource)
+        state = await asyncio.to_thread(whoop_store.sync_state, elder_id, resource)
+        if state is None:
+            raise SyncPending(f"WHOOP {resource} for elder {elder_id!r} is still being synced")
+    elif _stale(state):
+        _task(elder_id, resource)
+    return await asyncio.to_thread(whoop_store.records, elder_id, resource, start, end), state
@@ -0,0 +1,87 @@
+"""
+In-memory cache of WHOOP access tokens, keyed by elder.
+
+WHOOP access tokens live for ``expires_in`` seconds (an hour today), and
+every refresh-token grant also rotates the refresh token, so refreshing on
+each API call doubled request latency and churned the stored refresh token.
+A cached token is reused until it is within ``margin`` seconds of expiry.
+Refreshes are single-flight per key: concurrent callers wait on the key's
+lock and pick up the token the first caller fetched.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from metrics.registry import registry
+
+
+DEFAULT_REFRESH_MARGIN_SECONDS = 120
+
+WHOOP_TOKEN_CACHE = registry.counter(
+    "whoop_token_cache_total", "WHOOP access-token lookups by result (hit, refresh).", ("result",)
+)
+
+
+@dataclass
+class CachedToken:
+    access_token: str
+    expires_at: float  # time.monotonic() deadline
+
+
+class AccessTokenCache:
+    def __init__(self, margin_seconds: float | None = None):
+        if margin_seconds is None:
+            margin_seconds = float(os.environ.get("WHOOP_TOKEN_REFRESH_MARGIN", DEFAULT_REFRESH_MARGIN_SECONDS))
+        self.margin = margin_seconds
+        self._tokens: dict[str, CachedToken] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def _lock(self, key: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _fresh(self, key: str) -> str | None:
+        token = self._tokens.get(key)
+        if token is not None and time.monotonic() < token.expires_at - self.margin:
+            return token.access_token
+        return None
+
+    def peek(self, key: str) -> str | None:
+        """Fresh cached token for ``key`` without refreshing (None if a refresh is due)."""
+        token = self._fresh(key)
+        if token is not None:
+            WHOOP_TOKEN_CACHE.labels("hit").inc()
+        return token
+
+    def get(self, key: str, refresh) -> str:
+        """
+        Access token for ``key``; ``refresh()`` -> (access_token, expires_in)
+        is called when there is no token or it is about to expire.
+        """
+        token = self._fresh(key)
+        if token is not None:
+            WHOOP_TOKEN_CACHE.labels("hit").inc()
+            return token
+        with self._lock(key):
+            token = self._fresh(key)  # another caller may have refreshed while we waited
+            if token is not None:
+                WHOOP_TOKEN_CACHE.labels("hit").inc()
+                return token
+            access_token, expires_in = refresh()
+            WHOOP_TOKEN_CACHE.labels("refresh").inc()
+            self.put(key, access_token, expires_in)
+            return access_token
+
+    def put(self, key: str, access_token: str, expires_in: float) -> None:
+        self._tokens[key] = CachedToken(access_token, time.monotonic() + float(expires_in))
+
+    def invalidate(self, key: str) -> None:
+        """Forget ``key``'s token (revoked, or rejected with a 401)."""
+        self._tokens.pop(key, None)
+
+
+# Shared instance used by whoop.service
+access_tokens = AccessTokenCache()
@@ -0,0 +1,118 @@
+"""
+Cross-process safety for WHOOP token refreshes.
+
+WHOOP rotates the refresh token on every refresh-token grant: the old one
+stops working as soon as the new one is issued. With several uvicorn
+workers (or the scheduler and a request in different processes), two
+processes refreshing the same account at once both send the same refresh
+token, one of them gets invalid_grant, and the account looks revoked. And a
+refresh token file rewritten in place can be read half-written, or lost if
+the process dies mid-write.
+
+* ``account_lock(elder_id)`` is an exclusive fcntl lock on a per-account
+  file under WHOOP_LOCK_DIR, held across read-refresh-write, so only one
+  process at a time refreshes an account. Locks are released by the kernel
+  if the holder dies. Without fcntl (Windows) it only serializes threads.
+* The new access token and its expiry are stored next to the refresh token,
+  so a process that waited on the lock reuses the token the holder just
+  fetched instead of spending the (now rotated) refresh token again.
+* ``FileTokenStore`` keeps the default account's tokens in one JSON file,
+  replaced atomically (write a temp file, fsync, rename), so readers see
+  either the old or the new tokens, never a mix. A plain-text file from
+  before holds just the refresh token and is still read.
+
+Per-elder tokens live in the credential store (whoop/credentials.py), whose
+SQLite writes are already atomic.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+LOCK_DIR = Path(os.environ.get("WHOOP_LOCK_DIR") or Path(__file__).resolve().parent / ".locks")
+
+_thread_locks: dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _lock_path(elder_id: str) -> Path:
+    # Elder ids come from requests; hash them into safe, fixed-length file names.
+    return LOCK_DIR / f"{hashlib.sha256(elder_id.encode()).hexdigest()[:32]}.lock"
+
+
+@contextmanager
+def account_lock(elder_id: str):
+    """Hold the account's refresh lock, across threads and processes on this host."""
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(elder_id, threading.Lock())
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        LOCK_DIR.mkdir(parents=True, exist_ok=True)
+        fd = os.open(_lock_path(elder_id), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # also releases the lock
+
+
+def atomic_write(path: Path, text: str) -> None:
+    """Replace ``path`` with ``text`` so that readers never see a partial file (owner-only mode)."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    if hasattr(os, "O_DIRECTORY"):
+        # Make the rename itself durable.
+        dir_fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class FileTokenStore:
+    """
+    {"refresh_token", "access_token", "expires_at"} for one account in a
+    JSON file. Writers must hold the account's ``account_lock``.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+
+    def load(self) -> dict | None:
+        try:
+            text = self.path.read_text().strip()
+        except FileNotFoundError:
+            return None
+        if not text:
+            return None
+        if not text.startswith("{"):
+            return {"refresh_token": text, "access_token": None, "expires_at": None}
+        return json.loads(text)
+
+    def save(self, refresh_token: str, access_token: str | None = None, expires_at: float | None = None) -> None:
+        atomic_write(self.path, json.dumps(
+            {"refresh_token": refresh_token, "access_token": access_token, "expires_at": expires_at}
+        ))
+
+    def delete(self) -> None:
+        self.path.unlink(missing_ok=True)
@@ -33,6 +33,8 @@ const BACKEND_URL =
 const WORKFLOWS_URL =
   process.env.NEXT_PUBLIC_WORKFLOWS_URL || "http://localhost:3000";
 const WHOOP_CACHE_KEY = "whoop_weekly_cache";
+// The elder this dashboard shows; WHOOP connect, status and sync all use it.
+const ELDER_ID = "margaret";
 
 const DAY_LABELS = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"];
 
@@ -78,9 +80,12 @@ import {
   YAxis,
 } from "recharts";
 import {
-  fetchAllSessions,
   fetchLatestSession,
+  fetchRecentSessions,
+  fetchSessionRiskSeries,
+  fetchWhoopSummary,
   type SessionEntry,
+  type SessionRiskPoint,
 } from "@/lib/api";
 
 function getWhoopColor(val: number) {
@@ -248,7 +253,7 @@ export default function DashboardOverview() {
   const [whoopLoading, setWhoopLoading] = useState(false);
 
   useEffect(() => {
-    fetch(`${BACKEND_URL}/whoop/status`)
+    fetch(`${BACKEND_URL}/whoop/status?elder_id=${encodeURIComponent(ELDER_ID)}`)
       .then((r) => r.json())
       .then((d) => setWhoopConnected(d.connected))
       .catch(() => setWhoopConnected(false));
@@ -257,7 +262,7 @@ export default function DashboardOverview() {
   const connectWhoop = async () => {
     setWhoopLoading(true);
     try {
-      const res = await fetch(`${BACKEND_URL}/whoop/auth-url`);
+      const res = await fetch(`${BACKEND_URL}/whoop/auth-url?elder_id=${encodeURIComponent(ELDER_ID)}`);
       const { authUrl } = await res.json();
       if (authUrl) window.location.href = authUrl;
     } finally {
@@ -280,7 +285,8 @@ export default function DashboardOverview() {
     strainMaxHeartRate: undefined as number | undefined,
   });
   const [latestSession, setLatestSession] = useState<SessionEntry | null>(null);
-  const [allSessions, setAllSessions] = useState<SessionEntry[]>([]);
+  const [allSessions, setAllSessions] = useState<SessionRiskPoint[]>([]);
+  const [recentSessions, setRecentSessions] = useState<SessionEntry[]>([]);
   const [loading, setLoading] = useState(true);
 
   const [weeklyWhoopCache, setWeeklyWhoopCache] = useState<{
@@ -296,10 +302,11 @@ export default function DashboardOverview() {
     setLoading(true);
     Promise.all([
       fetchLatestSession(),
-      fetchAllSessions(),
-    ]).then(([latest, sessions]) => {
+      fetchSessionRiskSeries().then(async (series) => [series, await fetchRecentSessions(series)] as const),
+    ]).then(([latest, [series, recent]]) => {
       setLatestSession(latest);
-      setAllSessions(sessions);
+      setAllSessions(series);
+      setRecentSessions(recent);
     }).finally(() => setLoading(false));
   }, []);
 
@@ -378,46 +385,58 @@ export default function DashboardOverview() {
     };
   }, []);
 
+  // Scores and weekly records from /whoop/summary or the sync workflow (same shape).
+  const applyWhoopSummary = (data: Partial<typeof weeklyWhoopCache> & { scores?: Record<string, unknown> }) => {
+    const scores = data?.scores;
+    if (scores) {
+      const num = (v: unknown) => (typeof v === "number" && !Number.isNaN(v) ? v : undefined);
+      setWhoopData((prev) => ({
+        sleep: num(scores.sleep) ?? prev.sleep,
+        sleepConsistency: num(scores.sleepConsistency) ?? prev.sleepConsistency,
+        sleepEfficiency: num(scores.sleepEfficiency) ?? prev.sleepEfficiency,
+        recovery: num(scores.recovery) ?? prev.recovery,
+        recoveryRestingHeartRate: num(scores.recoveryRestingHeartRate) ?? prev.recoveryRestingHeartRate,
+        recoveryHrvRmssdMilli: num(scores.recoveryHrvRmssdMilli) ?? prev.recoveryHrvRmssdMilli,
+        recoverySpo2Percentage: num(scores.recoverySpo2Percentage) ?? prev.recoverySpo2Percentage,
+        strainPercent: num(scores.strainPercent) ?? prev.strainPercent,
+        strainKilojoule: num(scores.strainKilojoule) ?? prev.strainKilojoule,
+        strainAverageHeartRate: num(scores.strainAverageHeartRate) ?? prev.strainAverageHeartRate,
+        strainMaxHeartRate: num(scores.strainMaxHeartRate) ?? prev.strainMaxHeartRate,
+      }));
+    }
+    if (Array.isArray(data?.sleep) || Array.isArray(data?.cycle) || Array.isArray(data?.recovery)) {
+      const cache = {
+        sleep: data.sleep ?? [],
+        recovery: data.recovery ?? [],
+        cycle: data.cycle ?? [],
+      };
+      setWeeklyWhoopCache(cache);
+      if (typeof window !== "undefined") localStorage.setItem(WHOOP_CACHE_KEY, JSON.stringify(cache));
+      const { sleepBar, recoveryBar, strainBar } = deriveOverlayDataFromCache(cache);
+      setSleepOverlayBarData(sleepBar);
+      setRecoveryOverlayBarData(recoveryBar);
+      setStrainOverlayBarData(strainBar);
+    }
+  };
+
+  // Last synced week from the backend store, in one round trip.
+  useEffect(() => {
+    if (!whoopConnected) return;
+    fetchWhoopSummary(ELDER_ID, true)
+      .then((data) => data && applyWhoopSummary(data))
+      .catch(() => {});
+  }, [whoopConnected]);
+
   const syncWhoop = async () => {
     setSyncLoading(true);
     try {
       const res = await fetch(`${WORKFLOWS_URL}/api/sync-health`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ elderId: "margaret" }),
+        body: JSON.stringify({ elderId: ELDER_ID }),
       });
       if (!res.ok) throw new Error(await res.text());
-      const data = await res.json();
-      const scores = data?.scores;
-      if (scores) {
-        const num = (v: unknown) => (typeof v === "number" && !Number.isNaN(v) ? v : undefined);
-        setWhoopData((prev) => ({
-          sleep: num(scores.sleep) ?? prev.sleep,
-          sleepConsistency: num(scores.sleepConsistency) ?? prev.sleepConsistency,
-          sleepEfficiency: num(scores.sleepEfficiency) ?? prev.sleepEfficiency,
-          recovery: num(scores.recovery) ?? prev.recovery,
-          recoveryRestingHeartRate: num(scores.recoveryRestingHeartRate) ?? prev.recoveryRestingHeartRate,
-          recoveryHrvRmssdMilli: num(scores.recoveryHrvRmssdMilli) ?? prev.recoveryHrvRmssdMilli,
-          recoverySpo2Percentage: num(scores.recoverySpo2Percentage) ?? prev.recoverySpo2Percentage,
-          strainPercent: num(scores.strainPercent) ?? prev.strainPercent,
-          strainKilojoule: num(scores.strainKilojoule) ?? prev.strainKilojoule,
-          strainAverageHeartRate: num(scores.strainAverageHeartRate) ?? prev.strainAverageHeartRate,
-          strainMaxHeartRate: num(scores.strainMaxHeartRate) ?? prev.strainMaxHeartRate,
-        }));
-      }
-      if (Array.isArray(data?.sleep) || Array.isArray(data?.cycle) || Array.isArray(data?.recovery)) {
-        const cache = {
-          sleep: data.sleep ?? [],
-          recovery: data.recovery ?? [],
-          cycle: data.cycle ?? [],
-        };
-        setWeeklyWhoopCache(cache);
-        if (typeof window !== "undefined") localStorage.setItem(WHOOP_CACHE_KEY, JSON.stringify(cache));
-        const { sleepBar, recoveryBar, strainBar } = deriveOverlayDataFromCache(cache);
-        setSleepOverlayBarData(sleepBar);
-        setRecoveryOverlayBarData(recoveryBar);
-        setStrainOverlayBarData(strainBar);
-      }
+      applyWhoopSummary(await res.json());
     } finally {
       setSyncLoading(false);
     }
@@ -434,7 +453,7 @@ export default function DashboardOverview() {
   // Derive cognitive chart data from sessions
   const cognitiveData = allSessions.map((s, i) => ({
     day: s.session_date || `S${i + 1}`,
-    score: Math.round(100 - (s.analysis_result?.risk_score ?? 0)),
+    score: Math.round(100 - (s.risk_score ?? 0)),
   }));
 
   // Derive alerts from latest session
@@ -460,7 +479,7 @@ export default function DashboardOverview() {
   }
 
   // Derive recent conversations from sessions
-  const recentConversations = allSessions.slice().reverse().slice(0, 5).map((s, i) => {
+  const recentConversations = recentSessions.slice().reverse().map((s, i) => {
     const markerCount = s.analysis_result?.rule_based?.markers?.filter((m) => m.flagged).length ?? 0;
     return {
       id: String(i + 1),
@@ -968,7 +987,7 @@ export default function DashboardOverview() {
           >
             <div className="flex items-center gap-2 mt-1">
               {(allSessions.length > 0 ? allSessions.slice(-7) : []).map((s, i) => {
-                const score = s.analysis_result?.risk_score ?? 0;
+                const score = s.risk_score ?? 0;
                 const h = Math.max(6, Math.min(36, Math.round(score * 1.5)));
                 return (
                   <div key={i} className="flex-1 flex flex-col items-center gap-1">
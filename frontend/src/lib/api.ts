@@ -46,27 +46,75 @@ export async function fetchLatestSession(): Promise<SessionEntry | null> {
   return data;
 }
 
+// Indexed fields only: served straight from the store's columns, no transcripts.
+export interface SessionRiskPoint {
+  id: number;
+  session_date: string;
+  risk_score: number | null;
+  elder_id: string;
+}
+
+// Every page of /sessions, following X-Next-Cursor until the last one.
+async function fetchSessionPages<T>(params: Record<string, string>): Promise<T[]> {
+  const rows: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const query = new URLSearchParams(params);
+    if (cursor) query.set("after", cursor);
+    const res = await fetch(`${FASTAPI_BASE}/sessions?${query}`);
+    if (!res.ok) return rows;
+    rows.push(...(await res.json()));
+    cursor = res.headers.get("X-Next-Cursor");
+  } while (cursor);
+  return rows;
+}
+
+// Full sessions with transcripts and marker evidence, for the transcript page.
 export async function fetchAllSessions(): Promise<SessionEntry[]> {
-  const res = await fetch(`${FASTAPI_BASE}/sessions`);
+  return fetchSessionPages<SessionEntry>({ limit: "500", include: "transcript,evidence" });
+}
+
+// Date and risk score of every session, for the dashboard's risk series.
+export async function fetchSessionRiskSeries(): Promise<SessionRiskPoint[]> {
+  return fetchSessionPages<SessionRiskPoint>({ limit: "1000", fields: "session_date,risk_score,elder_id" });
+}
+
+// The last ``count`` sessions (without transcripts or evidence), oldest first. ``series``
+// is the risk series, whose ids give the keyset cursor just before them.
+export async function fetchRecentSessions(series: SessionRiskPoint[], count = 5): Promise<SessionEntry[]> {
+  if (series.length === 0) return [];
+  const params = new URLSearchParams({ limit: String(count) });
+  if (series.length > count) params.set("after", String(series[series.length - count - 1].id));
+  const res = await fetch(`${FASTAPI_BASE}/sessions?${params}`);
   if (!res.ok) return [];
   return res.json();
 }
 
 export async function fetchWhoopSleep() {
   const res = await fetch(`${FASTAPI_BASE}/whoop/sleep/weekly`);
-  if (!res.ok) return null;
+  // 202: the first sync is still running, nothing to show yet.
+  if (!res.ok || res.status === 202) return null;
   return res.json();
 }
 
 export async function fetchWhoopRecovery() {
   const res = await fetch(`${FASTAPI_BASE}/whoop/recovery/weekly`);
-  if (!res.ok) return null;
+  if (!res.ok || res.status === 202) return null;
   return res.json();
 }
 
 export async function fetchWhoopCycle() {
   const res = await fetch(`${FASTAPI_BASE}/whoop/cycle/weekly`);
-  if (!res.ok) return null;
+  if (!res.ok || res.status === 202) return null;
+  return res.json();
+}
+
+// Past week's WHOOP scores (and, with includeRecords, the raw records) in one request.
+export async function fetchWhoopSummary(elderId: string, includeRecords = false) {
+  const params = new URLSearchParams({ elder_id: elderId });
+  if (includeRecords) params.set("include", "records");
+  const res = await fetch(`${FASTAPI_BASE}/whoop/summary?${params}`);
+  if (!res.ok || res.status === 202) return null;
   return res.json();
 }
 
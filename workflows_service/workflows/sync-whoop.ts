@@ -1,76 +1,42 @@
 import { MongoClient } from "mongodb";
+import { RetryableError } from "workflow";
 
 export async function syncElderHealthData(elderId: string) {
   "use workflow";
 
   console.log("[syncElderHealthData] start elderId=", elderId);
 
-  const sleep = await fetchWhoopSleep(elderId);
-  console.log("[syncElderHealthData] fetchWhoopSleep count=", sleep.length);
-
-  const cycle = await fetchWhoopCycle(elderId);
-  console.log("[syncElderHealthData] fetchWhoopCycle count=", cycle.length);
-
-  const recovery = await fetchWhoopRecovery(elderId);
-  console.log("[syncElderHealthData] fetchWhoopRecovery count=", recovery.length);
+  // One round trip: the backend refreshes its WHOOP store (one token, three concurrent
+  // fetches) and derives the scores server-side (backend/whoop/scoring.py).
+  const summary = await fetchWhoopSummary(elderId);
+  const { sleep, cycle, recovery } = summary;
+  console.log(
+    "[syncElderHealthData] fetchWhoopSummary sleep=", sleep.length, "cycle=", cycle.length, "recovery=", recovery.length
+  );
 
   await storeHealthData(elderId, { sleep, cycle, recovery });
   console.log("[syncElderHealthData] storeHealthData done");
 
-  const byStartDesc = <T extends { start?: string }>(a: T, b: T) =>
-    (b.start ? new Date(b.start).getTime() : 0) - (a.start ? new Date(a.start).getTime() : 0);
-  const byCreatedDesc = <T extends { created_at?: string }>(a: T, b: T) =>
-    (b.created_at ? new Date(b.created_at).getTime() : 0) - (a.created_at ? new Date(a.created_at).getTime() : 0);
-  const latestSleep = sleep.length ? [...sleep].sort(byStartDesc)[0]! : null;
-  const latestRecovery = recovery.length ? [...recovery].sort(byCreatedDesc)[0]! : null;
-  const latestCycle = cycle.length ? [...cycle].sort(byStartDesc)[0]! : null;
-  const sleepScore = latestSleep?.score?.sleep_performance_percentage ?? null;
-  const inBedMs = latestSleep?.score?.stage_summary?.total_in_bed_time_milli;
-  const hoursInBed = inBedMs != null ? inBedMs / (1000 * 60 * 60) : undefined;
-  const sn = latestSleep?.score?.sleep_needed;
-  const needMs =
-    sn != null
-      ? (sn.baseline_milli ?? 0) +
-        (sn.need_from_sleep_debt_milli ?? 0) +
-        (sn.need_from_recent_strain_milli ?? 0) +
-        (sn.need_from_recent_nap_milli ?? 0)
-      : 0;
-  const hoursNeeded = needMs > 0 ? needMs / (1000 * 60 * 60) : undefined;
-  const sleepNeedScore =
-    hoursInBed != null && hoursNeeded != null && hoursNeeded > 0
-      ? Math.round((hoursInBed / hoursNeeded) * 100)
-      : null;
-  const recoveryScore = latestRecovery?.score?.recovery_score ?? null;
-  const strain = latestCycle?.score?.strain ?? null;
-  const strainPercent = strain != null ? Math.round((Number(strain) / 21) * 100) : null;
-
   const result = {
     elderId,
-    sleepCount: sleep.length,
-    cycleCount: cycle.length,
-    recoveryCount: recovery.length,
+    sleepCount: summary.sleepCount,
+    cycleCount: summary.cycleCount,
+    recoveryCount: summary.recoveryCount,
     sleep,
     cycle,
     recovery,
-    scores: {
-      sleep: sleepScore,
-      sleepNeedScore,
-      sleepConsistency: latestSleep?.score?.sleep_consistency_percentage ?? null,
-      sleepEfficiency: latestSleep?.score?.sleep_efficiency_percentage ?? null,
-      recovery: recoveryScore,
-      recoveryRestingHeartRate: latestRecovery?.score?.resting_heart_rate ?? null,
-      recoveryHrvRmssdMilli: latestRecovery?.score?.hrv_rmssd_milli ?? null,
-      recoverySpo2Percentage: latestRecovery?.score?.spo2_percentage ?? null,
-      strainPercent,
-      strainKilojoule: latestCycle?.score?.kilojoule ?? null,
-      strainAverageHeartRate: latestCycle?.score?.average_heart_rate ?? null,
-      strainMaxHeartRate: latestCycle?.score?.max_heart_rate ?? null,
-    },
+    scores: summary.scores,
   };
   console.log("[syncElderHealthData] result", result);
   return result;
 }
 
+// Recoveries have no id of their own; they are identified by their cycle.
+function recordId(record: { id?: string | number; cycle_id?: number }): string | null {
+  const id = record.id ?? record.cycle_id;
+  return id == null ? null : String(id);
+}
+
 async function storeHealthData(
   elderId: string,
   payload: { sleep: SleepRecord[]; cycle: CycleRecord[]; recovery: RecoveryRecord[] }
@@ -82,15 +48,24 @@ async function storeHealthData(
   try {
     await client.connect();
     const db = client.db("elder_care");
-    const coll = db.collection("whoop_data");
-    const doc = {
-      elderId,
-      syncedAt: new Date().toISOString(),
-      sleep: payload.sleep,
-      cycle: payload.cycle,
-      recovery: payload.recovery,
-    };
-    await coll.insertOne(doc);
+    // One document per record, upserted by id, instead of a new snapshot of the week on every run.
+    const records = db.collection("whoop_records");
+    await records.createIndex({ elderId: 1, resource: 1, recordId: 1 }, { unique: true });
+    const ops = (["sleep", "cycle", "recovery"] as const).flatMap((resource) =>
+      (payload[resource] as Array<SleepRecord | CycleRecord | RecoveryRecord>).flatMap((record) => {
+        const id = recordId(record);
+        if (id == null) return [];
+        const filter = { elderId, resource, recordId: id };
+        return [{ replaceOne: { filter, replacement: { ...filter, ...record }, upsert: true } }];
+      })
+    );
+    if (ops.length) await records.bulkWrite(ops, { ordered: false });
+    // Latest week per elder, overwritten in place.
+    await db.collection("whoop_data").updateOne(
+      { elderId },
+      { $set: { elderId, syncedAt: new Date().toISOString(), ...payload } },
+      { upsert: true }
+    );
     console.log("[storeHealthData] elderId=", elderId, "sleep=", payload.sleep.length, "cycle=", payload.cycle.length, "recovery=", payload.recovery.length);
   } finally {
     await client.close();
@@ -101,40 +76,48 @@ function whoopBase(): string {
   return process.env.BACKEND_URL || "http://localhost:8000";
 }
 
-async function fetchWhoopSleep(elderId: string): Promise<SleepRecord[]> {
-  "use step";
-  console.log("[fetchWhoopSleep] elderId=", elderId);
-  const url = `${whoopBase()}/whoop/sleep/weekly`;
-  const res = await fetch(url);
-  if (!res.ok) throw new Error(`whoop sleep fetch failed: ${res.status}`);
-  const data = (await res.json()) as { records: SleepRecord[] };
-  const records = data.records ?? [];
-  console.log("[fetchWhoopSleep] count=", records.length);
-  return records;
+interface WhoopScores {
+  sleep: number | null;
+  sleepNeedScore: number | null;
+  sleepConsistency: number | null;
+  sleepEfficiency: number | null;
+  recovery: number | null;
+  recoveryRestingHeartRate: number | null;
+  recoveryHrvRmssdMilli: number | null;
+  recoverySpo2Percentage: number | null;
+  strainPercent: number | null;
+  strainKilojoule: number | null;
+  strainAverageHeartRate: number | null;
+  strainMaxHeartRate: number | null;
 }
 
-async function fetchWhoopCycle(elderId: string): Promise<CycleRecord[]> {
-  "use step";
-  console.log("[fetchWhoopCycle] elderId=", elderId);
-  const url = `${whoopBase()}/whoop/cycle/weekly`;
-  const res = await fetch(url);
-  if (!res.ok) throw new Error(`whoop cycle fetch failed: ${res.status}`);
-  const data = (await res.json()) as { records: CycleRecord[] };
-  const records = data.records ?? [];
-  console.log("[fetchWhoopCycle] count=", records.length);
-  return records;
+interface WhoopSummary {
+  elderId: string;
+  sleepCount: number;
+  cycleCount: number;
+  recoveryCount: number;
+  syncedAt: string | null;
+  scores: WhoopScores;
+  sleep: SleepRecord[];
+  cycle: CycleRecord[];
+  recovery: RecoveryRecord[];
 }
 
-async function fetchWhoopRecovery(elderId: string): Promise<RecoveryRecord[]> {
+async function fetchWhoopSummary(elderId: string): Promise<WhoopSummary> {
   "use step";
-  console.log("[fetchWhoopRecovery] elderId=", elderId);
-  const url = `${whoopBase()}/whoop/recovery/weekly`;
+  console.log("[fetchWhoopSummary] elderId=", elderId);
+  // refresh=true pulls new and rescored records into the backend's store before summarizing.
+  const url = `${whoopBase()}/whoop/summary?elder_id=${encodeURIComponent(elderId)}&include=records&refresh=true`;
   const res = await fetch(url);
-  if (!res.ok) throw new Error(`whoop recovery fetch failed: ${res.status}`);
-  const data = (await res.json()) as { records: RecoveryRecord[] };
-  const records = data.records ?? [];
-  console.log("[fetchWhoopRecovery] count=", records.length);
-  return records;
+  if (!res.ok) throw new Error(`whoop summary fetch failed: ${res.status}`);
+  // 202: another backend worker is still running this elder's first sync and there is
+  // nothing stored yet. Retry the step later rather than store an empty week.
+  if (res.status === 202) {
+    const seconds = Number(res.headers.get("Retry-After")) || 5;
+    throw new RetryableError(`whoop summary for ${elderId} is still syncing`, { retryAfter: seconds * 1000 });
+  }
+  const data = (await res.json()) as WhoopSummary;
+  return { ...data, sleep: data.sleep ?? [], cycle: data.cycle ?? [], recovery: data.recovery ?? [] };
 }
 
 interface SleepRecord {